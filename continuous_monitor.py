@@ -13,6 +13,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from monitor_windows import get_system_metrics, save_metrics
+from reporting import influx, spool
 
 def continuous_monitor(interval=3):
     """
@@ -37,8 +38,8 @@ def continuous_monitor(interval=3):
             
             # Show status
             cpu = metrics['cpu']['usage_percent']
-            mem = metrics['memory']['percent']
-            gpu_util = metrics.get('gpu', {}).get('utilization', 0) if metrics.get('gpu', {}).get('available') else 0
+            mem = metrics['memory']['usage_percent']
+            gpu_util = metrics['gpu']['gpu']['utilization_percent']
             
             print(f"[{iteration:04d}] CPU: {cpu:5.1f}% | RAM: {mem:5.1f}% | GPU: {gpu_util:5.1f}%", end='\r')
             
@@ -46,6 +47,9 @@ def continuous_monitor(interval=3):
             time.sleep(interval)
             
     except KeyboardInterrupt:
+        # Samples not yet sent to the reporter (MONITOR_PUSH_URL) stay spooled for the next run
+        spool.flush()
+        influx.flush()
         print("\n\n✅ Monitoring stopped")
         print(f"Total iterations: {iteration}")
 
@@ -9,6 +9,8 @@ import time
 import os
 from datetime import datetime
 
+from reporting import cpu_sampler, disk_io, gpu_sampler, mounts, net_io
+
 def clear_screen():
     """Clear the console screen"""
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -32,38 +34,22 @@ def get_gpu_info():
     try:
         import subprocess
         
-        # Try nvidia-smi for NVIDIA GPUs (works in WSL2)
+        # NVIDIA GPUs (works in WSL2), read from the shared sampler
         try:
-            result = subprocess.run(
-                ['nvidia-smi', '--query-gpu=gpu_name,temperature.gpu,utilization.gpu,memory.used,memory.total', 
-                 '--format=csv,noheader'], 
-                capture_output=True, text=True, timeout=3
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                # Parse output: "GPU Name, Temp, Util, Mem Used, Mem Total"
-                output = result.stdout.strip()
-                parts = [p.strip() for p in output.split(',')]
-                
-                if len(parts) >= 5:
-                    gpu_name = parts[0]
-                    temp = float(parts[1]) if parts[1].replace('.','').isdigit() else 0
-                    util = float(parts[2].replace('%','').strip()) if '%' in parts[2] else float(parts[2])
-                    mem_used = float(parts[3].split()[0]) if parts[3] else 0
-                    mem_total = float(parts[4].split()[0]) if parts[4] else 1
-                    
-                    return {
-                        'available': True,
-                        'temperature': temp,
-                        'utilization': util,
-                        'memory_used_mb': mem_used,
-                        'memory_total_mb': mem_total,
-                        'type': f'NVIDIA - {gpu_name}'
-                    }
-        except FileNotFoundError:
-            pass  # nvidia-smi not found
+            readings = gpu_sampler.latest()
+            if readings:
+                gpu = gpu_sampler.to_canonical(readings)
+                return {
+                    'available': True,
+                    'temperature': gpu['temperature_celsius'],
+                    'utilization': gpu['utilization_percent'],
+                    'memory_used_mb': gpu['memory_used_bytes'] / 1024**2,
+                    'memory_total_mb': gpu['memory_total_bytes'] / 1024**2 or 1,
+                    'type': f"NVIDIA - {gpu['name']}" + (f" (x{gpu['count']})" if gpu['count'] > 1 else ''),
+                    'devices': gpu_sampler.to_devices(readings)
+                }
         except Exception as e:
-            print(f"nvidia-smi error: {e}")
+            print(f"GPU sampler error: {e}")
         
         # Try AMD ROCm
         try:
@@ -111,8 +97,9 @@ def create_bar(percent, width=30):
 def get_live_metrics():
     """Collect all system metrics"""
     # CPU
-    cpu_percent = psutil.cpu_percent(interval=0.5, percpu=False)
-    cpu_per_core = psutil.cpu_percent(interval=0, percpu=True)
+    cpu_usage = cpu_sampler.sample()
+    cpu_percent = cpu_usage['usage_percent']
+    cpu_per_core = cpu_usage['per_core']
     cpu_freq = psutil.cpu_freq()
     cpu_temp = get_cpu_temp()
     
@@ -120,11 +107,11 @@ def get_live_metrics():
     memory = psutil.virtual_memory()
     swap = psutil.swap_memory()
     
-    # Disk I/O
-    disk_io = psutil.disk_io_counters()
+    # Disk I/O - per-device rates since the previous refresh
+    disk = disk_io.sample()
     
-    # Network I/O
-    net_io = psutil.net_io_counters()
+    # Network I/O - per-interface rates since the previous refresh
+    network = net_io.sample()
     
     # GPU
     gpu = get_gpu_info()
@@ -143,14 +130,14 @@ def get_live_metrics():
         },
         'memory': memory,
         'swap': swap,
-        'disk_io': disk_io,
-        'net_io': net_io,
+        'disk': disk,
+        'network': network,
         'gpu': gpu,
         'processes': process_count,
         'timestamp': datetime.now()
     }
 
-def display_dashboard(metrics, previous_net=None, previous_disk=None):
+def display_dashboard(metrics):
     """Display the live monitoring dashboard"""
     clear_screen()
     
@@ -200,32 +187,37 @@ def display_dashboard(metrics, previous_net=None, previous_disk=None):
     # Disk I/O
     print("\n📀 DISK I/O")
     print("-" * 80)
-    disk_io = metrics['disk_io']
+    io_stats = metrics['disk']['io_stats']
     
-    if previous_disk:
-        read_rate = (disk_io.read_bytes - previous_disk.read_bytes) / 1024 / 1024  # MB/s
-        write_rate = (disk_io.write_bytes - previous_disk.write_bytes) / 1024 / 1024  # MB/s
-        print(f"Read Speed:    {read_rate:8.2f} MB/s")
-        print(f"Write Speed:   {write_rate:8.2f} MB/s")
+    if io_stats['interval']:
+        print(f"Read Speed:    {io_stats['read_bytes_per_sec'] / 1024 / 1024:8.2f} MB/s")
+        print(f"Write Speed:   {io_stats['write_bytes_per_sec'] / 1024 / 1024:8.2f} MB/s")
+        for device in metrics['disk']['devices']:
+            print(f"  {device['device'][:14]:14} {create_bar(device['busy_percent'], 20)} busy  "
+                  f"R {device['read_iops']:7.1f} IOPS  W {device['write_iops']:7.1f} IOPS")
     
-    print(f"Total Read:    {format_bytes(disk_io.read_bytes)}")
-    print(f"Total Written: {format_bytes(disk_io.write_bytes)}")
+    print(f"Total Read:    {format_bytes(io_stats['bytes_read'])}")
+    print(f"Total Written: {format_bytes(io_stats['bytes_written'])}")
     
     # Network I/O
     print("\n🌐 NETWORK")
     print("-" * 80)
-    net_io = metrics['net_io']
+    network = metrics['network']
+    rates = network['rates']
     
-    if previous_net:
-        upload_rate = (net_io.bytes_sent - previous_net.bytes_sent) / 1024 / 1024  # MB/s
-        download_rate = (net_io.bytes_recv - previous_net.bytes_recv) / 1024 / 1024  # MB/s
-        print(f"Upload Speed:   {upload_rate:8.2f} MB/s")
-        print(f"Download Speed: {download_rate:8.2f} MB/s")
+    if rates['interval']:
+        print(f"Upload Speed:   {rates['tx_bytes_per_sec'] / 1024 / 1024:8.2f} MB/s")
+        print(f"Download Speed: {rates['rx_bytes_per_sec'] / 1024 / 1024:8.2f} MB/s")
+        for iface in network['interfaces']:
+            print(f"  {iface['interface'][:14]:14} ↓ {iface['rx_bytes_per_sec'] / 1024 / 1024:7.2f} MB/s  "
+                  f"↑ {iface['tx_bytes_per_sec'] / 1024 / 1024:7.2f} MB/s  "
+                  f"err {iface['errors_per_sec']:.1f}/s  drop {iface['drops_per_sec']:.1f}/s")
     
-    print(f"Total Sent:     {format_bytes(net_io.bytes_sent)}")
-    print(f"Total Received: {format_bytes(net_io.bytes_recv)}")
-    print(f"Packets Sent:   {net_io.packets_sent:,}")
-    print(f"Packets Recv:   {net_io.packets_recv:,}")
+    interfaces = network['interfaces']
+    print(f"Total Sent:     {format_bytes(sum(i['tx_bytes'] for i in interfaces))}")
+    print(f"Total Received: {format_bytes(sum(i['rx_bytes'] for i in interfaces))}")
+    print(f"Packets Sent:   {sum(i['tx_packets'] for i in interfaces):,}")
+    print(f"Packets Recv:   {sum(i['rx_packets'] for i in interfaces):,}")
     
     # GPU Section
     print("\n🎮 GPU")
@@ -241,20 +233,25 @@ def display_dashboard(metrics, previous_net=None, previous_disk=None):
         mem_percent = (gpu['memory_used_mb'] / gpu['memory_total_mb']) * 100
         print(f"Memory:        {create_bar(mem_percent)}")
         print(f"               {gpu['memory_used_mb']:.0f} MB / {gpu['memory_total_mb']:.0f} MB")
+        
+        devices = gpu.get('devices', [])
+        if len(devices) > 1:
+            for device in devices:
+                print(f"  GPU {device['index']}: {create_bar(device['utilization_percent'] or 0, 20)} "
+                      f"{device['temperature_celsius'] or 0:.0f}°C  mem {device['memory_percent'] or 0:.0f}%")
     else:
         print("⚠️  No GPU detected or nvidia-smi not available")
     
     # Disk Usage
     print("\n💽 DISK USAGE")
     print("-" * 80)
-    for partition in psutil.disk_partitions():
-        try:
-            usage = psutil.disk_usage(partition.mountpoint)
-            print(f"{partition.mountpoint:5s} {create_bar(usage.percent)}")
-            print(f"      {usage.used / (1024**3):.1f} GB / {usage.total / (1024**3):.1f} GB "
-                  f"(Free: {usage.free / (1024**3):.1f} GB)")
-        except:
+    for fs in mounts.filesystems():
+        if not fs['reachable']:
+            print(f"{fs['mount']:5s} ⚠️  not responding")
             continue
+        print(f"{fs['mount']:5s} {create_bar(fs['usage_percent'])}")
+        print(f"      {fs['used'] / (1024**3):.1f} GB / {fs['total'] / (1024**3):.1f} GB "
+              f"(Free: {fs['available'] / (1024**3):.1f} GB)")
     
     # Bottom info
     print("\n" + "=" * 80)
@@ -268,20 +265,13 @@ def main():
     print("Loading...")
     time.sleep(1)
     
-    previous_net = None
-    previous_disk = None
-    
     try:
         while True:
             # Get current metrics
             metrics = get_live_metrics()
             
             # Display dashboard
-            display_dashboard(metrics, previous_net, previous_disk)
-            
-            # Store for rate calculations
-            previous_net = metrics['net_io']
-            previous_disk = metrics['disk_io']
+            display_dashboard(metrics)
             
             # Wait before next update
             time.sleep(2)
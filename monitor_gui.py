@@ -11,6 +11,9 @@ import threading
 import time
 from datetime import datetime
 
+from reporting import gpu_sampler, mounts
+from reporting.cpu_sampler import CpuSampler
+
 class SystemMonitorGUI:
     def __init__(self, root):
         self.root = root
@@ -21,6 +24,9 @@ class SystemMonitorGUI:
         # Flag to control updates
         self.running = True
         
+        # Runs on the Tk thread, so CPU usage must not block the UI
+        self.cpu_sampler = CpuSampler()
+        
         # Create main container
         main_frame = tk.Frame(root, bg='#1e1e1e')
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -142,37 +148,36 @@ class SystemMonitorGUI:
                                   fg='#ffffff', font=('Courier', 10))
         self.gpu_details.pack(pady=10, padx=10)
     
-    def get_gpu_info(self):
-        """Get GPU information with all available metrics"""
+    def get_gpu_devices(self):
+        """Get every GPU with all available metrics (served by the GPU sampler)"""
         try:
-            import subprocess
-            result = subprocess.run(
-                ['nvidia-smi', '--query-gpu=gpu_name,temperature.gpu,utilization.gpu,utilization.memory,memory.used,memory.total,power.draw,power.limit,clocks.gr,clocks.mem,fan.speed', 
-                 '--format=csv,noheader,nounits'], 
-                capture_output=True, text=True, timeout=3
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                output = result.stdout.strip()
-                parts = [p.strip() for p in output.split(',')]
-                
-                if len(parts) >= 11:
-                    return {
-                        'name': parts[0],
-                        'temp': float(parts[1]) if parts[1].replace('.','').replace('-','').isdigit() else 0,
-                        'util': float(parts[2]) if parts[2].replace('.','').replace('-','').isdigit() else 0,
-                        'mem_util': float(parts[3]) if parts[3].replace('.','').replace('-','').isdigit() else 0,
-                        'mem_used': float(parts[4]) if parts[4].replace('.','').replace('-','').isdigit() else 0,
-                        'mem_total': float(parts[5]) if parts[5].replace('.','').replace('-','').isdigit() else 0,
-                        'power_draw': float(parts[6]) if parts[6].replace('.','').replace('-','').isdigit() else 0,
-                        'power_limit': float(parts[7]) if parts[7].replace('.','').replace('-','').isdigit() else 0,
-                        'clock_gpu': float(parts[8]) if parts[8].replace('.','').replace('-','').isdigit() else 0,
-                        'clock_mem': float(parts[9]) if parts[9].replace('.','').replace('-','').isdigit() else 0,
-                        'fan_speed': float(parts[10]) if parts[10].replace('.','').replace('-','').isdigit() else 0
-                    }
+            readings = gpu_sampler.latest()
         except:
-            pass
-        return None
+            return []
+        
+        devices = []
+        for gpu in readings:
+            value = lambda key, scale=1, gpu=gpu: (gpu[key] or 0) / scale
+            devices.append({
+                'index': gpu['index'],
+                'name': gpu['name'],
+                'temp': value('temperature_celsius'),
+                'util': value('utilization_percent'),
+                'mem_util': value('memory_utilization_percent'),
+                'mem_used': value('memory_used_bytes', 1024**2),
+                'mem_total': value('memory_total_bytes', 1024**2),
+                'power_draw': value('power_watts'),
+                'power_limit': value('power_limit_watts'),
+                'clock_gpu': value('clock_graphics_mhz'),
+                'clock_mem': value('clock_memory_mhz'),
+                'fan_speed': value('fan_percent')
+            })
+        return devices
+    
+    def get_gpu_info(self):
+        """First GPU, used as the thermal fallback when no CPU sensor is readable"""
+        devices = self.get_gpu_devices()
+        return devices[0] if devices else None
     
     def get_cpu_temp(self):
         """Get CPU temperature from LibreHardwareMonitor WMI"""
@@ -206,22 +211,7 @@ class SystemMonitorGUI:
         # Fallback methods if LibreHardwareMonitor not running
         
         try:
-            # Method 1: Use NVIDIA GPU to estimate system temp (GPU hotspot often correlates with CPU)
-            # This is a workaround - not actual CPU temp but gives thermal indication
-            import subprocess
-            result = subprocess.run(
-                ['nvidia-smi', '--query-gpu=temperature.gpu', '--format=csv,noheader,nounits'],
-                capture_output=True, text=True, timeout=2
-            )
-            if result.returncode == 0 and result.stdout.strip():
-                # GPU temp can give rough system thermal status
-                # Return None to indicate we'll show GPU temp instead
-                pass
-        except:
-            pass
-        
-        try:
-            # Method 2: Read from ASUS WMI (ATKACPI)
+            # Method 1: Read from ASUS WMI (ATKACPI)
             import subprocess
             # Query ASUS ACPI sensors
             result = subprocess.run(
@@ -255,7 +245,7 @@ class SystemMonitorGUI:
             pass
         
         try:
-            # Method 3: Try psutil sensors
+            # Method 2: Try psutil sensors
             temps = psutil.sensors_temperatures()
             if temps:
                 for name, entries in temps.items():
@@ -265,7 +255,7 @@ class SystemMonitorGUI:
         except:
             pass
         
-        # Method 4: Return GPU temp as system thermal indicator if nothing else works
+        # Method 3: Return GPU temp as system thermal indicator if nothing else works
         gpu_info = self.get_gpu_info()
         if gpu_info and gpu_info.get('temp'):
             return None  # Return None, we'll show "Use GPU temp" message
@@ -291,10 +281,11 @@ class SystemMonitorGUI:
     
     def update_cpu(self):
         """Update CPU information"""
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_usage = self.cpu_sampler.sample()
+        cpu_percent = cpu_usage['usage_percent']
         cpu_count = psutil.cpu_count()
         cpu_freq = psutil.cpu_freq()
-        cpu_per_core = psutil.cpu_percent(interval=0, percpu=True)
+        cpu_per_core = cpu_usage['per_core']
         cpu_temp = self.get_cpu_temp()
         
         # Update progress bar
@@ -393,19 +384,18 @@ class SystemMonitorGUI:
         """Update disk information"""
         details = ""
         
-        for partition in psutil.disk_partitions():
-            try:
-                usage = psutil.disk_usage(partition.mountpoint)
-                details += f"Drive: {partition.device}\n"
-                details += f"  Mountpoint: {partition.mountpoint}\n"
-                details += f"  File System: {partition.fstype}\n"
-                details += f"  Total:  {self.format_bytes(usage.total)}\n"
-                details += f"  Used:   {self.format_bytes(usage.used)}\n"
-                details += f"  Free:   {self.format_bytes(usage.free)}\n"
-                details += f"  Percent: {usage.percent}%\n"
-                details += "-" * 60 + "\n"
-            except:
-                pass
+        for fs in mounts.filesystems():
+            details += f"Drive: {fs['device']}\n"
+            details += f"  Mountpoint: {fs['mount']}\n"
+            details += f"  File System: {fs['fstype']}\n"
+            if fs['reachable']:
+                details += f"  Total:  {self.format_bytes(fs['total'])}\n"
+                details += f"  Used:   {self.format_bytes(fs['used'])}\n"
+                details += f"  Free:   {self.format_bytes(fs['available'])}\n"
+                details += f"  Percent: {fs['usage_percent']}%\n"
+            else:
+                details += "  Not responding\n"
+            details += "-" * 60 + "\n"
         
         # Disk I/O
         disk_io = psutil.disk_io_counters()
@@ -445,42 +435,44 @@ class SystemMonitorGUI:
     
     def update_gpu(self):
         """Update GPU information with all metrics"""
-        gpu_info = self.get_gpu_info()
+        devices = self.get_gpu_devices()
         
-        if gpu_info:
-            details = f"GPU: {gpu_info['name']}\n"
-            details += "=" * 60 + "\n\n"
-            
-            # Temperature
-            temp_emoji = "🟢" if gpu_info['temp'] < 70 else "🟡" if gpu_info['temp'] < 85 else "🔴"
-            details += f"🌡️  Temperature:       {temp_emoji} {gpu_info['temp']:.1f}°C\n\n"
-            
-            # Utilization
-            util_emoji = "🟢" if gpu_info['util'] < 50 else "🟡" if gpu_info['util'] < 80 else "🔴"
-            details += f"⚡ GPU Utilization:   {util_emoji} {gpu_info['util']:.1f}%\n"
-            
-            mem_util_emoji = "🟢" if gpu_info['mem_util'] < 50 else "🟡" if gpu_info['mem_util'] < 80 else "🔴"
-            details += f"💾 Memory Utilization: {mem_util_emoji} {gpu_info['mem_util']:.1f}%\n\n"
-            
-            # Memory
-            mem_percent = (gpu_info['mem_used'] / gpu_info['mem_total'] * 100) if gpu_info['mem_total'] > 0 else 0
-            mem_emoji = "🟢" if mem_percent < 50 else "🟡" if mem_percent < 80 else "🔴"
-            details += f"📊 Memory Used:       {mem_emoji} {gpu_info['mem_used']:.0f} MB / {gpu_info['mem_total']:.0f} MB\n"
-            details += f"   Memory Usage:      {mem_percent:.1f}%\n\n"
-            
-            # Power
-            power_percent = (gpu_info['power_draw'] / gpu_info['power_limit'] * 100) if gpu_info['power_limit'] > 0 else 0
-            power_emoji = "🟢" if power_percent < 70 else "🟡" if power_percent < 90 else "🔴"
-            details += f"🔋 Power Draw:        {power_emoji} {gpu_info['power_draw']:.1f} W / {gpu_info['power_limit']:.1f} W\n"
-            details += f"   Power Usage:       {power_percent:.1f}%\n\n"
-            
-            # Clocks
-            details += f"🕐 GPU Clock:         {gpu_info['clock_gpu']:.0f} MHz\n"
-            details += f"🕐 Memory Clock:      {gpu_info['clock_mem']:.0f} MHz\n\n"
-            
-            # Fan
-            fan_emoji = "🟢" if gpu_info['fan_speed'] < 60 else "🟡" if gpu_info['fan_speed'] < 80 else "🔴"
-            details += f"💨 Fan Speed:         {fan_emoji} {gpu_info['fan_speed']:.0f}%\n"
+        if devices:
+            details = ""
+            for gpu_info in devices:
+                details += f"GPU {gpu_info['index']}: {gpu_info['name']}\n"
+                details += "=" * 60 + "\n\n"
+                
+                # Temperature
+                temp_emoji = "🟢" if gpu_info['temp'] < 70 else "🟡" if gpu_info['temp'] < 85 else "🔴"
+                details += f"🌡️  Temperature:       {temp_emoji} {gpu_info['temp']:.1f}°C\n\n"
+                
+                # Utilization
+                util_emoji = "🟢" if gpu_info['util'] < 50 else "🟡" if gpu_info['util'] < 80 else "🔴"
+                details += f"⚡ GPU Utilization:   {util_emoji} {gpu_info['util']:.1f}%\n"
+                
+                mem_util_emoji = "🟢" if gpu_info['mem_util'] < 50 else "🟡" if gpu_info['mem_util'] < 80 else "🔴"
+                details += f"💾 Memory Utilization: {mem_util_emoji} {gpu_info['mem_util']:.1f}%\n\n"
+                
+                # Memory
+                mem_percent = (gpu_info['mem_used'] / gpu_info['mem_total'] * 100) if gpu_info['mem_total'] > 0 else 0
+                mem_emoji = "🟢" if mem_percent < 50 else "🟡" if mem_percent < 80 else "🔴"
+                details += f"📊 Memory Used:       {mem_emoji} {gpu_info['mem_used']:.0f} MB / {gpu_info['mem_total']:.0f} MB\n"
+                details += f"   Memory Usage:      {mem_percent:.1f}%\n\n"
+                
+                # Power
+                power_percent = (gpu_info['power_draw'] / gpu_info['power_limit'] * 100) if gpu_info['power_limit'] > 0 else 0
+                power_emoji = "🟢" if power_percent < 70 else "🟡" if power_percent < 90 else "🔴"
+                details += f"🔋 Power Draw:        {power_emoji} {gpu_info['power_draw']:.1f} W / {gpu_info['power_limit']:.1f} W\n"
+                details += f"   Power Usage:       {power_percent:.1f}%\n\n"
+                
+                # Clocks
+                details += f"🕐 GPU Clock:         {gpu_info['clock_gpu']:.0f} MHz\n"
+                details += f"🕐 Memory Clock:      {gpu_info['clock_mem']:.0f} MHz\n\n"
+                
+                # Fan
+                fan_emoji = "🟢" if gpu_info['fan_speed'] < 60 else "🟡" if gpu_info['fan_speed'] < 80 else "🔴"
+                details += f"💨 Fan Speed:         {fan_emoji} {gpu_info['fan_speed']:.0f}%\n\n"
         else:
             details = "No GPU detected or nvidia-smi not available\n\n"
             details += "For NVIDIA GPUs, install NVIDIA drivers with nvidia-smi utility.\n\n"
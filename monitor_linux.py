@@ -6,182 +6,179 @@ Collects system metrics using Linux-specific tools and libraries
 
 import os
 import json
+import time
 import platform
-import subprocess
 from datetime import datetime
 from pathlib import Path
 
+from reporting import cgroups, connections, cpu_sampler, disk_io, exposition, gpu_sampler, influx, mounts, net_io, pressure, process_sampler, procfs, sensors, spool
+from reporting.collection import CollectionEngine, summarize
+from reporting.metrics_schema import SCHEMA_VERSION
+from reporting.history_store import HistoryStore
+from reporting.scheduler import Scheduler
+
 try:
     import psutil
 except ImportError:
     print("Error: psutil not installed. Run: pip3 install psutil")
     exit(1)
 
+# Read CPU, memory, network and load straight from /proc (reporting/procfs.py)
+# instead of through psutil. On by default inside the collector container,
+# where HOST_PROC points at the host's /proc.
+USE_PROCFS = os.environ.get(
+    'MONITOR_BACKEND', 'procfs' if 'HOST_PROC' in os.environ else 'psutil') == 'procfs'
+if 'HOST_PROC' in os.environ:
+    psutil.PROCFS_PATH = procfs.PROC_ROOT
+
+_cpu_sampler = cpu_sampler.CpuSampler(
+    cpu_times=procfs.reader().cpu_times if USE_PROCFS else None)
+_disk_io_sampler = disk_io.DiskIoSampler(
+    counters=procfs.reader().disk_io_counters if USE_PROCFS else None)
+_filesystem_sampler = mounts.FilesystemSampler()
+_sensor_registry = sensors.SensorRegistry()
+_cgroup_sampler = cgroups.CgroupSampler()
+_pressure_sampler = pressure.PressureSampler()
+_connection_sampler = connections.ConnectionSampler()
+_net_io_sampler = net_io.NetIoSampler(
+    counters=procfs.reader().net_io_counters if USE_PROCFS else None,
+    if_stats=procfs.net_if_stats if USE_PROCFS else None)
+
 
 def get_cpu_metrics():
-    """Get CPU usage and information"""
+    """Get CPU usage (since the previous call) and information"""
     cpu_freq = psutil.cpu_freq()
     
-    # Get CPU temperature (Linux-specific)
-    temperature = get_cpu_temperature()
+    # Package, per-core, NVMe, chipset ... from the cached hwmon / thermal inputs
+    temperatures = _sensor_registry.temperatures()
+    temperature = sensors.cpu_temperature(temperatures)
     
+    usage = _cpu_sampler.sample()
     return {
-        'usage_percent': round(psutil.cpu_percent(interval=1), 1),
-        'count': psutil.cpu_count(),
-        'frequency_mhz': round(cpu_freq.current, 0) if cpu_freq else 0,
-        'temperature': temperature
+        'usage_percent': usage['usage_percent'],
+        'per_core': usage['per_core'],
+        'temperature_celsius': temperature if temperature is not None else 'N/A',
+        'temperatures': temperatures,
+        'core_count': psutil.cpu_count(),
+        'model': get_cpu_model(),
+        'frequency_ghz': round(cpu_freq.current / 1000, 2) if cpu_freq else 0
     }
 
 
-def get_cpu_temperature():
-    """Get CPU temperature using sensors or thermal zones"""
+def get_cpu_model():
+    """Get the CPU model name from /proc/cpuinfo"""
     try:
-        # Try using psutil sensors (if available)
-        if hasattr(psutil, 'sensors_temperatures'):
-            temps = psutil.sensors_temperatures()
-            if temps:
-                # Try common sensor names
-                for name in ['coretemp', 'k10temp', 'zenpower', 'cpu_thermal']:
-                    if name in temps:
-                        return round(temps[name][0].current, 1)
-                
-                # If no specific sensor found, use first available
-                first_sensor = list(temps.values())[0]
-                if first_sensor:
-                    return round(first_sensor[0].current, 1)
-    except:
+        with open(procfs.proc_path('cpuinfo')) as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
         pass
-    
-    try:
-        # Try reading thermal zone directly
-        thermal_zones = Path('/sys/class/thermal')
-        if thermal_zones.exists():
-            for zone in thermal_zones.glob('thermal_zone*'):
-                temp_file = zone / 'temp'
-                if temp_file.exists():
-                    temp = int(temp_file.read_text().strip()) / 1000.0
-                    return round(temp, 1)
-    except:
-        pass
-    
-    return None
+    return platform.processor() or 'Unknown'
 
 
 def get_memory_metrics():
     """Get memory usage information"""
+    if USE_PROCFS:
+        info = procfs.reader().meminfo()
+        total = info['MemTotal']
+        available = info.get('MemAvailable', info['MemFree'])
+        return {
+            'total_bytes': total,
+            'used_bytes': total - available,  # same definition as psutil
+            'available_bytes': available,
+            'usage_percent': round((total - available) / total * 100, 1) if total else 0
+        }
+    
     mem = psutil.virtual_memory()
     return {
-        'total_gb': round(mem.total / (1024**3), 2),
-        'used_gb': round(mem.used / (1024**3), 2),
-        'available_gb': round(mem.available / (1024**3), 2),
-        'percent': round(mem.percent, 1)
+        'total_bytes': mem.total,
+        'used_bytes': mem.used,
+        'available_bytes': mem.available,
+        'usage_percent': round(mem.percent, 1)
     }
 
 
 def get_swap_metrics():
     """Get swap usage information"""
+    if USE_PROCFS:
+        info = procfs.reader().meminfo()
+        total = info['SwapTotal']
+        used = total - info['SwapFree']
+        return {
+            'swap_total_bytes': total,
+            'swap_used_bytes': used,
+            'swap_usage_percent': round(used / total * 100, 1) if total else 0
+        }
+    
     swap = psutil.swap_memory()
     return {
-        'total_gb': round(swap.total / (1024**3), 2),
-        'used_gb': round(swap.used / (1024**3), 2),
-        'percent': round(swap.percent, 1)
+        'swap_total_bytes': swap.total,
+        'swap_used_bytes': swap.used,
+        'swap_usage_percent': round(swap.percent, 1)
     }
 
 
 def get_disk_metrics():
-    """Get disk usage for all mounted partitions"""
-    disks = []
-    for partition in psutil.disk_partitions():
-        # Skip special filesystems
-        if partition.fstype in ['', 'tmpfs', 'devtmpfs', 'squashfs', 'overlay']:
-            continue
-        
-        try:
-            usage = psutil.disk_usage(partition.mountpoint)
-            disks.append({
-                'device': partition.device,
-                'mountpoint': partition.mountpoint,
-                'total_gb': round(usage.total / (1024**3), 2),
-                'used_gb': round(usage.used / (1024**3), 2),
-                'free_gb': round(usage.free / (1024**3), 2),
-                'percent': round(usage.percent, 1)
-            })
-        except (PermissionError, OSError):
-            continue
-    
-    return disks
+    """Get disk usage for all mounted partitions (hung mounts are marked unreachable)"""
+    return {
+        'filesystems': _filesystem_sampler.sample(),
+        'smart_status': 'N/A'
+    }
+
+
+def get_disk_io_metrics():
+    """Get disk I/O totals and per-device rates since the previous call"""
+    return _disk_io_sampler.sample()
+
+
+def get_container_metrics():
+    """Get per-container figures from the cgroup v2 hierarchy (empty on cgroup v1)"""
+    if not _cgroup_sampler.available():
+        return {}
+    return {**_cgroup_sampler.sample(), 'timestamp': datetime.now().isoformat()}
 
 
 def get_network_metrics():
-    """Get network statistics"""
-    net_io = psutil.net_io_counters()
+    """Get per-interface counters and rates since the previous call, and the socket summary"""
+    network = _net_io_sampler.sample()
+    summary = _connection_sampler.sample()
     return {
-        'bytes_sent_mb': round(net_io.bytes_sent / (1024**2), 2),
-        'bytes_recv_mb': round(net_io.bytes_recv / (1024**2), 2),
-        'packets_sent': net_io.packets_sent,
-        'packets_recv': net_io.packets_recv
+        'interfaces': network['interfaces'],
+        'active_connections': summary['established'],
+        'connections': summary,
+        'active_interface_names': network['active_interface_names'],
+        'rates': network['rates']
     }
 
 
 def get_gpu_metrics():
-    """Get GPU information using nvidia-smi"""
-    try:
-        result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=name,temperature.gpu,utilization.gpu,memory.used,memory.total',
-             '--format=csv,noheader,nounits'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        
-        if result.returncode == 0:
-            output = result.stdout.strip()
-            if output:
-                parts = output.split(',')
-                return {
-                    'available': True,
-                    'name': parts[0].strip(),
-                    'temperature': float(parts[1].strip()),
-                    'utilization': float(parts[2].strip()),
-                    'memory_used_mb': float(parts[3].strip()),
-                    'memory_total_mb': float(parts[4].strip())
-                }
-    except (FileNotFoundError, subprocess.TimeoutExpired, IndexError):
-        pass
+    """Get the GPU summary and per-device records from the shared NVML / nvidia-smi sampler"""
+    readings = gpu_sampler.latest()
+    gpu = gpu_sampler.to_canonical(readings)
+    if gpu is not None:
+        return {'gpu': gpu, 'devices': gpu_sampler.to_devices(readings)}
     
-    return {
-        'available': False,
+    return {'gpu': {
+        'vendor': 'None',
         'name': 'N/A',
-        'temperature': 0,
-        'utilization': 0,
-        'memory_used_mb': 0,
-        'memory_total_mb': 0
-    }
+        'count': 0,
+        'utilization_percent': 0,
+        'memory_used_bytes': 0,
+        'memory_total_bytes': 0,
+        'memory_percent': 0,
+        'temperature_celsius': 0,
+        'power_watts': 0
+    }, 'devices': []}
 
 
 def get_system_load_metrics():
-    """Get system load average and process information"""
+    """Get load average, run queue, stall (PSI) and process information"""
     # Get load average (1, 5, 15 minutes)
-    load_avg = os.getloadavg()
-    
-    # Get process information
-    processes = list(psutil.process_iter(['name', 'cpu_percent', 'memory_percent']))
-    total_processes = len(processes)
+    load_avg = procfs.reader().loadavg() if USE_PROCFS else os.getloadavg()
     
-    # Count running processes
-    running_processes = sum(1 for p in processes if p.info.get('status') == psutil.STATUS_RUNNING)
-    sleeping_processes = sum(1 for p in processes if p.info.get('status') == psutil.STATUS_SLEEPING)
-    zombie_processes = sum(1 for p in processes if p.info.get('status') == psutil.STATUS_ZOMBIE)
-    
-    # Get top CPU processes
-    top_processes = sorted(
-        [{'name': p.info['name'], 
-          'cpu_percent': p.info['cpu_percent'] or 0,
-          'memory_percent': p.info['memory_percent'] or 0}
-         for p in processes],
-        key=lambda x: x['cpu_percent'],
-        reverse=True
-    )[:5]
+    # Process counts and top processes (CPU measured since the previous sample)
+    processes = process_sampler.sample()
     
     return {
         'load_average': {
@@ -189,82 +186,157 @@ def get_system_load_metrics():
             '5min': round(load_avg[1], 2),
             '15min': round(load_avg[2], 2)
         },
-        'total_processes': total_processes,
-        'running_processes': running_processes,
-        'sleeping_processes': sleeping_processes,
-        'zombie_processes': zombie_processes,
-        'top_cpu_processes': top_processes,
+        # procs_running / procs_blocked from /proc/stat, /proc/pressure/*
+        **_pressure_sampler.sample(),
+        **processes,
         'timestamp': datetime.now().isoformat()
     }
 
 
-def collect_metrics():
-    """Collect all system metrics"""
+# Metric family -> collector; the daemon refreshes each family on its own interval
+COLLECTORS = {
+    'cpu': get_cpu_metrics,
+    'memory': lambda: {**get_memory_metrics(), **get_swap_metrics()},
+    'disk': get_disk_metrics,
+    'disk_io': get_disk_io_metrics,
+    'network': get_network_metrics,
+    'gpu': get_gpu_metrics,
+    'system_load': get_system_load_metrics,
+    'containers': get_container_metrics,
+}
+
+# Seconds each collector may take before the sample goes out without it
+COLLECTOR_TIMEOUTS = {
+    'cpu': 1,
+    'memory': 1,
+    'network': 1,
+    'disk': 3,
+    'disk_io': 1,
+    'gpu': 3,  # waits for the sampler's first reading (2s)
+    'system_load': 3,
+    'containers': 2,
+}
+
+_engine = None
+
+
+def get_engine():
+    """Shared collection engine of this process"""
+    global _engine
+    if _engine is None:
+        _engine = CollectionEngine(COLLECTORS, COLLECTOR_TIMEOUTS)
+    return _engine
+
+
+def build_metrics(families, timestamp, collection=None):
+    """Assemble a canonical sample from the latest value of each metric family"""
     uname = platform.uname()
     
     metrics = {
-        'timestamp': datetime.now().isoformat(),
-        'system': {
+        'schema_version': SCHEMA_VERSION,
+        'system_info': {
             'hostname': uname.node,
             'platform': 'Linux',
             'version': uname.release,
-            'architecture': uname.machine
+            'architecture': uname.machine,
+            'collection_time': timestamp,
+            'uptime_seconds': int(time.time() - psutil.boot_time())
+        },
+        # A family that has never been collected is left empty
+        'cpu': families.get('cpu', {}),
+        'memory': families.get('memory', {}),
+        'disk': {**families.get('disk', {}), **families.get('disk_io', {})},
+        'network': families.get('network', {}),
+        'gpu': {
+            'gpu': families.get('gpu', {}).get('gpu', {}),
+            'devices': families.get('gpu', {}).get('devices', []),
+            'timestamp': timestamp
         },
-        'cpu': get_cpu_metrics(),
-        'memory': get_memory_metrics(),
-        'swap': get_swap_metrics(),
-        'disk': get_disk_metrics(),
-        'network': get_network_metrics(),
-        'gpu': get_gpu_metrics(),
-        'system_load': get_system_load_metrics()
+        'system_load': families.get('system_load', {})
     }
-    
+    if families.get('containers'):
+        metrics['containers'] = families['containers']
+    if collection is not None:
+        metrics['collection'] = collection
     return metrics
 
 
+def collect_metrics():
+    """Collect all system metrics (canonical schema, see reporting/metrics_schema.py)"""
+    timestamp = datetime.now().isoformat()
+    started = time.monotonic()
+    families, status = get_engine().collect()
+    return build_metrics(families, timestamp, summarize(status, time.monotonic() - started))
+
+
 def print_metrics(metrics):
     """Print metrics in a formatted way"""
     print("=" * 60)
     print("SYSTEM MONITOR - Linux Edition")
     print("=" * 60)
     
-    print(f"\nTimestamp: {metrics['timestamp']}")
-    print(f"Hostname: {metrics['system']['hostname']}")
-    print(f"Platform: {metrics['system']['platform']}")
+    print(f"\nTimestamp: {metrics['system_info']['collection_time']}")
+    print(f"Hostname: {metrics['system_info']['hostname']}")
+    print(f"Platform: {metrics['system_info']['platform']}")
     
     print(f"\nCPU:")
     print(f"   Usage: {metrics['cpu']['usage_percent']}%")
-    print(f"   Cores: {metrics['cpu']['count']}")
-    print(f"   Frequency: {metrics['cpu']['frequency_mhz']} MHz")
-    if metrics['cpu']['temperature']:
-        print(f"   Temperature: {metrics['cpu']['temperature']}°C")
+    print(f"   Cores: {metrics['cpu']['core_count']}")
+    print(f"   Frequency: {metrics['cpu']['frequency_ghz'] * 1000:.0f} MHz")
+    if metrics['cpu']['temperature_celsius'] != 'N/A':
+        print(f"   Temperature: {metrics['cpu']['temperature_celsius']}°C")
+    temperatures = metrics['cpu'].get('temperatures') or {}
+    if len(temperatures) > 1:
+        print("   Sensors: " + ", ".join(f"{key} {value}°C" for key, value in sorted(temperatures.items())))
     
+    memory = metrics['memory']
     print(f"\nMemory:")
-    print(f"   Total: {metrics['memory']['total_gb']} GB")
-    print(f"   Used: {metrics['memory']['used_gb']} GB ({metrics['memory']['percent']}%)")
-    print(f"   Available: {metrics['memory']['available_gb']} GB")
+    print(f"   Total: {memory['total_bytes'] / (1024**3):.2f} GB")
+    print(f"   Used: {memory['used_bytes'] / (1024**3):.2f} GB ({memory['usage_percent']}%)")
+    print(f"   Available: {memory['available_bytes'] / (1024**3):.2f} GB")
     
     print(f"\nSwap:")
-    print(f"   Total: {metrics['swap']['total_gb']} GB")
-    print(f"   Used: {metrics['swap']['used_gb']} GB ({metrics['swap']['percent']}%)")
+    print(f"   Total: {memory['swap_total_bytes'] / (1024**3):.2f} GB")
+    print(f"   Used: {memory['swap_used_bytes'] / (1024**3):.2f} GB ({memory['swap_usage_percent']}%)")
     
     print(f"\nDisk Usage:")
-    for disk in metrics['disk']:
-        print(f"   {disk['device']} ({disk['mountpoint']}):")
-        print(f"      Total: {disk['total_gb']} GB")
-        print(f"      Used: {disk['used_gb']} GB ({disk['percent']}%)")
-        print(f"      Free: {disk['free_gb']} GB")
+    for disk in metrics['disk']['filesystems']:
+        print(f"   {disk['device']} ({disk['mount']}):")
+        print(f"      Total: {disk['total'] / (1024**3):.2f} GB")
+        print(f"      Used: {disk['used'] / (1024**3):.2f} GB ({disk['usage_percent']}%)")
+        print(f"      Free: {disk['available'] / (1024**3):.2f} GB")
     
     print(f"\nNetwork:")
-    print(f"   Sent: {metrics['network']['bytes_sent_mb']} MB ({metrics['network']['packets_sent']} packets)")
-    print(f"   Received: {metrics['network']['bytes_recv_mb']} MB ({metrics['network']['packets_recv']} packets)")
+    for iface in metrics['network']['interfaces']:
+        print(f"   {iface['interface']}:")
+        print(f"      Sent: {iface['tx_bytes'] / (1024**2):.2f} MB ({iface['tx_packets']} packets)")
+        print(f"      Received: {iface['rx_bytes'] / (1024**2):.2f} MB ({iface['rx_packets']} packets)")
+        if 'rx_bytes_per_sec' in iface:
+            print(f"      Rate: {iface['rx_bytes_per_sec'] / 1024:.1f} KB/s in, "
+                  f"{iface['tx_bytes_per_sec'] / 1024:.1f} KB/s out "
+                  f"({iface['errors_per_sec']} err/s, {iface['drops_per_sec']} drop/s)")
+    connections = metrics['network'].get('connections')
+    if connections:
+        print(f"   Connections: {metrics['network']['active_connections']} established, "
+              f"{connections['total']} TCP sockets ({connections['source']}, {connections['duration_ms']} ms)")
+        print(f"      States: " + ', '.join(f"{state} {count}" for state, count in connections['by_state'].items()))
+        for port in connections['listening_ports']:
+            print(f"      Listening :{port['port']} - {port['connections']} established")
+        for peer in connections['top_peers'][:5]:
+            print(f"      Peer {peer['address']} - {peer['connections']} connections")
     
+    gpu = metrics['gpu']['gpu']
     print(f"\nGPU:")
-    if metrics['gpu']['available']:
-        print(f"   Name: {metrics['gpu']['name']}")
-        print(f"   Utilization: {metrics['gpu']['utilization']}%")
-        print(f"   Temperature: {metrics['gpu']['temperature']}°C")
-        print(f"   Memory: {metrics['gpu']['memory_used_mb']} MB / {metrics['gpu']['memory_total_mb']} MB")
+    if gpu['count'] > 0:
+        print(f"   Name: {gpu['name']}")
+        print(f"   Utilization: {gpu['utilization_percent']}%")
+        print(f"   Temperature: {gpu['temperature_celsius']}°C")
+        print(f"   Memory: {gpu['memory_used_bytes'] / (1024**2):.0f} MB / {gpu['memory_total_bytes'] / (1024**2):.0f} MB")
+        if gpu['count'] > 1:
+            for device in metrics['gpu'].get('devices', []):
+                print(f"   [{device['index']}] {device['name']}: {device['utilization_percent']}% util, "
+                      f"{device['temperature_celsius']}°C, {device['memory_percent']}% memory, "
+                      f"{device['power_watts']} W")
     else:
         print("   No GPU detected or nvidia-smi not available")
     
@@ -272,11 +344,23 @@ def print_metrics(metrics):
     print(f"   Load Average: {metrics['system_load']['load_average']['1min']} (1min)")
     print(f"   Total Processes: {metrics['system_load']['total_processes']}")
     print(f"   Running: {metrics['system_load']['running_processes']} | Sleeping: {metrics['system_load']['sleeping_processes']}")
+    print(f"   Run queue: {metrics['system_load']['procs_running']} | Blocked on I/O: {metrics['system_load']['procs_blocked']}")
+    for resource, stall in metrics['system_load']['pressure'].items():
+        print(f"   {resource.upper()} pressure: some {stall['some']['avg10']}%"
+              + (f", full {stall['full']['avg10']}%" if 'full' in stall else "") + " (avg10)")
+    
+    if metrics.get('containers'):
+        print(f"\nContainers ({metrics['containers']['count']}):")
+        for container in metrics['containers']['containers']:
+            print(f"   {container['name']}: {container['cpu_percent']}% CPU "
+                  f"(throttled {container['throttled_percent']}%), "
+                  f"{container['memory_current_bytes'] / (1024**2):.0f} MB, "
+                  f"memory stall {container['pressure']['memory'].get('some', 0)}%")
     
     print("=" * 60)
 
 
-def save_metrics(metrics, filename='latest_linux.json'):
+def save_metrics(metrics, filename='latest_linux.json', verbose=True):
     """Save metrics to JSON file"""
     # Ensure data directory exists
     data_dir = Path(__file__).parent / 'data' / 'metrics'
@@ -284,13 +368,111 @@ def save_metrics(metrics, filename='latest_linux.json'):
     
     filepath = data_dir / filename
     
-    with open(filepath, 'w') as f:
+    # Write-then-rename so the dashboard never reads a half-written file
+    tmp_path = filepath.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
         json.dump(metrics, f, indent=2)
+    os.replace(tmp_path, filepath)
     
-    print(f"\nMetrics saved to: {filepath}")
+    if verbose:
+        print(f"\nMetrics saved to: {filepath}")
+
+
+# Daemon mode (--daemon)
+
+# Seconds between refreshes of each metric family
+DAEMON_INTERVALS = {
+    'cpu': 1,
+    'memory': 1,
+    'gpu': 5,
+    'system_load': 5,
+    # Rates cover the whole write interval
+    'network': 5,
+    'disk_io': 5,
+    'containers': 5,
+    'disk': 60,
+}
+
+# Seconds between samples written to latest.json and the history store
+DAEMON_WRITE_INTERVAL = 5
+
+
+class CollectorDaemon:
+    """Long-running collector that keeps psutil state warm between samples"""
+    
+    def __init__(self, write_interval=DAEMON_WRITE_INTERVAL, intervals=None, metrics_port=None):
+        self.write_interval = write_interval
+        self.intervals = dict(DAEMON_INTERVALS, **(intervals or {}))
+        self.engine = CollectionEngine(COLLECTORS, COLLECTOR_TIMEOUTS)
+        self.metrics_dir = str(Path(__file__).parent / 'data' / 'metrics')
+        self.store = HistoryStore(self.metrics_dir, 'linux')
+        self.scheduler = Scheduler()
+        # Optional Prometheus endpoint, rendered once per written sample
+        self.exposition = exposition.Exposition() if metrics_port else None
+        self.metrics_server = exposition.serve(self.exposition, metrics_port) if metrics_port else None
+        
+        for name, interval in self.intervals.items():
+            self.scheduler.add(name, interval, lambda tick, name=name: self.engine.refresh([name]))
+        # Collectors run on the engine's pool, so a slow one never delays the ticks
+        self.scheduler.add('write', write_interval, self.write)
+    
+    def write(self, tick):
+        """Write a sample stamped with its scheduled tick time"""
+        # A family is stale once it has missed a refresh plus its deadline
+        max_age = {name: interval + COLLECTOR_TIMEOUTS.get(name, interval)
+                   for name, interval in self.intervals.items()}
+        metrics = build_metrics(dict(self.engine.latest), datetime.fromtimestamp(tick).isoformat(),
+                                summarize(self.engine.status_by_age(max_age)))
+        save_metrics(metrics, verbose=False)
+        save_metrics(metrics, 'latest.json', verbose=False)
+        self.store.append(metrics, tick)
+        # Queued for the central reporter when MONITOR_PUSH_URL is set
+        spool.push(metrics)
+        # Sent to InfluxDB when INFLUX_URL is set; failed ranges are replayed from the store
+        influx.write(metrics, 'linux', self.metrics_dir, tick)
+        if self.exposition is not None:
+            self.exposition.update('linux', metrics)
+    
+    def run(self):
+        """Prime every family, then run the scheduler until stopped"""
+        self.engine.collect(list(self.intervals))
+        try:
+            self.scheduler.run()
+        finally:
+            self.engine.close()
+            self.store.close()
+            spool.flush()
+            influx.flush()
+            if self.metrics_server is not None:
+                self.metrics_server.shutdown()
+    
+    def stop(self):
+        self.scheduler.stop()
 
 
 if __name__ == '__main__':
+    import argparse
+    import signal
+    
+    parser = argparse.ArgumentParser(description='Collect Linux system metrics')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep running and write a sample every --interval seconds')
+    parser.add_argument('--interval', type=float, default=DAEMON_WRITE_INTERVAL,
+                        help='seconds between samples in daemon mode (default: %(default)s)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='serve the latest sample for Prometheus on :PORT/metrics in daemon mode')
+    args = parser.parse_args()
+    
+    if args.daemon:
+        daemon = CollectorDaemon(write_interval=args.interval, metrics_port=args.metrics_port)
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+        print(f"Collecting every {args.interval:g}s (Ctrl+C to stop)")
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            pass
+        exit(0)
+    
     try:
         metrics = collect_metrics()
         print_metrics(metrics)
@@ -298,6 +480,8 @@ if __name__ == '__main__':
         
         # Also save as latest.json for backward compatibility
         save_metrics(metrics, 'latest.json')
+        spool.push(metrics)
+        spool.flush()
         
         print("\nJSON Output:")
         print(json.dumps(metrics, indent=2))
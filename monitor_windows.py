@@ -6,9 +6,17 @@ Works on Windows without Bash or complex dependencies
 import platform
 import psutil
 import json
+import time
 import subprocess
 from datetime import datetime
 
+from reporting import cpu_sampler, disk_io, gpu_sampler, influx, mounts, net_io, process_sampler, spool
+from reporting.metrics_schema import SCHEMA_VERSION
+from reporting.history_store import HistoryStore
+
+# History writer, kept open across calls by continuous_monitor.py
+_history_store = None
+
 def get_cpu_temperature():
     """Get CPU temperature from LibreHardwareMonitor WMI"""
     try:
@@ -25,12 +33,20 @@ def get_cpu_temperature():
         pass
     return None
 
+def get_active_connections():
+    """Established TCP connections (GetExtendedTcpTable; cheap on Windows, unlike the Linux scan)"""
+    try:
+        return sum(1 for c in psutil.net_connections('tcp') if c.status == psutil.CONN_ESTABLISHED)
+    except (psutil.AccessDenied, OSError):
+        return 0
+
 def get_system_metrics():
     """Collect basic system metrics on Windows"""
     
-    # CPU metrics - use 1 second interval for accuracy (like Task Manager)
-    cpu_percent = psutil.cpu_percent(interval=1, percpu=False)
-    cpu_per_core = psutil.cpu_percent(interval=0, percpu=True)
+    # CPU metrics - utilisation since the previous collection, without blocking
+    cpu_usage = cpu_sampler.sample()
+    cpu_percent = cpu_usage['usage_percent']
+    cpu_per_core = cpu_usage['per_core']
     cpu_count = psutil.cpu_count()
     cpu_freq = psutil.cpu_freq()
     
@@ -38,150 +54,111 @@ def get_system_metrics():
     memory = psutil.virtual_memory()
     swap = psutil.swap_memory()
     
-    # Disk metrics
-    disk_usage = []
-    for partition in psutil.disk_partitions():
-        try:
-            usage = psutil.disk_usage(partition.mountpoint)
-            disk_usage.append({
-                'device': partition.device,
-                'mountpoint': partition.mountpoint,
-                'total_gb': round(usage.total / (1024**3), 2),
-                'used_gb': round(usage.used / (1024**3), 2),
-                'free_gb': round(usage.free / (1024**3), 2),
-                'percent': usage.percent
-            })
-        except:
-            continue
+    # Disk metrics - cached drive list, each drive queried with its own deadline
+    disk_usage = mounts.filesystems()
+    
+    # Disk I/O rates per physical drive since the previous collection
+    disk_rates = disk_io.sample()
     
-    # Network metrics
-    net_io = psutil.net_io_counters()
+    # Network metrics - per-NIC counters and rates since the previous collection
+    network = net_io.sample()
     
-    # GPU metrics
-    gpu_info = get_gpu_info()
+    # GPU metrics - summary plus one record per device
+    gpu_readings = get_gpu_readings()
+    gpu_info = get_gpu_info(gpu_readings)
     
     # CPU temperature
     cpu_temp = get_cpu_temperature()
     
-    # Process and system load metrics
-    processes = list(psutil.process_iter(['status', 'cpu_percent', 'memory_percent', 'name']))
-    total_processes = len(processes)
-    running_processes = len([p for p in processes if p.info['status'] == 'running'])
-    sleeping_processes = len([p for p in processes if p.info['status'] == 'sleeping'])
+    # Process and system load metrics (CPU measured since the previous sample)
+    processes = process_sampler.sample()
     
-    # Get top CPU processes
-    try:
-        top_cpu_procs = sorted(
-            [p for p in processes if p.info['cpu_percent'] is not None],
-            key=lambda x: x.info['cpu_percent'] or 0,
-            reverse=True
-        )[:5]
-        top_cpu_list = [
-            {
-                'name': p.info['name'],
-                'cpu_percent': p.info['cpu_percent'] or 0,
-                'memory_percent': p.info['memory_percent'] or 0
-            }
-            for p in top_cpu_procs
-        ]
-    except:
-        top_cpu_list = []
+    # Load average from the processor queue length: psutil samples it every
+    # 5 seconds on a background thread, so the first call of a process returns zeros
+    load_1min, load_5min, load_15min = psutil.getloadavg()
     
-    # Calculate load average equivalent for Windows (CPU usage over cores)
-    load_1min = cpu_percent / 100 * cpu_count
-    
-    # System info
+    # System info (canonical schema, see reporting/metrics_schema.py)
+    timestamp = datetime.now().isoformat()
     metrics = {
-        'timestamp': datetime.now().isoformat(),
-        'system': {
+        'schema_version': SCHEMA_VERSION,
+        'system_info': {
             'hostname': platform.node(),
             'platform': platform.system(),
             'version': platform.version(),
-            'architecture': platform.machine()
+            'architecture': platform.machine(),
+            'collection_time': timestamp,
+            'uptime_seconds': int(time.time() - psutil.boot_time())
         },
         'cpu': {
             'usage_percent': cpu_percent,
-            'count': cpu_count,
-            'frequency_mhz': cpu_freq.current if cpu_freq else 0,
-            'temperature': cpu_temp
+            'per_core': cpu_per_core,
+            'temperature_celsius': cpu_temp if cpu_temp is not None else 'N/A',
+            'core_count': cpu_count,
+            'model': platform.processor() or 'Unknown',
+            'frequency_ghz': (cpu_freq.current if cpu_freq else 0) / 1000
         },
         'memory': {
-            'total_gb': round(memory.total / (1024**3), 2),
-            'used_gb': round(memory.used / (1024**3), 2),
-            'available_gb': round(memory.available / (1024**3), 2),
-            'percent': memory.percent
+            'total_bytes': memory.total,
+            'used_bytes': memory.used,
+            'available_bytes': memory.available,
+            'usage_percent': memory.percent,
+            'swap_total_bytes': swap.total,
+            'swap_used_bytes': swap.used,
+            'swap_usage_percent': swap.percent
         },
-        'swap': {
-            'total_gb': round(swap.total / (1024**3), 2),
-            'used_gb': round(swap.used / (1024**3), 2),
-            'percent': swap.percent
+        'disk': {
+            'filesystems': disk_usage,
+            'io_stats': disk_rates['io_stats'],
+            'devices': disk_rates['devices'],
+            'smart_status': 'N/A'
         },
-        'disk': disk_usage,
         'network': {
-            'bytes_sent_mb': round(net_io.bytes_sent / (1024**2), 2),
-            'bytes_recv_mb': round(net_io.bytes_recv / (1024**2), 2),
-            'packets_sent': net_io.packets_sent,
-            'packets_recv': net_io.packets_recv
+            'interfaces': network['interfaces'],
+            'active_connections': get_active_connections(),
+            'active_interface_names': network['active_interface_names'],
+            'rates': network['rates']
+        },
+        'gpu': {
+            'gpu': gpu_info,
+            'devices': gpu_sampler.to_devices(gpu_readings),
+            'timestamp': timestamp
         },
-        'gpu': gpu_info,
         'system_load': {
             'load_average': {
                 '1min': round(load_1min, 2),
-                '5min': round(load_1min, 2),  # Windows doesn't have historical load
-                '15min': round(load_1min, 2)
+                '5min': round(load_5min, 2),
+                '15min': round(load_15min, 2)
             },
-            'total_processes': total_processes,
-            'running_processes': running_processes,
-            'sleeping_processes': sleeping_processes,
-            'zombie_processes': 0,
-            'top_cpu_processes': top_cpu_list,
-            'timestamp': datetime.now().isoformat()
+            **processes,
+            'timestamp': timestamp
         }
     }
     
     return metrics
 
-def get_gpu_info():
-    """Get GPU information if available"""
+def get_gpu_readings():
+    """Newest reading of every GPU from the shared NVML / nvidia-smi sampler"""
     try:
-        import subprocess
-        
-        # Try nvidia-smi for NVIDIA GPUs
-        result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=gpu_name,temperature.gpu,utilization.gpu,memory.used,memory.total', 
-             '--format=csv,noheader'], 
-            capture_output=True, text=True, timeout=3
-        )
-        
-        if result.returncode == 0 and result.stdout.strip():
-            output = result.stdout.strip()
-            parts = [p.strip() for p in output.split(',')]
-            
-            if len(parts) >= 5:
-                gpu_name = parts[0]
-                temp = float(parts[1]) if parts[1].replace('.','').isdigit() else 0
-                util = float(parts[2].replace('%','').strip()) if '%' in parts[2] else float(parts[2])
-                mem_used = float(parts[3].split()[0]) if parts[3] else 0
-                mem_total = float(parts[4].split()[0]) if parts[4] else 1
-                
-                return {
-                    'available': True,
-                    'name': gpu_name,
-                    'temperature': temp,
-                    'utilization': util,
-                    'memory_used_mb': mem_used,
-                    'memory_total_mb': mem_total
-                }
+        return gpu_sampler.latest()
     except:
-        pass
+        return []
+
+def get_gpu_info(readings):
+    """Summary of all GPUs, or the 'No GPU detected' block"""
+    gpu = gpu_sampler.to_canonical(readings)
+    if gpu is not None:
+        return gpu
     
     return {
-        'available': False,
+        'vendor': 'None',
         'name': 'No GPU detected',
-        'temperature': 0,
-        'utilization': 0,
-        'memory_used_mb': 0,
-        'memory_total_mb': 0
+        'count': 0,
+        'utilization_percent': 0,
+        'memory_used_bytes': 0,
+        'memory_total_bytes': 0,
+        'memory_percent': 0,
+        'temperature_celsius': 0,
+        'power_watts': 0
     }
 
 def print_metrics(metrics):
@@ -189,45 +166,57 @@ def print_metrics(metrics):
     print("=" * 60)
     print("SYSTEM MONITOR - Windows Edition")
     print("=" * 60)
-    print(f"\n📅 Timestamp: {metrics['timestamp']}")
-    print(f"🖥️  Hostname: {metrics['system']['hostname']}")
-    print(f"💻 Platform: {metrics['system']['platform']}")
+    print(f"\n📅 Timestamp: {metrics['system_info']['collection_time']}")
+    print(f"🖥️  Hostname: {metrics['system_info']['hostname']}")
+    print(f"💻 Platform: {metrics['system_info']['platform']}")
     
     print(f"\n🔥 CPU:")
     print(f"   Usage: {metrics['cpu']['usage_percent']}%")
-    print(f"   Cores: {metrics['cpu']['count']}")
-    print(f"   Frequency: {metrics['cpu']['frequency_mhz']:.0f} MHz")
-    if metrics['cpu'].get('temperature'):
-        print(f"   Temperature: {metrics['cpu']['temperature']}°C")
+    print(f"   Cores: {metrics['cpu']['core_count']}")
+    print(f"   Frequency: {metrics['cpu']['frequency_ghz'] * 1000:.0f} MHz")
+    if metrics['cpu'].get('temperature_celsius') not in (None, 'N/A'):
+        print(f"   Temperature: {metrics['cpu']['temperature_celsius']}°C")
     
+    memory = metrics['memory']
     print(f"\n💾 Memory:")
-    print(f"   Total: {metrics['memory']['total_gb']} GB")
-    print(f"   Used: {metrics['memory']['used_gb']} GB ({metrics['memory']['percent']}%)")
-    print(f"   Available: {metrics['memory']['available_gb']} GB")
+    print(f"   Total: {memory['total_bytes'] / (1024**3):.2f} GB")
+    print(f"   Used: {memory['used_bytes'] / (1024**3):.2f} GB ({memory['usage_percent']}%)")
+    print(f"   Available: {memory['available_bytes'] / (1024**3):.2f} GB")
     
-    if metrics['swap']['total_gb'] > 0:
+    if memory['swap_total_bytes'] > 0:
         print(f"\n💿 Swap:")
-        print(f"   Total: {metrics['swap']['total_gb']} GB")
-        print(f"   Used: {metrics['swap']['used_gb']} GB ({metrics['swap']['percent']}%)")
+        print(f"   Total: {memory['swap_total_bytes'] / (1024**3):.2f} GB")
+        print(f"   Used: {memory['swap_used_bytes'] / (1024**3):.2f} GB ({memory['swap_usage_percent']}%)")
     
     print(f"\n📀 Disk Usage:")
-    for disk in metrics['disk']:
-        print(f"   {disk['mountpoint']} ({disk['device']}):")
-        print(f"      Total: {disk['total_gb']} GB")
-        print(f"      Used: {disk['used_gb']} GB ({disk['percent']}%)")
-        print(f"      Free: {disk['free_gb']} GB")
+    for disk in metrics['disk']['filesystems']:
+        print(f"   {disk['mount']} ({disk['device']}):")
+        print(f"      Total: {disk['total'] / (1024**3):.2f} GB")
+        print(f"      Used: {disk['used'] / (1024**3):.2f} GB ({disk['usage_percent']}%)")
+        print(f"      Free: {disk['available'] / (1024**3):.2f} GB")
     
     print(f"\n🌐 Network:")
-    print(f"   Sent: {metrics['network']['bytes_sent_mb']} MB ({metrics['network']['packets_sent']} packets)")
-    print(f"   Received: {metrics['network']['bytes_recv_mb']} MB ({metrics['network']['packets_recv']} packets)")
+    for iface in metrics['network']['interfaces']:
+        print(f"   {iface['interface']}:")
+        print(f"      Sent: {iface['tx_bytes'] / (1024**2):.2f} MB ({iface['tx_packets']} packets)")
+        print(f"      Received: {iface['rx_bytes'] / (1024**2):.2f} MB ({iface['rx_packets']} packets)")
+        if 'rx_bytes_per_sec' in iface:
+            print(f"      Rate: {iface['rx_bytes_per_sec'] / 1024:.1f} KB/s in, "
+                  f"{iface['tx_bytes_per_sec'] / 1024:.1f} KB/s out "
+                  f"({iface['errors_per_sec']} err/s, {iface['drops_per_sec']} drop/s)")
     
-    if metrics.get('gpu', {}).get('available', False):
-        gpu = metrics['gpu']
+    gpu = metrics['gpu']['gpu']
+    if gpu['count'] > 0:
         print(f"\n🎮 GPU:")
         print(f"   Name: {gpu['name']}")
-        print(f"   Utilization: {gpu['utilization']}%")
-        print(f"   Temperature: {gpu['temperature']}°C")
-        print(f"   Memory: {gpu['memory_used_mb']:.0f} MB / {gpu['memory_total_mb']:.0f} MB")
+        print(f"   Utilization: {gpu['utilization_percent']}%")
+        print(f"   Temperature: {gpu['temperature_celsius']}°C")
+        print(f"   Memory: {gpu['memory_used_bytes'] / (1024**2):.0f} MB / {gpu['memory_total_bytes'] / (1024**2):.0f} MB")
+        if gpu['count'] > 1:
+            for device in metrics['gpu'].get('devices', []):
+                print(f"   [{device['index']}] {device['name']}: {device['utilization_percent']}% util, "
+                      f"{device['temperature_celsius']}°C, {device['memory_percent']}% memory, "
+                      f"{device['power_watts']} W")
     
     if metrics.get('system_load'):
         load = metrics['system_load']
@@ -245,7 +234,6 @@ def print_metrics(metrics):
 def save_metrics(metrics, filename='data/metrics/latest_windows.json'):
     """Save metrics to JSON file and history"""
     import os
-    from datetime import datetime
     
     os.makedirs(os.path.dirname(filename), exist_ok=True)
     
@@ -257,13 +245,17 @@ def save_metrics(metrics, filename='data/metrics/latest_windows.json'):
     with open('data/metrics/latest.json', 'w') as f:
         json.dump(metrics, f, indent=2)
     
-    # Save to history with timestamp
-    history_dir = 'data/metrics/history'
-    os.makedirs(history_dir, exist_ok=True)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    history_file = os.path.join(history_dir, f'windows_metrics_{timestamp}.json')
-    with open(history_file, 'w') as f:
-        json.dump(metrics, f, indent=2)
+    # Append to the hourly history segment (one compact line per sample),
+    # to the numeric chart columns, and close any finished rollup buckets
+    global _history_store
+    if _history_store is None:
+        _history_store = HistoryStore('data/metrics', 'windows')
+    _history_store.append(metrics)
+    
+    # Queued for the central reporter when MONITOR_PUSH_URL is set; sent in the background
+    spool.push(metrics)
+    # Batched to InfluxDB when INFLUX_URL is set; failed ranges are replayed from the history
+    influx.write(metrics, 'windows', 'data/metrics')
     
     print(f"\n✅ Metrics saved to: {filename}")
 
@@ -283,6 +275,9 @@ if __name__ == '__main__':
         
         # Save to file
         save_metrics(metrics)
+        # One-shot run: send what is spooled now (anything left waits for the next run)
+        spool.flush()
+        influx.flush()
         
         # Also save as JSON for viewing (only if not in silent mode)
         if not silent_mode:
@@ -298,5 +293,5 @@ if __name__ == '__main__':
             # In silent mode, just write error to file
             import traceback
             with open('data/logs/monitor_error.log', 'a', encoding='utf-8') as f:
-                f.write(f"\n[{metrics.get('timestamp', 'unknown')}] Error: {e}\n")
+                f.write(f"\n[{datetime.now().isoformat()}] Error: {e}\n")
                 f.write(traceback.format_exc())
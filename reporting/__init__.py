@@ -0,0 +1,5 @@
+"""
+System Monitor Reporting
+Dashboard server plus the history, schema and collector modules it shares
+with the agents. Run from the project root, e.g. python -m reporting.reporter
+"""
@@ -0,0 +1,177 @@
+"""
+Alert Evaluation
+In-process equivalent of scripts/alert_manager.sh
+
+Thresholds come from config/alert_thresholds.conf (shell KEY=VALUE syntax,
+shared with the bash scripts). Alerts are appended to data/alerts/alerts.log
+in the same "[time] [SEVERITY] Component: message (value: ...)" format.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+from datetime import datetime, timezone
+
+_ASSIGNMENT = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)=(.*)$')
+_REFERENCE = re.compile(r'\$\{([A-Za-z_][A-Za-z0-9_]*)\}|\$([A-Za-z_][A-Za-z0-9_]*)')
+
+
+def read_shell_config(path, environ=None):
+    """Parse a sourced-by-bash KEY=VALUE file (comments, quotes, ${VAR} references)"""
+    environ = dict(os.environ if environ is None else environ)
+    values = {}
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except OSError:
+        return values
+
+    for line in lines:
+        match = _ASSIGNMENT.match(line)
+        if not match:
+            continue
+        key, value = match.group(1), match.group(2).strip()
+        if value[:1] in ('"', "'"):
+            quote = value[0]
+            value = value[1:value.find(quote, 1)] if quote in value[1:] else value[1:]
+        else:
+            value = value.split('#', 1)[0].strip()
+        scope = dict(environ, **values)
+        value = _REFERENCE.sub(lambda m: scope.get(m.group(1) or m.group(2), ''), value)
+        values[key] = value
+    return values
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _format(value):
+    """Render a number the way the bash scripts print it"""
+    return f'{value:g}' if isinstance(value, float) else str(value)
+
+
+class AlertEvaluator:
+    """Checks samples against thresholds and records the alerts they raise"""
+
+    def __init__(self, thresholds_file, alert_log, notify=True, log=None):
+        self.thresholds = {
+            key: number for key, number in
+            ((key, _number(value)) for key, value in read_shell_config(thresholds_file).items())
+            if number is not None
+        }
+        self.alert_log = alert_log
+        self.notify = notify and shutil.which('notify-send') is not None
+        self.log = log
+
+    def _level(self, value, name):
+        """CRITICAL / WARNING / None for a value against <NAME>_WARNING / _CRITICAL"""
+        critical = self.thresholds.get(f'{name}_CRITICAL')
+        warning = self.thresholds.get(f'{name}_WARNING')
+        if critical is not None and value >= critical:
+            return 'CRITICAL'
+        if warning is not None and value >= warning:
+            return 'WARNING'
+        return None
+
+    def evaluate(self, metrics):
+        """Return [(severity, component, message, value)] for a bash-schema sample"""
+        alerts = []
+
+        def check(value, name, component, what, unit, skip_zero=False):
+            value = _number(value)
+            if value is None or value < 0 or (skip_zero and value == 0):
+                return
+            level = self._level(value, name)
+            if level:
+                state = 'critical' if level == 'CRITICAL' else 'high'
+                alerts.append((level, component, f'{what} {state}', f'{_format(value)}{unit}'))
+
+        cpu = metrics.get('cpu') or {}
+        memory = metrics.get('memory') or {}
+        network = metrics.get('network') or {}
+        gpu = (metrics.get('gpu') or {}).get('gpu') or {}
+        load = (metrics.get('system_load') or {}).get('load_average') or {}
+
+        check(cpu.get('usage_percent'), 'CPU_USAGE', 'CPU', 'CPU usage', '%')
+        check(cpu.get('temperature_celsius'), 'CPU_TEMP', 'CPU', 'CPU temperature', '°C')
+        check(memory.get('usage_percent'), 'MEMORY_USAGE', 'Memory', 'Memory usage', '%')
+        check(memory.get('swap_usage_percent'), 'SWAP_USAGE', 'Swap', 'Swap usage', '%')
+        check(network.get('active_connections'), 'MAX_CONNECTIONS', 'Network', 'Established connections', '')
+
+        for fs in (metrics.get('disk') or {}).get('filesystems') or []:
+            if fs.get('reachable') is False:
+                alerts.append(('WARNING', 'Disk', f"Filesystem not responding on {fs.get('mount')}",
+                               'unreachable'))
+                continue
+            usage = _number(fs.get('usage_percent'))
+            level = self._level(usage, 'DISK_USAGE') if usage is not None else None
+            if level:
+                state = 'critical' if level == 'CRITICAL' else 'high'
+                alerts.append((level, 'Disk', f"Disk usage {state} on {fs.get('mount')}",
+                               f'{_format(usage)}%'))
+
+        # Saturation: share of wall time each device had I/O in flight
+        for device in (metrics.get('disk') or {}).get('devices') or []:
+            busy = _number(device.get('busy_percent'))
+            level = self._level(busy, 'DISK_BUSY') if busy is not None else None
+            if level:
+                state = 'critical' if level == 'CRITICAL' else 'high'
+                alerts.append((level, 'Disk I/O', f"Disk busy time {state} on {device.get('device')}",
+                               f'{_format(busy)}%'))
+
+        load1 = _number(load.get('1min'))
+        cores = _number(cpu.get('core_count'))
+        if load1 is not None and cores:
+            normalized = round(load1 / cores, 2)
+            level = self._level(normalized, 'LOAD')
+            if level:
+                state = 'critical' if level == 'CRITICAL' else 'high'
+                alerts.append((level, 'System Load', f'System load {state}',
+                               f'{_format(load1)} (normalized: {normalized:.2f})'))
+
+        # Stall time says whether the host is actually starved, which load cannot
+        pressure = (metrics.get('system_load') or {}).get('pressure') or {}
+        for resource, component in (('cpu', 'CPU'), ('memory', 'Memory'), ('io', 'Disk I/O')):
+            some = (pressure.get(resource) or {}).get('some') or {}
+            check(some.get('avg60'), f'{resource.upper()}_PRESSURE', component,
+                  f'{component} pressure stall', '%', skip_zero=True)
+
+        # Multi-GPU hosts: the summary averages utilization, so check each device
+        devices = (metrics.get('gpu') or {}).get('devices') or []
+        if len(devices) > 1:
+            for device in devices:
+                what = f"GPU {device.get('index')}"
+                check(device.get('utilization_percent'), 'GPU_USAGE', 'GPU', f'{what} utilization', '%', skip_zero=True)
+                check(device.get('temperature_celsius'), 'GPU_TEMP', 'GPU', f'{what} temperature', '°C', skip_zero=True)
+        else:
+            check(gpu.get('utilization_percent'), 'GPU_USAGE', 'GPU', 'GPU utilization', '%', skip_zero=True)
+            check(gpu.get('temperature_celsius'), 'GPU_TEMP', 'GPU', 'GPU temperature', '°C', skip_zero=True)
+        return alerts
+
+    def record(self, alerts):
+        """Append alerts to the alert log (and desktop notifications when available)"""
+        if not alerts:
+            return
+        os.makedirs(os.path.dirname(self.alert_log), exist_ok=True)
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        with open(self.alert_log, 'a', encoding='utf-8') as f:
+            for severity, component, message, value in alerts:
+                f.write(f'[{timestamp}] [{severity}] {component}: {message} (value: {value})\n')
+        for severity, component, message, value in alerts:
+            if self.log:
+                self.log(severity, f'{component}: {message} (value: {value})')
+            if self.notify:
+                subprocess.run(['notify-send', '-u', 'critical',
+                                f'System Monitor Alert [{severity}]', f'{component}: {message}'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def process(self, metrics):
+        """Evaluate and record; returns the alerts raised"""
+        alerts = self.evaluate(metrics)
+        self.record(alerts)
+        return alerts
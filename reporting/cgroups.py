@@ -0,0 +1,237 @@
+"""
+Container Metrics (cgroup v2)
+Per-container CPU, throttling, memory, I/O and pressure stall figures
+
+Containers are found by walking the unified hierarchy for cgroups named
+after a 64-hex container id (docker-<id>.scope, libpod-<id>.scope,
+cri-containerd-<id>.scope, docker/<id> ...). The walk is cached and
+repeated every RESCAN_SECONDS; between walks each tick only reads the
+handful of interface files of the known containers, and a container whose
+cgroup has gone is dropped at once. Files are opened per read rather than
+kept open: hundreds of containers times eight files would exhaust the
+descriptor limit. Counters become rates over the real time between ticks
+(see reporting/disk_io.py). Names are resolved once per container id.
+"""
+
+import os
+import re
+import json
+import errno
+import time
+import threading
+
+from reporting import procfs
+
+# Repeat the hierarchy walk this often to find new containers
+RESCAN_SECONDS = 10
+
+# Container runtime state mounted into the collector (docker-compose.yml)
+DOCKER_CONTAINERS_DIR = os.environ.get('DOCKER_CONTAINERS_DIR', '/var/lib/docker/containers')
+
+_CONTAINER_CGROUP = re.compile(
+    r'^(?:docker-|libpod-|cri-containerd-|crio-|containerd-)?([0-9a-f]{64})(?:\.scope)?$')
+
+PRESSURE_RESOURCES = ('cpu', 'memory', 'io')
+
+
+def cgroup_root():
+    return procfs.sys_path('fs', 'cgroup')
+
+
+def is_cgroup_v2(root):
+    """The unified hierarchy has cgroup.controllers at its root"""
+    return os.path.exists(os.path.join(root, 'cgroup.controllers'))
+
+
+def _read(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, 65536).decode()
+    finally:
+        os.close(fd)
+
+
+def _read_optional(path):
+    """Contents, or None for files this kernel or controller set does not provide"""
+    try:
+        return _read(path)
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        # *.pressure with PSI disabled (psi=0 or cgroup.pressure 0)
+        if e.errno == errno.EOPNOTSUPP:
+            return None
+        raise
+
+
+def parse_flat_keyed(text):
+    """'key value' lines (cpu.stat, memory.stat) -> {key: int}"""
+    values = {}
+    for line in (text or '').splitlines():
+        key, _, value = line.partition(' ')
+        if value.isdigit():
+            values[key] = int(value)
+    return values
+
+
+def parse_io_stat(text):
+    """io.stat -> (read bytes, write bytes) summed over devices"""
+    read_bytes = write_bytes = 0
+    for line in (text or '').splitlines():
+        for field in line.split()[1:]:
+            key, _, value = field.partition('=')
+            if key == 'rbytes':
+                read_bytes += int(value)
+            elif key == 'wbytes':
+                write_bytes += int(value)
+    return read_bytes, write_bytes
+
+
+def parse_pressure(text):
+    """PSI file -> {'some': avg10, 'full': avg10} (% of wall time stalled, last 10s)"""
+    return {kind: values.get('avg10', 0.0) for kind, values in procfs.parse_pressure(text or '').items()}
+
+
+def _parse_limit(text):
+    text = (text or '').strip()
+    return int(text) if text.isdigit() else None
+
+
+def docker_name(container_id, containers_dir=DOCKER_CONTAINERS_DIR):
+    """Container name from the Docker runtime config, or None"""
+    try:
+        with open(os.path.join(containers_dir, container_id, 'config.v2.json')) as f:
+            return json.load(f).get('Name', '').lstrip('/') or None
+    except (OSError, ValueError):
+        return None
+
+
+class CgroupSampler:
+    """Keeps the container list and last counters; sample() returns rates since then"""
+
+    def __init__(self, root=None, resolve_name=None, rescan_seconds=RESCAN_SECONDS):
+        self.root = root or cgroup_root()
+        self.resolve_name = resolve_name or docker_name
+        self.rescan_seconds = rescan_seconds
+        self._containers = {}   # id -> cgroup directory
+        self._names = {}        # id -> name, resolved once
+        self._scanned = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        return is_cgroup_v2(self.root)
+
+    def _walk(self, directory, found):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            match = _CONTAINER_CGROUP.match(entry.name)
+            if match:
+                # Children of a container cgroup belong to that container
+                found.setdefault(match.group(1), entry.path)
+            else:
+                self._walk(entry.path, found)
+
+    def _rescan(self):
+        now = time.monotonic()
+        if self._scanned is not None and now - self._scanned < self.rescan_seconds:
+            return
+        found = {}
+        self._walk(self.root, found)
+        self._containers = found
+        self._scanned = now
+        for container_id in found:
+            if container_id not in self._names:
+                self._names[container_id] = self.resolve_name(container_id) or container_id[:12]
+
+    def _read_container(self, path):
+        """Raw counters of one container; raises OSError once its cgroup is gone"""
+        cpu = parse_flat_keyed(_read(os.path.join(path, 'cpu.stat')))
+        reads, writes = parse_io_stat(_read_optional(os.path.join(path, 'io.stat')))
+        return {
+            'cpu': cpu,
+            'io': (reads, writes),
+            'memory_current': _parse_limit(_read(os.path.join(path, 'memory.current'))) or 0,
+            # memory.peak needs Linux 5.19
+            'memory_peak': _parse_limit(_read_optional(os.path.join(path, 'memory.peak'))),
+            'memory_max': _parse_limit(_read_optional(os.path.join(path, 'memory.max'))),
+            'pressure': {resource: parse_pressure(_read_optional(os.path.join(path, f'{resource}.pressure')))
+                         for resource in PRESSURE_RESOURCES},
+        }
+
+    def sample(self):
+        """
+        {'containers': [...], 'count', 'interval'}: per container its name,
+        CPU use in % of one core, throttled share of CFS periods, memory
+        current / peak / limit, I/O byte counters and rates, and PSI avg10
+        stall percentages. The first call reports zero rates.
+        """
+        with self._lock:
+            self._rescan()
+            now = time.monotonic()
+            readings = {}
+            for container_id, path in list(self._containers.items()):
+                try:
+                    readings[container_id] = self._read_container(path)
+                except OSError:
+                    # Container stopped since the last walk
+                    del self._containers[container_id]
+                    self._names.pop(container_id, None)
+            previous = self._snapshot
+            self._snapshot = (now, readings)
+
+        elapsed = now - previous[0] if previous else 0
+        containers = []
+        for container_id, r in sorted(readings.items(), key=lambda item: self._names.get(item[0], '')):
+            cpu, (reads, writes) = r['cpu'], r['io']
+            row = {
+                'id': container_id[:12],
+                'name': self._names.get(container_id, container_id[:12]),
+                'cpu_usage_seconds': round(cpu.get('usage_usec', 0) / 1e6, 3),
+                'throttled_periods': cpu.get('nr_throttled', 0),
+                'throttled_seconds': round(cpu.get('throttled_usec', 0) / 1e6, 3),
+                'memory_current_bytes': r['memory_current'],
+                'memory_peak_bytes': r['memory_peak'],
+                'memory_limit_bytes': r['memory_max'],
+                'io_read_bytes': reads,
+                'io_write_bytes': writes,
+                'pressure': r['pressure'],
+            }
+            before = previous[1].get(container_id) if previous else None
+            if before is not None and elapsed > 0:
+                periods = cpu.get('nr_periods', 0) - before['cpu'].get('nr_periods', 0)
+                throttled = cpu.get('nr_throttled', 0) - before['cpu'].get('nr_throttled', 0)
+                row.update({
+                    'cpu_percent': round(max(0, cpu.get('usage_usec', 0) - before['cpu'].get('usage_usec', 0))
+                                         / 1e6 / elapsed * 100, 1),
+                    'throttled_percent': round(throttled / periods * 100, 1) if periods > 0 else 0.0,
+                    'io_read_bytes_per_sec': round(max(0, reads - before['io'][0]) / elapsed, 1),
+                    'io_write_bytes_per_sec': round(max(0, writes - before['io'][1]) / elapsed, 1),
+                })
+            else:
+                row.update({'cpu_percent': 0.0, 'throttled_percent': 0.0,
+                            'io_read_bytes_per_sec': 0.0, 'io_write_bytes_per_sec': 0.0})
+            containers.append(row)
+
+        return {'containers': containers, 'count': len(containers), 'interval': round(elapsed, 3)}
+
+
+# Shared by the collectors of one process
+_default = None
+_default_lock = threading.Lock()
+
+
+def sample():
+    """Sample containers with the process-wide sampler (None without cgroup v2)"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = CgroupSampler()
+    if not _default.available():
+        return None
+    return _default.sample()
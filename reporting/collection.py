@@ -0,0 +1,157 @@
+"""
+Concurrent Collection Engine
+Runs independent metric collectors on a thread pool with per-collector deadlines
+
+A sample takes roughly as long as its slowest collector instead of the sum
+of all of them. A collector that misses its deadline does not hold up the
+sample: its previous value is reused and marked 'stale', or it is reported
+as 'missing' if it never produced one. A late collector keeps running in
+the background and is not started again until it finishes, so a hung
+subprocess cannot pile up threads; later collections do not wait for it
+again.
+
+Deadlines count from submission, so a collector must never wait in the pool
+queue behind others: by default the pool has one worker per collector, which
+is enough since a collector is never running twice.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# Collector status values
+OK = 'ok'
+STALE = 'stale'
+MISSING = 'missing'
+ERROR = 'error'
+
+DEFAULT_TIMEOUT = 2.0
+
+
+class CollectionEngine:
+    """Collects {name: collector()} concurrently, keeping the last good values"""
+
+    def __init__(self, collectors, timeouts=None, default_timeout=DEFAULT_TIMEOUT,
+                 max_workers=None):
+        self.collectors = dict(collectors)
+        # None: one worker per collector, grown as collectors are added
+        self.max_workers = max_workers
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.latest = {}
+        self.updated = {}
+        self.status = {}
+        self.errors = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._pool = None
+        self._resize_pool()
+
+    def _resize_pool(self):
+        """Make sure every collector can run at once, replacing a pool that is too small"""
+        workers = self.max_workers or max(1, len(self.collectors))
+        if workers <= self._workers:
+            return
+        # Runs already on the old pool finish there and still report back
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='collector')
+        self._workers = workers
+
+    def _submit(self, name):
+        """Start a collector unless its previous run is still in flight; returns (future, started)"""
+        future = self._pending.get(name)
+        if future is None or future.done():
+            future = self._pool.submit(self.collectors[name])
+            future.add_done_callback(lambda f, name=name: self._store(name, f))
+            self._pending[name] = future
+            return future, True
+        return future, False
+
+    def _store(self, name, future):
+        """Keep the result of a finished collector, even one that finished late"""
+        if name not in self.collectors:
+            return
+        try:
+            value = future.result()
+        except Exception as e:
+            self.errors[name] = str(e)
+            return
+        self.latest[name] = value
+        self.updated[name] = time.monotonic()
+        self.errors.pop(name, None)
+
+    def set_collectors(self, collectors):
+        """Replace the collector set (e.g. mounts came and went); drops state of removed ones"""
+        with self._lock:
+            self.collectors = dict(collectors)
+            self._resize_pool()
+            for state in (self.latest, self.updated, self.status, self.errors, self._pending):
+                for name in list(state):
+                    if name not in self.collectors:
+                        del state[name]
+
+    def refresh(self, names=None):
+        """Start the named collectors without waiting; results land in `latest`"""
+        with self._lock:
+            for name in names or self.collectors:
+                self._submit(name)
+
+    def status_by_age(self, max_age):
+        """Status of every collector from the age of its last result ({name: seconds})"""
+        now = time.monotonic()
+        status = {}
+        for name in self.collectors:
+            if name not in self.updated:
+                status[name] = ERROR if name in self.errors else MISSING
+            elif now - self.updated[name] > max_age.get(name, self.default_timeout):
+                status[name] = STALE
+            else:
+                status[name] = OK
+        return status
+
+    def collect(self, names=None):
+        """
+        Run the named collectors (default: all) and return (values, status).
+        values holds the newest value of every requested collector that has
+        ever succeeded; status maps each name to ok/stale/missing/error.
+        """
+        names = list(names or self.collectors)
+        started = time.monotonic()
+        with self._lock:
+            futures = {name: self._submit(name) for name in names}
+
+        for name, (future, fresh) in futures.items():
+            # A run still in flight from an earlier collection already missed its deadline
+            deadline = started + self.timeouts.get(name, self.default_timeout) if fresh else started
+            try:
+                value = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                status = STALE if name in self.latest else MISSING
+            except Exception:
+                status = STALE if name in self.latest else ERROR
+            else:
+                # Also stored by the done callback, which may not have run yet
+                self.latest[name] = value
+                status = OK
+            self.status[name] = status
+
+        values = {name: self.latest[name] for name in names if name in self.latest}
+        status = {name: self.status[name] for name in names}
+        return values, status
+
+    def close(self):
+        """Stop the worker threads (in-flight collectors are not waited for)"""
+        self._pool.shutdown(wait=False)
+
+
+def summarize(status, duration=None):
+    """'collection' block of a sample: which families are not fresh (and how long it took)"""
+    summary = {
+        'stale': sorted(name for name, s in status.items() if s == STALE),
+        'missing': sorted(name for name, s in status.items() if s in (MISSING, ERROR)),
+    }
+    if duration is not None:
+        summary['duration_ms'] = round(duration * 1000, 1)
+    return summary
@@ -0,0 +1,421 @@
+"""
+Columnar Metrics Store
+Fixed-width, memory-mappable time series for the numeric chart metrics
+
+Layout: data/metrics/columns/<source>/<YYYYMMDD>/<column>.f64
+
+Per-GPU series live in the companion source '<source>.gpu', one column per
+device and field ('gpu<index>.<field>'). Its columns appear as devices do;
+a device that goes away simply stops getting values (NaN).
+
+Writers delete whole day partitions once they are older than the retention
+period (the same 7 days as the segment log), so the raw columns, the rollup
+tiers and the per-GPU columns stay bounded like the rest of the history.
+
+Every column (including 'timestamp', epoch seconds) is a flat little-endian
+float64 array with one value per sample, so a time-range query is a binary
+search on the timestamp column followed by one slice of each column. Readers
+map the files with NumPy and never parse JSON or build per-sample dicts.
+The writer only needs the standard library.
+"""
+
+import os
+import sys
+import math
+import time
+import shutil
+import bisect
+import struct
+from array import array
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COLUMN_SUFFIX = '.f64'
+PARTITION_FORMAT = '%Y%m%d'
+VALUE = struct.Struct('<d')
+TIMESTAMP = 'timestamp'
+
+
+def _get(data, *keys):
+    """Walk nested keys, returning NaN when any level is missing"""
+    for key in keys:
+        if not isinstance(data, dict) or data.get(key) is None:
+            return math.nan
+        data = data[key]
+    try:
+        return float(data)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _interface_sum(data, field):
+    """Sum a counter over all network interfaces of a sample"""
+    interfaces = data.get('network', {}).get('interfaces') or []
+    return float(sum(iface.get(field) or 0 for iface in interfaces)) if interfaces else math.nan
+
+
+# Column name -> extractor for a canonical sample (reporting/metrics_schema.py)
+COLUMNS = {
+    'cpu.usage_percent': lambda m: _get(m, 'cpu', 'usage_percent'),
+    'memory.percent': lambda m: _get(m, 'memory', 'usage_percent'),
+    'swap.percent': lambda m: _get(m, 'memory', 'swap_usage_percent'),
+    'network.bytes_sent': lambda m: _interface_sum(m, 'tx_bytes'),
+    'network.bytes_recv': lambda m: _interface_sum(m, 'rx_bytes'),
+    'network.rx_bytes_per_sec': lambda m: _get(m, 'network', 'rates', 'rx_bytes_per_sec'),
+    'network.tx_bytes_per_sec': lambda m: _get(m, 'network', 'rates', 'tx_bytes_per_sec'),
+    'network.errors_per_sec': lambda m: _get(m, 'network', 'rates', 'errors_per_sec'),
+    'network.drops_per_sec': lambda m: _get(m, 'network', 'rates', 'drops_per_sec'),
+    'network.utilization_percent': lambda m: _get(m, 'network', 'rates', 'utilization_percent'),
+    'disk.read_bytes_per_sec': lambda m: _get(m, 'disk', 'io_stats', 'read_bytes_per_sec'),
+    'disk.write_bytes_per_sec': lambda m: _get(m, 'disk', 'io_stats', 'write_bytes_per_sec'),
+    'disk.read_iops': lambda m: _get(m, 'disk', 'io_stats', 'read_iops'),
+    'disk.write_iops': lambda m: _get(m, 'disk', 'io_stats', 'write_iops'),
+    'disk.busy_percent': lambda m: _get(m, 'disk', 'io_stats', 'busy_percent'),
+    'load.procs_running': lambda m: _get(m, 'system_load', 'procs_running'),
+    'load.procs_blocked': lambda m: _get(m, 'system_load', 'procs_blocked'),
+    # Stall share over each sample interval (Linux PSI)
+    'pressure.cpu_some': lambda m: _get(m, 'system_load', 'pressure', 'cpu', 'some', 'percent'),
+    'pressure.memory_some': lambda m: _get(m, 'system_load', 'pressure', 'memory', 'some', 'percent'),
+    'pressure.memory_full': lambda m: _get(m, 'system_load', 'pressure', 'memory', 'full', 'percent'),
+    'pressure.io_some': lambda m: _get(m, 'system_load', 'pressure', 'io', 'some', 'percent'),
+    'pressure.io_full': lambda m: _get(m, 'system_load', 'pressure', 'io', 'full', 'percent'),
+}
+
+
+# Per-device GPU fields kept in the '<source>.gpu' columns
+GPU_DEVICE_FIELDS = ('utilization_percent', 'memory_percent', 'temperature_celsius',
+                     'power_watts', 'clock_graphics_mhz')
+
+
+def gpu_source(source):
+    """Column store source name of the per-GPU columns"""
+    return f'{source}.gpu'
+
+
+def _device_value(data, index, field):
+    for device in (data.get('gpu') or {}).get('devices') or []:
+        if device.get('index') == index:
+            return _get(device, field)
+    return math.nan
+
+
+def gpu_device_columns(metrics):
+    """Column name -> extractor for every GPU listed in a sample"""
+    columns = {}
+    for device in (metrics.get('gpu') or {}).get('devices') or []:
+        index = device.get('index')
+        if index is None:
+            continue
+        for field in GPU_DEVICE_FIELDS:
+            columns[f'gpu{index}.{field}'] = (
+                lambda m, index=index, field=field: _device_value(m, index, field))
+    return columns
+
+
+def _extract(extract, metrics):
+    """Value of one column for a sample; NaN for an unknown column or a bad value"""
+    if extract is None:
+        return math.nan
+    try:
+        return extract(metrics)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def partition_name(timestamp):
+    """Day partition (local time) that holds a timestamp"""
+    return datetime.fromtimestamp(timestamp).strftime(PARTITION_FORMAT)
+
+
+def _column_path(partition_dir, column):
+    return os.path.join(partition_dir, column + COLUMN_SUFFIX)
+
+
+class ColumnWriter:
+    """Appends one row per sample to the column files of a source"""
+
+    def __init__(self, columns_dir, source, columns=None, retention_days=7):
+        self.directory = os.path.join(columns_dir, source)
+        self.columns = dict(COLUMNS if columns is None else columns)
+        self.retention_days = retention_days
+        self._partition = None
+        self._files = {}
+
+    def _open_partition(self, partition):
+        """Open (and if needed repair) the column files of a day partition"""
+        self.close()
+        partition_dir = os.path.join(self.directory, partition)
+        if not os.path.isdir(partition_dir):
+            self.prune()
+        os.makedirs(partition_dir, exist_ok=True)
+
+        names = list(self.columns) + [TIMESTAMP]
+        paths = {name: _column_path(partition_dir, name) for name in names}
+
+        # A writer killed mid-row leaves columns of different lengths;
+        # cut every column back to the last complete row before appending.
+        # Columns added since the partition was started are back-filled with NaN.
+        sizes = [os.path.getsize(path) for path in paths.values() if os.path.exists(path)]
+        rows = min(sizes) // VALUE.size if sizes else 0
+        for name, path in paths.items():
+            f = open(path, 'ab')
+            if f.tell() > rows * VALUE.size:
+                f.truncate(rows * VALUE.size)
+                f.seek(0, os.SEEK_END)
+            elif f.tell() < rows * VALUE.size:
+                f.truncate(f.tell() - f.tell() % VALUE.size)
+                f.seek(0, os.SEEK_END)
+                f.write(VALUE.pack(math.nan) * (rows - f.tell() // VALUE.size))
+            self._files[name] = f
+        self._partition = partition
+
+    def prune(self):
+        """Delete whole day partitions older than the retention period"""
+        if not self.retention_days or not os.path.isdir(self.directory):
+            return
+        cutoff = partition_name(time.time() - self.retention_days * 86400)
+        for name in os.listdir(self.directory):
+            if name < cutoff:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def add_columns(self, columns):
+        """Start writing more columns; the open partition back-fills them with NaN"""
+        added = {name: extract for name, extract in columns.items() if name not in self.columns}
+        if not added:
+            return
+        self.columns.update(added)
+        if self._partition is not None:
+            self._open_partition(self._partition)
+
+    def append(self, metrics, timestamp=None):
+        """Append one sample; the timestamp column is written last"""
+        if timestamp is None:
+            timestamp = time.time()
+        self.extend([(metrics, timestamp)])
+
+    def extend(self, rows):
+        """
+        Append (metrics, timestamp) pairs in time order. Values are gathered
+        per column and each file gets one write and one flush per partition.
+        """
+        pending = {name: array('d') for name in self._files}
+        for metrics, timestamp in rows:
+            partition = partition_name(timestamp)
+            if partition != self._partition:
+                self._write_pending(pending)
+                self._open_partition(partition)
+                pending = {name: array('d') for name in self._files}
+            for name, extract in self.columns.items():
+                try:
+                    value = extract(metrics)
+                except (TypeError, ValueError):
+                    value = math.nan
+                pending[name].append(value)
+            pending[TIMESTAMP].append(timestamp)
+        self._write_pending(pending)
+
+    def merge(self, rows):
+        """
+        Add (metrics, timestamp) rows that are older than the newest row of
+        their partition. Each affected partition is rewritten whole, in time
+        order; a row with the timestamp of an existing row replaces it.
+        Columns this writer does not know are kept (NaN for the new rows).
+        """
+        by_partition = {}
+        for metrics, timestamp in rows:
+            by_partition.setdefault(partition_name(timestamp), []).append((metrics, timestamp))
+        # The open handles would keep appending to the replaced files
+        self.close()
+        for partition, group in sorted(by_partition.items()):
+            partition_dir = os.path.join(self.directory, partition)
+            if not os.path.isdir(partition_dir):
+                self.prune()
+            os.makedirs(partition_dir, exist_ok=True)
+            count = _partition_rows(partition_dir)
+            names = set(self.columns)
+            names.update(filename[:-len(COLUMN_SUFFIX)] for filename in os.listdir(partition_dir)
+                         if filename.endswith(COLUMN_SUFFIX))
+            names.discard(TIMESTAMP)
+
+            added = {float(timestamp): metrics for metrics, timestamp in group}
+            old_times = _read_column(_column_path(partition_dir, TIMESTAMP), count).tolist()
+            # (timestamp, old row index or None, metrics of a new row), in time order
+            order = [(t, i, None) for i, t in enumerate(old_times) if t not in added]
+            order.extend((t, None, metrics) for t, metrics in added.items())
+            order.sort(key=lambda entry: entry[0])
+
+            # Timestamp last, as in _write_pending
+            for name in sorted(names) + [TIMESTAMP]:
+                if name == TIMESTAMP:
+                    values = array('d', (t for t, _, _ in order))
+                else:
+                    old = _read_column(_column_path(partition_dir, name), count).tolist()
+                    extract = self.columns.get(name)
+                    values = array('d', (old[i] if i is not None else _extract(extract, metrics)
+                                         for _, i, metrics in order))
+                if sys.byteorder != 'little':
+                    values.byteswap()
+                path = _column_path(partition_dir, name)
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(values.tobytes())
+                os.replace(path + '.tmp', path)
+
+    def _write_pending(self, pending):
+        # Timestamp last, so a torn write never shows a row without its values
+        for name, values in sorted(pending.items(), key=lambda item: item[0] == TIMESTAMP):
+            if not values:
+                continue
+            if sys.byteorder != 'little':
+                values.byteswap()
+            self._files[name].write(values.tobytes())
+            self._files[name].flush()
+
+    def close(self):
+        """Close all open column files"""
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._partition = None
+
+
+def _map_column(path, rows):
+    """Map the first `rows` values of a column file without copying"""
+    if rows <= 0:
+        return np.empty(0) if np is not None else array('d')
+    if np is not None:
+        return np.memmap(path, dtype='<f8', mode='r', shape=(rows,))
+    values = array('d')
+    with open(path, 'rb') as f:
+        values.frombytes(f.read(rows * VALUE.size))
+    return values
+
+
+def _nan_column(rows):
+    """Stand-in for a column the partition predates"""
+    if np is not None:
+        return np.full(rows, np.nan)
+    return array('d', [math.nan]) * rows
+
+
+def _partition_rows(partition_dir):
+    """Number of complete rows in a partition (the timestamp is written last)"""
+    path = _column_path(partition_dir, TIMESTAMP)
+    if not os.path.exists(path):
+        return 0
+    return os.path.getsize(path) // VALUE.size
+
+
+def _read_column(path, rows):
+    """
+    Map a column for `rows` rows. A column the partition predates, or one
+    that stopped being written (a removed GPU), is padded with NaN.
+    """
+    if not os.path.exists(path):
+        return _nan_column(rows)
+    available = min(rows, os.path.getsize(path) // VALUE.size)
+    values = _map_column(path, available)
+    if available == rows:
+        return values
+    if np is not None:
+        return np.concatenate([values, np.full(rows - available, np.nan)])
+    return values + _nan_column(rows - available)
+
+
+def list_partitions(columns_dir, source, start=None, end=None):
+    """Day partitions of a source overlapping [start, end], oldest first"""
+    directory = os.path.join(columns_dir, source)
+    if not os.path.isdir(directory):
+        return []
+    first = partition_name(start) if start is not None else None
+    last = partition_name(end) if end is not None else None
+    partitions = []
+    for name in sorted(os.listdir(directory)):
+        if first and name < first:
+            continue
+        if last and name > last:
+            continue
+        partitions.append(os.path.join(directory, name))
+    return partitions
+
+
+def query(columns_dir, source, columns, start=None, end=None):
+    """
+    Return {column: values} for samples in [start, end] (epoch seconds).
+    Values are NumPy views over the mapped files when a single day partition
+    is involved; multi-day windows are concatenated.
+    """
+    columns = list(columns)
+    pieces = {name: [] for name in columns + [TIMESTAMP]}
+
+    for partition_dir in list_partitions(columns_dir, source, start, end):
+        rows = _partition_rows(partition_dir)
+        if not rows:
+            continue
+        ts = _map_column(_column_path(partition_dir, TIMESTAMP), rows)
+
+        if np is not None:
+            lo = int(np.searchsorted(ts, start, 'left')) if start is not None else 0
+            hi = int(np.searchsorted(ts, end, 'right')) if end is not None else rows
+        else:
+            lo = bisect.bisect_left(ts, start) if start is not None else 0
+            hi = bisect.bisect_right(ts, end) if end is not None else rows
+        if lo >= hi:
+            continue
+
+        pieces[TIMESTAMP].append(ts[lo:hi])
+        for name in columns:
+            values = _read_column(_column_path(partition_dir, name), rows)
+            pieces[name].append(values[lo:hi])
+
+    result = {}
+    for name, parts in pieces.items():
+        if np is not None:
+            if not parts:
+                result[name] = np.empty(0)
+            elif len(parts) == 1:
+                result[name] = parts[0]
+            else:
+                result[name] = np.concatenate(parts)
+        else:
+            merged = array('d')
+            for part in parts:
+                merged.extend(part)
+            result[name] = merged
+    return result
+
+
+def list_columns(columns_dir, source, start=None, end=None):
+    """Names of the columns a source has in [start, end], sorted"""
+    names = set()
+    for partition_dir in list_partitions(columns_dir, source, start, end):
+        for filename in os.listdir(partition_dir):
+            if filename.endswith(COLUMN_SUFFIX):
+                names.add(filename[:-len(COLUMN_SUFFIX)])
+    names.discard(TIMESTAMP)
+    return sorted(names)
+
+
+def has_data(columns_dir, source, start=None):
+    """True if the store holds any partition for a source since `start`"""
+    return bool(list_partitions(columns_dir, source, start))
+
+
+def last_timestamp(columns_dir, source):
+    """Timestamp of the newest row of a source, read from the column tail"""
+    for partition_dir in reversed(list_partitions(columns_dir, source)):
+        path = _column_path(partition_dir, TIMESTAMP)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        rows = size // VALUE.size
+        if not rows:
+            continue
+        with open(path, 'rb') as f:
+            f.seek((rows - 1) * VALUE.size)
+            return VALUE.unpack(f.read(VALUE.size))[0]
+    return None
@@ -0,0 +1,248 @@
+"""
+Connection Summary (Linux)
+Socket counts by TCP state, listening port and remote peer
+
+psutil.net_connections() builds one Python object per socket and maps each
+to its owning process, which takes seconds with 100k+ sockets. The summary
+only needs three counters, so it asks the kernel for a sock_diag dump over
+a NETLINK_SOCK_DIAG socket (what `ss` does) and counts straight from the
+receive buffers: one compiled regex picks state, local port and peer
+address out of every message and collections.Counter counts the matches,
+both in C, without a Python loop per socket.
+Where netlink is unavailable, or when HOST_PROC points at another root
+(netlink would describe the collector container's own network namespace),
+/proc/<pid>/net/tcp{,6} and udp{,6} are streamed line by line instead.
+Ports and peers are reduced to the TOP_N largest; the rest are summed, so
+the output stays bounded however many peers a proxy talks to.
+"""
+
+import os
+import re
+import time
+import socket
+import struct
+import ipaddress
+import threading
+from operator import itemgetter
+from collections import Counter
+
+from reporting import procfs
+
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+
+NLMSG_HEADER = struct.Struct('=IHHII')
+# inet_diag_req_v2: family, protocol, ext, pad, states, then a zeroed inet_diag_sockid
+INET_DIAG_REQ = struct.Struct('=BBBBI48x')
+
+TCP_STATES = {
+    1: 'ESTABLISHED', 2: 'SYN_SENT', 3: 'SYN_RECV', 4: 'FIN_WAIT1', 5: 'FIN_WAIT2',
+    6: 'TIME_WAIT', 7: 'CLOSE', 8: 'CLOSE_WAIT', 9: 'LAST_ACK', 10: 'LISTEN', 11: 'CLOSING',
+}
+ESTABLISHED = 1
+LISTEN = 10
+ALL_STATES = 0xffffffff
+_ESTABLISHED = bytes([ESTABLISHED])
+_LISTEN = bytes([LISTEN])
+
+# Listening ports and peers reported individually; the rest are summed
+TOP_N = 10
+
+RECV_BUFFER = 1 << 20
+
+# Fields taken from each (state, port, peer) regex match
+_STATE_PORT = itemgetter(0, 1)
+_STATE_PEER = itemgetter(0, 2)
+
+
+class _Tally:
+    """
+    Counters filled by either backend. States and ports are raw bytes (one
+    state byte, port in network order); peers stay raw until summarized.
+    """
+
+    def __init__(self):
+        self.ports = Counter()   # (tcp state, local port) -> sockets
+        self.peers = Counter()   # (tcp state, peer address) -> sockets
+        self.udp = Counter()     # udp state -> sockets
+
+
+def _message_pattern(sequence, family, width, protocol):
+    """
+    Regex matching one sock_diag message of this dump, from the nlmsghdr
+    sequence number on (a literal prefix, so the engine skips ahead with a
+    substring search instead of trying every offset) through inet_diag_msg,
+    capturing state, local port and peer address (only the state for UDP).
+    The sequence number is random, so attribute payloads cannot pass for a
+    header.
+    """
+    header = re.escape(struct.pack('=I', sequence)) + rb'....' + re.escape(bytes([family]))
+    if protocol == socket.IPPROTO_UDP:
+        return re.compile(header + rb'(.)', re.S)
+    # state, timer, retrans, sport, dport, 16-byte source, destination
+    return re.compile(header + rb'(.)..(..)..' + rb'.{16}' + rb'(.{%d})' % width, re.S)
+
+
+def _dump(family, width, protocol, tally, buffer):
+    """
+    Run one sock_diag dump (every state) and count it into the tally.
+    re.findall walks each receive buffer in C, so there is no Python loop
+    per socket even though messages differ in length (extension attributes).
+    """
+    sequence = struct.unpack('=I', os.urandom(4))[0] | 1
+    pattern = _message_pattern(sequence, family, width, protocol)
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_SOCK_DIAG)
+    try:
+        request = INET_DIAG_REQ.pack(family, protocol, 0, 0, ALL_STATES)
+        sock.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(request), SOCK_DIAG_BY_FAMILY,
+                                    NLM_F_REQUEST | NLM_F_DUMP, sequence, 0) + request)
+        while True:
+            count = sock.recv_into(buffer)
+            if count < NLMSG_HEADER.size:
+                return
+            view = memoryview(buffer)[:count]
+            kind = NLMSG_HEADER.unpack_from(view, 0)[1]
+            if kind == NLMSG_ERROR:
+                (error,) = struct.unpack_from('=i', view, NLMSG_HEADER.size)
+                raise OSError(-error, os.strerror(-error))
+            found = pattern.findall(view)
+            if protocol == socket.IPPROTO_UDP:
+                tally.udp.update(found)
+            else:
+                tally.ports.update(map(_STATE_PORT, found))
+                tally.peers.update(map(_STATE_PEER, found))
+            # NLMSG_DONE (header plus an int) closes the dump's last buffer
+            done = count - NLMSG_HEADER.size - 4
+            if done >= 0:
+                length, kind, _, seq, _ = NLMSG_HEADER.unpack_from(view, done)
+                if kind == NLMSG_DONE and length == NLMSG_HEADER.size + 4 and seq == sequence:
+                    return
+    finally:
+        sock.close()
+
+
+def _netlink_tally():
+    tally = _Tally()
+    buffer = bytearray(RECV_BUFFER)
+    for family, width in ((socket.AF_INET, 4), (socket.AF_INET6, 16)):
+        for protocol in (socket.IPPROTO_TCP, socket.IPPROTO_UDP):
+            try:
+                _dump(family, width, protocol, tally, buffer)
+            except OSError:
+                if protocol == socket.IPPROTO_TCP:
+                    raise
+                # udp_diag not loaded: UDP is only a side count
+    return tally
+
+
+def _proc_net_tally(proc_net):
+    """Stream /proc/<pid>/net/{tcp,tcp6,udp,udp6}; addresses stay hex until summarized"""
+    tally = _Tally()
+    for name in ('tcp', 'tcp6', 'udp', 'udp6'):
+        try:
+            f = open(os.path.join(proc_net, name))
+        except OSError:
+            continue
+        with f:
+            next(f, None)
+            if name.startswith('udp'):
+                tally.udp.update(bytes.fromhex(line.split(None, 4)[3]) for line in f)
+                continue
+            for line in f:
+                fields = line.split(None, 4)
+                state = bytes.fromhex(fields[3])
+                tally.ports[(state, bytes.fromhex(fields[1][-4:]))] += 1
+                tally.peers[(state, fields[2][:-5])] += 1
+    return tally
+
+
+def _address(key):
+    """Peer address from netlink bytes or /proc hex (little-endian 32-bit words)"""
+    if isinstance(key, str):
+        raw = b''.join(bytes.fromhex(key[i:i + 8])[::-1] for i in range(0, len(key), 8))
+    else:
+        raw = bytes(key)
+    address = ipaddress.ip_address(raw)
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return str(address)
+
+
+def summarize(tally, top_n=TOP_N):
+    """Bounded summary of a tally: state counts, busiest listening ports and peers"""
+    # Only listening ports and established peers are converted; client-side
+    # ephemeral ports may be tens of thousands of keys
+    listening = {port for state, port in tally.ports if state == _LISTEN}
+    ports = sorted(({'port': int.from_bytes(port, 'big'), 'connections': tally.ports.get((_ESTABLISHED, port), 0)}
+                    for port in listening), key=lambda row: (-row['connections'], row['port']))
+    # State totals come from the peer counter: far fewer keys than sockets
+    states = Counter()
+    peers = Counter()
+    for (state, peer), count in tally.peers.items():
+        states[state] += count
+        if state == _ESTABLISHED:
+            peers[_address(peer)] += count
+    top_peers = peers.most_common(top_n)
+
+    return {
+        'total': sum(states.values()),
+        'by_state': {TCP_STATES.get(state[0], str(state[0])): count for state, count in sorted(states.items())},
+        'listening_ports': ports[:top_n],
+        'other_listening_ports': len(ports[top_n:]),
+        'top_peers': [{'address': address, 'connections': count} for address, count in top_peers],
+        'other_peer_connections': sum(peers.values()) - sum(count for _, count in top_peers),
+        'distinct_peers': len(peers),
+        'udp_sockets': sum(tally.udp.values()),
+        # What `ss -tun | grep -c ESTAB` counts: established TCP plus connected UDP
+        'established': states.get(_ESTABLISHED, 0) + tally.udp.get(_ESTABLISHED, 0),
+    }
+
+
+class ConnectionSampler:
+    """Chooses the netlink or /proc backend once; sample() returns a summary"""
+
+    def __init__(self, use_netlink=None, proc_net=None, top_n=TOP_N):
+        # Another root's /proc (container): its pid 1 sees the host's sockets
+        other_root = procfs.PROC_ROOT != '/proc'
+        self.use_netlink = (not other_root) if use_netlink is None else use_netlink
+        self.proc_net = proc_net or procfs.proc_path('1' if other_root else 'self', 'net')
+        self.top_n = top_n
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """Summary plus 'source' (netlink / procfs) and the time taken in ms"""
+        started = time.perf_counter()
+        with self._lock:
+            source = 'procfs'
+            tally = None
+            if self.use_netlink:
+                try:
+                    tally = _netlink_tally()
+                    source = 'netlink'
+                except OSError:
+                    # No sock_diag (old kernel, seccomp): stay on /proc from now on
+                    self.use_netlink = False
+            if tally is None:
+                tally = _proc_net_tally(self.proc_net)
+        summary = summarize(tally, self.top_n)
+        summary['source'] = source
+        summary['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return summary
+
+
+# Shared by the collectors of one process
+_default = None
+_default_lock = threading.Lock()
+
+
+def sample():
+    """Summarize sockets with the process-wide sampler"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ConnectionSampler()
+    return _default.sample()
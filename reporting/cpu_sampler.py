@@ -0,0 +1,91 @@
+"""
+CPU Utilisation Sampler
+Non-blocking total and per-core CPU usage from cumulative CPU time deltas
+
+psutil.cpu_percent(interval=1) sleeps for the whole measuring window. The
+sampler instead keeps the previous snapshot of cumulative CPU times and
+reports utilisation over the real time elapsed since then, so a collection
+returns immediately. Only the very first sample has no previous snapshot;
+it measures over a short bootstrap window.
+"""
+
+import time
+import threading
+
+try:
+    import psutil
+except ImportError:
+    # Only needed when no cpu_times callable is supplied (see procfs)
+    psutil = None
+
+# Measuring window of the first sample, before any snapshot exists
+BOOTSTRAP_SECONDS = 0.1
+
+# Time spent waiting for work rather than running it
+_IDLE_FIELDS = ('idle', 'iowait')
+# Already counted in 'user'/'nice' on Linux
+_GUEST_FIELDS = ('guest', 'guest_nice')
+
+
+def _split_times(times):
+    """(busy, total) seconds of one cpu_times() entry"""
+    total = sum(times)
+    for field in _GUEST_FIELDS:
+        total -= getattr(times, field, 0)
+    idle = sum(getattr(times, field, 0) for field in _IDLE_FIELDS)
+    return total - idle, total
+
+
+def _percent(previous, current):
+    busy = current[0] - previous[0]
+    total = current[1] - previous[1]
+    if total <= 0:
+        return 0.0
+    return round(max(0.0, min(100.0, busy / total * 100)), 1)
+
+
+class CpuSampler:
+    """Keeps the last CPU time snapshot; sample() never blocks after the first call"""
+
+    def __init__(self, bootstrap=BOOTSTRAP_SECONDS, cpu_times=None):
+        self.bootstrap = bootstrap
+        # Any psutil.cpu_times-compatible callable (e.g. reporting.procfs)
+        self.cpu_times = cpu_times or psutil.cpu_times
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _take(self):
+        cores = [_split_times(t) for t in self.cpu_times(percpu=True)]
+        total = (sum(c[0] for c in cores), sum(c[1] for c in cores))
+        return time.monotonic(), total, cores
+
+    def sample(self):
+        """
+        Return {'usage_percent', 'per_core', 'interval'} measured since the
+        previous call; 'interval' is the real measuring window in seconds.
+        """
+        with self._lock:
+            previous = self._snapshot
+            if previous is None:
+                previous = self._take()
+                time.sleep(self.bootstrap)
+            current = self._take()
+            self._snapshot = current
+
+        return {
+            'usage_percent': _percent(previous[1], current[1]),
+            'per_core': [_percent(p, c) for p, c in zip(previous[2], current[2])],
+            'interval': round(current[0] - previous[0], 3),
+        }
+
+
+# Shared by the collectors of one process
+_default = None
+
+
+def sample():
+    """Sample CPU usage with the process-wide sampler"""
+    global _default
+    if _default is None:
+        _default = CpuSampler()
+    return _default.sample()
@@ -0,0 +1,129 @@
+"""
+Disk I/O Sampler
+Per-device throughput, IOPS and busy time from cumulative disk counters
+
+The kernel only exposes ever-growing counters (operations, bytes, time spent
+doing I/O). The sampler keeps the previous snapshot per device and turns the
+difference into rates over the real (monotonic) time elapsed since then.
+Counters that go backwards are treated as a 32-bit wrap (Windows, some
+older kernels) only when the previous value was near the top of the 32-bit
+range and the wrapped increase is plausible; any other decrease is a
+device reset (re-created, hot-plugged or re-attached) and counts from zero. Partitions and loop/ram devices are skipped so totals do not
+count the same I/O twice.
+"""
+
+import time
+import threading
+
+from reporting import procfs
+
+try:
+    import psutil
+except ImportError:
+    # Only needed when no counters callable is supplied (see procfs)
+    psutil = None
+
+# Pseudo block devices with no physical disk behind them
+_VIRTUAL_PREFIXES = ('loop', 'ram', 'zram', 'fd', 'sr')
+
+_WRAP = 2 ** 32
+
+# A wrap adds less than this; a bigger "wrapped" increase is really a reset
+_MAX_WRAP_DELTA = 2 ** 31
+
+RATE_FIELDS = ('read_bytes_per_sec', 'write_bytes_per_sec', 'read_iops', 'write_iops')
+
+
+def counter_delta(previous, current):
+    """Counter increase, allowing for a 32-bit wrap or a reset to zero"""
+    if current >= previous:
+        return current - previous
+    if previous < _WRAP and current + _WRAP - previous < _MAX_WRAP_DELTA:
+        return current + _WRAP - previous
+    return current
+
+
+def _busy_ms(counters):
+    """Time the device was busy; Windows has no busy_time, use read+write time"""
+    busy = getattr(counters, 'busy_time', None)
+    if busy is None:
+        busy = counters.read_time + counters.write_time
+    return busy
+
+
+def _include(name):
+    if name.startswith(_VIRTUAL_PREFIXES):
+        return False
+    return procfs.is_whole_disk(name)
+
+
+class DiskIoSampler:
+    """Keeps the last per-device counter snapshot; sample() returns rates since then"""
+
+    def __init__(self, counters=None):
+        # Any psutil.disk_io_counters-compatible callable (e.g. reporting.procfs)
+        self.counters = counters or psutil.disk_io_counters
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _take(self):
+        try:
+            devices = self.counters(perdisk=True) or {}
+        except (OSError, RuntimeError):
+            devices = {}
+        return time.monotonic(), {name: c for name, c in devices.items() if _include(name)}
+
+    def sample(self):
+        """
+        Return {'io_stats': totals, 'devices': [per-device rates]}.
+        io_stats keeps the cumulative counters of the canonical schema and adds
+        summed rates plus 'busy_percent' of the busiest device. The first call
+        has no previous snapshot and reports zero rates.
+        """
+        with self._lock:
+            previous = self._snapshot
+            current = self._take()
+            self._snapshot = current
+
+        now, devices = current
+        elapsed = now - previous[0] if previous else 0
+        rows = []
+        for name, c in sorted(devices.items()):
+            row = {'device': name}
+            before = previous[1].get(name) if previous else None
+            if before is not None and elapsed > 0:
+                busy = counter_delta(_busy_ms(before), _busy_ms(c)) / (elapsed * 1000) * 100
+                row.update({
+                    'read_bytes_per_sec': round(counter_delta(before.read_bytes, c.read_bytes) / elapsed, 1),
+                    'write_bytes_per_sec': round(counter_delta(before.write_bytes, c.write_bytes) / elapsed, 1),
+                    'read_iops': round(counter_delta(before.read_count, c.read_count) / elapsed, 2),
+                    'write_iops': round(counter_delta(before.write_count, c.write_count) / elapsed, 2),
+                    'busy_percent': round(min(100.0, busy), 1),
+                })
+            else:
+                row.update({field: 0.0 for field in RATE_FIELDS + ('busy_percent',)})
+            rows.append(row)
+
+        io_stats = {
+            'reads_completed': sum(c.read_count for c in devices.values()),
+            'writes_completed': sum(c.write_count for c in devices.values()),
+            'bytes_read': sum(c.read_bytes for c in devices.values()),
+            'bytes_written': sum(c.write_bytes for c in devices.values()),
+        }
+        for field in RATE_FIELDS:
+            io_stats[field] = round(sum(row[field] for row in rows), 2)
+        io_stats['busy_percent'] = max((row['busy_percent'] for row in rows), default=0.0)
+        io_stats['interval'] = round(elapsed, 3)
+        return {'io_stats': io_stats, 'devices': rows}
+
+
+# Shared by the collectors of one process
+_default = None
+
+
+def sample():
+    """Sample disk I/O with the process-wide sampler"""
+    global _default
+    if _default is None:
+        _default = DiskIoSampler()
+    return _default.sample()
@@ -0,0 +1,329 @@
+"""
+Prometheus / OpenMetrics Exposition
+Canonical samples rendered as text exposition, once per sample, served from memory
+
+Exposition.update() turns the newest sample of a source into pre-formatted
+lines per metric family (labels 'source' and 'host', plus device labels:
+core, sensor, mount, device, interface, gpu, container ...). payload()
+joins the families of all sources into one document (HELP/TYPE once per
+family, as the format requires) and keeps the result, plain and gzipped,
+until the next update; a scrape in between returns cached bytes. Counters
+are cumulative values from the collectors (interface bytes, disk bytes,
+container CPU seconds); everything else is a gauge.
+
+Both the reporter's /metrics and the collector daemon's optional
+--metrics-port endpoint (serve()) use this module.
+"""
+
+import gzip
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from reporting import metrics_schema
+
+PREFIX = 'sysmon_'
+
+TEXT_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _number(value):
+    """Float for numeric values and numeric strings ('45.0'); None for 'N/A', missing ..."""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _format_value(value):
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(int(value)) if value.is_integer() and abs(value) < 2 ** 53 else repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _families(sample):
+    """(name, type, help, [(labels, value), ...]) for every metric family of a canonical sample"""
+    info = sample.get('system_info') or {}
+    cpu = sample.get('cpu') or {}
+    memory = sample.get('memory') or {}
+    disk = sample.get('disk') or {}
+    io = disk.get('io_stats') or {}
+    network = sample.get('network') or {}
+    connections = network.get('connections') or {}
+    load = sample.get('system_load') or {}
+    averages = load.get('load_average') or {}
+    collection = sample.get('collection') or {}
+
+    try:
+        collected = metrics_schema.sample_time(sample)
+    except (KeyError, TypeError, ValueError):
+        collected = None
+    yield 'sample_timestamp_seconds', 'gauge', 'Collection time of the sample (Unix time)', [({}, collected)]
+    yield 'uptime_seconds', 'gauge', 'Seconds since boot', [({}, info.get('uptime_seconds'))]
+    yield 'collection_duration_seconds', 'gauge', 'Time taken to collect the sample', \
+        [({}, _scaled(collection.get('duration_ms'), 1e-3))]
+
+    # CPU
+    yield 'cpu_usage_percent', 'gauge', 'CPU utilisation since the previous sample', \
+        [({}, cpu.get('usage_percent'))]
+    yield 'cpu_core_usage_percent', 'gauge', 'Utilisation of each logical CPU since the previous sample', \
+        [({'core': index}, value) for index, value in enumerate(cpu.get('per_core') or [])]
+    yield 'cpu_cores', 'gauge', 'Logical CPUs', [({}, cpu.get('core_count'))]
+    yield 'cpu_frequency_hertz', 'gauge', 'Current CPU clock', [({}, _scaled(cpu.get('frequency_ghz'), 1e9))]
+    yield 'cpu_temperature_celsius', 'gauge', 'CPU package (or hottest core) temperature', \
+        [({}, cpu.get('temperature_celsius'))]
+    yield 'temperature_celsius', 'gauge', 'Temperature of each hwmon / thermal sensor', \
+        [({'sensor': key}, value) for key, value in sorted((cpu.get('temperatures') or {}).items())]
+
+    # Memory
+    yield 'memory_total_bytes', 'gauge', 'Physical memory', [({}, memory.get('total_bytes'))]
+    yield 'memory_used_bytes', 'gauge', 'Memory in use', [({}, memory.get('used_bytes'))]
+    yield 'memory_available_bytes', 'gauge', 'Memory available without swapping', [({}, memory.get('available_bytes'))]
+    yield 'memory_usage_percent', 'gauge', 'Memory in use', [({}, memory.get('usage_percent'))]
+    yield 'swap_total_bytes', 'gauge', 'Swap space', [({}, memory.get('swap_total_bytes'))]
+    yield 'swap_used_bytes', 'gauge', 'Swap in use', [({}, memory.get('swap_used_bytes'))]
+
+    # Filesystems and disks
+    filesystems = [fs for fs in disk.get('filesystems') or [] if isinstance(fs, dict)]
+
+    def fs_labels(fs):
+        return {'device': fs.get('device', ''), 'mount': fs.get('mount', ''), 'fstype': fs.get('fstype', '')}
+
+    yield 'filesystem_size_bytes', 'gauge', 'Filesystem size', [(fs_labels(fs), fs.get('total')) for fs in filesystems]
+    yield 'filesystem_used_bytes', 'gauge', 'Filesystem space used', [(fs_labels(fs), fs.get('used')) for fs in filesystems]
+    yield 'filesystem_avail_bytes', 'gauge', 'Filesystem space available to unprivileged users', \
+        [(fs_labels(fs), fs.get('available')) for fs in filesystems]
+    yield 'filesystem_reachable', 'gauge', '0 while the mount does not answer statvfs in time', \
+        [(fs_labels(fs), fs.get('reachable', True)) for fs in filesystems]
+    yield 'disk_read_bytes', 'counter', 'Bytes read from all disks', [({}, io.get('bytes_read'))]
+    yield 'disk_written_bytes', 'counter', 'Bytes written to all disks', [({}, io.get('bytes_written'))]
+    yield 'disk_reads_completed', 'counter', 'Reads completed on all disks', [({}, io.get('reads_completed'))]
+    yield 'disk_writes_completed', 'counter', 'Writes completed on all disks', [({}, io.get('writes_completed'))]
+    devices = [d for d in disk.get('devices') or [] if isinstance(d, dict)]
+    for field, name, text in (('read_bytes_per_sec', 'disk_read_bytes_per_second', 'Read throughput'),
+                              ('write_bytes_per_sec', 'disk_write_bytes_per_second', 'Write throughput'),
+                              ('read_iops', 'disk_read_iops', 'Reads per second'),
+                              ('write_iops', 'disk_write_iops', 'Writes per second'),
+                              ('busy_percent', 'disk_busy_percent', 'Share of time with I/O in flight')):
+        yield name, 'gauge', text + ' of each disk since the previous sample', \
+            [({'device': d.get('device', '')}, d.get(field)) for d in devices]
+
+    # Network
+    interfaces = [i for i in network.get('interfaces') or [] if isinstance(i, dict)]
+    for field, name, text in (('rx_bytes', 'network_receive_bytes', 'Bytes received'),
+                              ('tx_bytes', 'network_transmit_bytes', 'Bytes sent'),
+                              ('rx_packets', 'network_receive_packets', 'Packets received'),
+                              ('tx_packets', 'network_transmit_packets', 'Packets sent'),
+                              ('rx_errors', 'network_receive_errors', 'Receive errors'),
+                              ('tx_errors', 'network_transmit_errors', 'Transmit errors'),
+                              ('rx_drops', 'network_receive_drops', 'Received packets dropped'),
+                              ('tx_drops', 'network_transmit_drops', 'Outgoing packets dropped')):
+        yield name, 'counter', text + ' on each interface', \
+            [({'interface': i.get('interface', '')}, i.get(field)) for i in interfaces]
+    yield 'network_receive_bytes_per_second', 'gauge', 'Receive throughput of each interface since the previous sample', \
+        [({'interface': i.get('interface', '')}, i.get('rx_bytes_per_sec')) for i in interfaces]
+    yield 'network_transmit_bytes_per_second', 'gauge', 'Transmit throughput of each interface since the previous sample', \
+        [({'interface': i.get('interface', '')}, i.get('tx_bytes_per_sec')) for i in interfaces]
+    yield 'network_utilization_percent', 'gauge', 'Share of the link speed in use', \
+        [({'interface': i.get('interface', '')}, i.get('utilization_percent')) for i in interfaces]
+    yield 'network_speed_bits_per_second', 'gauge', 'Negotiated link speed of each interface', \
+        [({'interface': i.get('interface', '')}, _scaled(i.get('speed_mbps') or None, 1e6)) for i in interfaces]
+    yield 'network_active_connections', 'gauge', 'Established TCP connections and connected UDP sockets', \
+        [({}, network.get('active_connections'))]
+    yield 'tcp_sockets', 'gauge', 'TCP sockets in each state', \
+        [({'state': state}, count) for state, count in sorted((connections.get('by_state') or {}).items())]
+    yield 'udp_sockets', 'gauge', 'UDP sockets', [({}, connections.get('udp_sockets'))]
+    yield 'tcp_listening_port_connections', 'gauge', 'Established connections to each (top) listening port', \
+        [({'port': port.get('port')}, port.get('connections')) for port in connections.get('listening_ports') or []]
+    yield 'tcp_distinct_peers', 'gauge', 'Distinct remote addresses with established connections', \
+        [({}, connections.get('distinct_peers'))]
+
+    # GPU
+    for field, name, text, scale in (
+            ('utilization_percent', 'gpu_utilization_percent', 'GPU utilisation', 1),
+            ('memory_used_bytes', 'gpu_memory_used_bytes', 'GPU memory in use', 1),
+            ('memory_total_bytes', 'gpu_memory_total_bytes', 'GPU memory', 1),
+            ('temperature_celsius', 'gpu_temperature_celsius', 'GPU temperature', 1),
+            ('power_watts', 'gpu_power_watts', 'GPU power draw', 1),
+            ('clock_graphics_mhz', 'gpu_graphics_clock_hertz', 'GPU graphics clock', 1e6),
+            ('fan_percent', 'gpu_fan_percent', 'GPU fan speed', 1)):
+        yield name, 'gauge', text, \
+            [({'gpu': d.get('index'), 'name': d.get('name', ''), 'uuid': d.get('uuid', '')}, _scaled(d.get(field), scale))
+             for d in (sample.get('gpu') or {}).get('devices') or [] if isinstance(d, dict)]
+
+    # Load and processes
+    yield 'load1', 'gauge', '1-minute load average', [({}, averages.get('1min'))]
+    yield 'load5', 'gauge', '5-minute load average', [({}, averages.get('5min'))]
+    yield 'load15', 'gauge', '15-minute load average', [({}, averages.get('15min'))]
+    yield 'procs_running', 'gauge', 'Tasks runnable right now (run queue)', [({}, load.get('procs_running'))]
+    yield 'procs_blocked', 'gauge', 'Tasks blocked on I/O', [({}, load.get('procs_blocked'))]
+    yield 'processes', 'gauge', 'Processes', [({}, load.get('total_processes'))]
+    yield 'processes_state', 'gauge', 'Processes by state', \
+        [({'state': state}, load.get(f'{state}_processes')) for state in ('running', 'sleeping', 'zombie')]
+    yield 'pressure_stall_percent', 'gauge', 'Share of time tasks were stalled on a resource (Linux PSI)', \
+        [({'resource': resource, 'kind': kind, 'window': window}, values.get(f'avg{window[:-1]}'))
+         for resource, kinds in sorted((load.get('pressure') or {}).items())
+         for kind, values in sorted(kinds.items())
+         for window in ('10s', '60s', '300s')]
+
+    # Containers (cgroup v2)
+    containers = [c for c in (sample.get('containers') or {}).get('containers') or [] if isinstance(c, dict)]
+
+    def container_labels(c):
+        return {'container': c.get('name', ''), 'id': c.get('id', '')}
+
+    for field, name, kind, text in (
+            ('cpu_usage_seconds', 'container_cpu_usage_seconds', 'counter', 'CPU time used'),
+            ('cpu_percent', 'container_cpu_percent', 'gauge', 'CPU use in % of one core since the previous sample'),
+            ('throttled_periods', 'container_cpu_throttled_periods', 'counter', 'CFS periods throttled'),
+            ('throttled_seconds', 'container_cpu_throttled_seconds', 'counter', 'Time throttled'),
+            ('memory_current_bytes', 'container_memory_bytes', 'gauge', 'Memory in use'),
+            ('memory_peak_bytes', 'container_memory_peak_bytes', 'gauge', 'Peak memory'),
+            ('memory_limit_bytes', 'container_memory_limit_bytes', 'gauge', 'Memory limit'),
+            ('io_read_bytes', 'container_io_read_bytes', 'counter', 'Bytes read'),
+            ('io_write_bytes', 'container_io_write_bytes', 'counter', 'Bytes written')):
+        yield name, kind, text + ' by each container', [(container_labels(c), c.get(field)) for c in containers]
+    yield 'container_pressure_stall_percent', 'gauge', 'Share of time tasks of each container were stalled (PSI avg10)', \
+        [(dict(container_labels(c), resource=resource, kind=kind), value)
+         for c in containers
+         for resource, kinds in sorted((c.get('pressure') or {}).items())
+         for kind, value in sorted((kinds or {}).items())]
+
+
+def _scaled(value, scale):
+    value = _number(value)
+    return value * scale if value is not None else None
+
+
+def render_families(sample, source):
+    """{family: (type, help, [sample line, ...])} for one source's newest sample"""
+    info = sample.get('system_info') or {}
+    base = f'source="{_escape(source)}",host="{_escape(info.get("hostname", ""))}"'
+    families = {}
+    for name, kind, text, values in _families(sample):
+        metric = PREFIX + name + ('_total' if kind == 'counter' else '')
+        lines = []
+        for labels, value in values:
+            value = _number(value)
+            if value is None:
+                continue
+            extra = ''.join(f',{key}="{_escape(label)}"' for key, label in labels.items())
+            lines.append(f'{metric}{{{base}{extra}}} {_format_value(value)}\n')
+        if lines:
+            families[name] = (kind, text, lines)
+    return families
+
+
+def render(sources, openmetrics=False):
+    """Join the rendered families of several sources into one exposition document"""
+    names = []
+    seen = set()
+    for families in sources:
+        for name in families:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+
+    parts = []
+    for name in names:
+        kind = text = None
+        lines = []
+        for families in sources:
+            if name in families:
+                kind, text, family_lines = families[name]
+                lines.extend(family_lines)
+        # OpenMetrics names the counter family without its _total sample suffix
+        family = PREFIX + name + ('_total' if kind == 'counter' and not openmetrics else '')
+        parts.append(f'# HELP {family} {text}\n# TYPE {family} {kind}\n')
+        parts.extend(lines)
+    if openmetrics:
+        parts.append('# EOF\n')
+    return ''.join(parts).encode('utf-8')
+
+
+class Exposition:
+    """Newest rendered sample per source; payloads cached until one changes"""
+
+    def __init__(self):
+        self._sources = {}    # source -> (version, families)
+        self._payloads = {}   # (openmetrics, gzip) -> bytes
+        self._lock = threading.Lock()
+
+    def version(self, source):
+        entry = self._sources.get(source)
+        return entry[0] if entry else None
+
+    def update(self, source, sample, version=None):
+        """Render a new sample of a source (skipped when `version` has been rendered already)"""
+        if version is not None and self.version(source) == version:
+            return
+        families = render_families(sample, source)
+        with self._lock:
+            self._sources[source] = (version, families)
+            self._payloads = {}
+
+    def retain(self, sources):
+        """Forget sources not in `sources`"""
+        with self._lock:
+            for source in set(self._sources) - set(sources):
+                del self._sources[source]
+                self._payloads = {}
+
+    def payload(self, openmetrics=False, compress=False):
+        """The exposition document, rendered and compressed at most once per update"""
+        with self._lock:
+            plain = self._payloads.get((openmetrics, False))
+            if plain is None:
+                plain = self._payloads[(openmetrics, False)] = render(
+                    [families for _, (_, families) in sorted(self._sources.items())], openmetrics)
+            if not compress:
+                return plain
+            if (openmetrics, True) not in self._payloads:
+                self._payloads[(openmetrics, True)] = gzip.compress(plain, 6)
+            return self._payloads[(openmetrics, True)]
+
+
+def wants_openmetrics(accept):
+    """True when a scraper's Accept header prefers OpenMetrics"""
+    return 'application/openmetrics-text' in (accept or '')
+
+
+def serve(exposition, port, host='0.0.0.0'):
+    """Serve /metrics from an Exposition on a background thread; returns the server"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            openmetrics = wants_openmetrics(self.headers.get('Accept'))
+            compress = 'gzip' in (self.headers.get('Accept-Encoding') or '')
+            body = exposition.payload(openmetrics, compress)
+            self.send_response(200)
+            self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE if openmetrics else TEXT_CONTENT_TYPE)
+            if compress:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-endpoint', daemon=True).start()
+    return server
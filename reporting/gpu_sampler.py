@@ -0,0 +1,351 @@
+"""
+GPU Sampler
+One long-lived GPU reading source per process, served from memory
+
+Backends, in order of preference:
+  - NVML through pynvml (optional dependency), polled in-process
+  - a single persistent `nvidia-smi --query-gpu=... --loop-ms=<ms>` stream
+
+Callers never fork nvidia-smi themselves: latest() returns the newest
+reading per GPU. A GPU without a reading for STALE_INTERVALS intervals (it
+fell off the bus, or the stream hung) is left out rather than served with
+its last values; a backend that raises is logged and started again. Any iterable of CSV lines can stand in for the nvidia-smi
+stream, so the parsing and serving path runs on machines without a GPU:
+
+    sampler = GpuSampler(StreamBackend(lambda: iter(lines)))
+"""
+
+import time
+import shutil
+import atexit
+import threading
+import subprocess
+
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
+SAMPLE_INTERVAL_MS = 1000
+
+# Wait this long for the first reading before answering "no GPU"
+FIRST_READING_TIMEOUT = 2.0
+
+# Delay before relaunching an nvidia-smi stream that exited, or a backend that failed
+RESTART_DELAY = 5.0
+
+# Readings older than this many sample intervals are no longer served
+STALE_INTERVALS = 5
+
+# nvidia-smi query field -> (reading key, scale)
+QUERY_FIELDS = [
+    ('index', 'index', None),
+    ('uuid', 'uuid', None),
+    ('name', 'name', None),
+    ('temperature.gpu', 'temperature_celsius', 1),
+    ('utilization.gpu', 'utilization_percent', 1),
+    ('utilization.memory', 'memory_utilization_percent', 1),
+    ('memory.used', 'memory_used_bytes', 1024 ** 2),
+    ('memory.total', 'memory_total_bytes', 1024 ** 2),
+    ('power.draw', 'power_watts', 1),
+    ('power.limit', 'power_limit_watts', 1),
+    ('clocks.gr', 'clock_graphics_mhz', 1),
+    ('clocks.mem', 'clock_memory_mhz', 1),
+    ('fan.speed', 'fan_percent', 1),
+]
+
+
+def _number(text, scale=1):
+    """Parse a numeric CSV field; '[N/A]' and '[Not Supported]' become None"""
+    try:
+        return float(text) * scale
+    except ValueError:
+        return None
+
+
+# Position of the only free-text field; nvidia-smi does not quote commas in it
+_NAME_FIELD = [key for _, key, _ in QUERY_FIELDS].index('name')
+
+
+def parse_line(line):
+    """Parse one `--format=csv,noheader,nounits` line into a reading dict"""
+    parts = line.split(',')
+    extra = len(parts) - len(QUERY_FIELDS)
+    if extra < 0:
+        return None
+    if extra:
+        # A name containing commas: every surplus field belongs to it
+        parts[_NAME_FIELD:_NAME_FIELD + extra + 1] = [','.join(parts[_NAME_FIELD:_NAME_FIELD + extra + 1])]
+    parts = [part.strip() for part in parts]
+    reading = {}
+    for (_, key, scale), text in zip(QUERY_FIELDS, parts):
+        if key == 'index':
+            try:
+                reading[key] = int(text)
+            except ValueError:
+                return None
+        elif scale is None:
+            reading[key] = text
+        else:
+            reading[key] = _number(text, scale)
+    return reading
+
+
+def smi_command(interval_ms=SAMPLE_INTERVAL_MS):
+    """nvidia-smi command line that prints one CSV line per GPU every interval"""
+    return [
+        'nvidia-smi',
+        '--query-gpu=' + ','.join(field for field, _, _ in QUERY_FIELDS),
+        '--format=csv,noheader,nounits',
+        f'--loop-ms={interval_ms}',
+    ]
+
+
+class StreamBackend:
+    """Reads readings from a stream of nvidia-smi CSV lines"""
+
+    name = 'nvidia-smi'
+
+    def __init__(self, open_stream=None, restart_delay=RESTART_DELAY):
+        self.open_stream = open_stream or self._open_smi
+        self.restart_delay = restart_delay
+        self._process = None
+
+    def _open_smi(self):
+        self._process = subprocess.Popen(
+            smi_command(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1)
+        return self._process.stdout
+
+    def run(self, publish, stop):
+        """Publish every parsed line until stopped; relaunch a stream that ends"""
+        while not stop.is_set():
+            try:
+                stream = self.open_stream()
+            except OSError:
+                return
+            for line in stream:
+                if stop.is_set():
+                    break
+                reading = parse_line(line)
+                if reading is not None:
+                    publish(reading)
+            self.close()
+            stop.wait(self.restart_delay)
+
+    def close(self):
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+
+
+class NvmlBackend:
+    """Polls NVML in-process (requires pynvml)"""
+
+    name = 'nvml'
+
+    def __init__(self, interval_ms=SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        pynvml.nvmlInit()
+        self._initialized = True
+
+    @staticmethod
+    def _value(func, *args, scale=1):
+        try:
+            return func(*args) * scale
+        except pynvml.NVMLError:
+            return None
+
+    def _read(self, index):
+        handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+        name = pynvml.nvmlDeviceGetName(handle)
+        uuid = pynvml.nvmlDeviceGetUUID(handle)
+        memory = pynvml.nvmlDeviceGetMemoryInfo(handle)
+        try:
+            rates = pynvml.nvmlDeviceGetUtilizationRates(handle)
+            utilization, memory_utilization = float(rates.gpu), float(rates.memory)
+        except pynvml.NVMLError:
+            utilization = memory_utilization = None
+        return {
+            'index': index,
+            'uuid': uuid.decode() if isinstance(uuid, bytes) else uuid,
+            'name': name.decode() if isinstance(name, bytes) else name,
+            'temperature_celsius': self._value(
+                pynvml.nvmlDeviceGetTemperature, handle, pynvml.NVML_TEMPERATURE_GPU),
+            'utilization_percent': utilization,
+            'memory_utilization_percent': memory_utilization,
+            'memory_used_bytes': float(memory.used),
+            'memory_total_bytes': float(memory.total),
+            'power_watts': self._value(pynvml.nvmlDeviceGetPowerUsage, handle, scale=0.001),
+            'power_limit_watts': self._value(
+                pynvml.nvmlDeviceGetEnforcedPowerLimit, handle, scale=0.001),
+            'clock_graphics_mhz': self._value(
+                pynvml.nvmlDeviceGetClockInfo, handle, pynvml.NVML_CLOCK_GRAPHICS),
+            'clock_memory_mhz': self._value(
+                pynvml.nvmlDeviceGetClockInfo, handle, pynvml.NVML_CLOCK_MEM),
+            'fan_percent': self._value(pynvml.nvmlDeviceGetFanSpeed, handle),
+        }
+
+    def run(self, publish, stop):
+        if not self._initialized:
+            # Restarted after a failure closed the library
+            pynvml.nvmlInit()
+            self._initialized = True
+        while not stop.is_set():
+            try:
+                for index in range(pynvml.nvmlDeviceGetCount()):
+                    publish(self._read(index))
+            except pynvml.NVMLError:
+                pass
+            stop.wait(self.interval)
+
+    def close(self):
+        if not self._initialized:
+            return
+        self._initialized = False
+        try:
+            pynvml.nvmlShutdown()
+        except pynvml.NVMLError:
+            pass
+
+
+def default_backend():
+    """NVML when usable, else an nvidia-smi stream, else None (no NVIDIA GPU)"""
+    if pynvml is not None:
+        try:
+            return NvmlBackend()
+        except Exception:
+            pass
+    if shutil.which('nvidia-smi'):
+        return StreamBackend()
+    return None
+
+
+class GpuSampler:
+    """Runs a backend on a background thread and keeps the latest reading per GPU"""
+
+    def __init__(self, backend=None, max_age=STALE_INTERVALS * SAMPLE_INTERVAL_MS / 1000,
+                 restart_delay=RESTART_DELAY):
+        self.backend = backend
+        self.max_age = max_age
+        self.restart_delay = restart_delay
+        self._readings = {}
+        self._lock = threading.Lock()
+        self._first = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _publish(self, reading):
+        reading['updated'] = time.time()
+        with self._lock:
+            self._readings[reading['index']] = reading
+        self._first.set()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.backend.run(self._publish, self._stop)
+                    return
+                except Exception as e:
+                    print(f"GPU sampler: {self.backend.name} backend failed ({e!r}), "
+                          f"restarting in {self.restart_delay:g}s")
+                    self._first.set()
+                    try:
+                        self.backend.close()
+                    except Exception:
+                        pass
+                    self._stop.wait(self.restart_delay)
+        finally:
+            # Wake anyone still waiting for a first reading
+            self._first.set()
+
+    def start(self):
+        """Start sampling in the background (idempotent)"""
+        if self._thread is None and self.backend is not None:
+            self._thread = threading.Thread(target=self._run, name='gpu-sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def latest(self, timeout=FIRST_READING_TIMEOUT):
+        """Newest recent reading of every GPU, ordered by index ([] without a GPU)"""
+        if self.backend is None:
+            return []
+        self.start()
+        self._first.wait(timeout)
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            return [dict(self._readings[index]) for index in sorted(self._readings)
+                    if self._readings[index]['updated'] >= cutoff]
+
+    def stop(self):
+        self._stop.set()
+        if self.backend is not None:
+            self.backend.close()
+
+
+# Reading keys copied into each per-device record
+DEVICE_FIELDS = [key for _, key, _ in QUERY_FIELDS]
+
+
+def to_devices(readings):
+    """Per-device records ('gpu.devices'), keyed by index and UUID; unsupported values are None"""
+    devices = []
+    for reading in readings:
+        device = {key: reading.get(key) for key in DEVICE_FIELDS}
+        used = reading['memory_used_bytes']
+        total = reading['memory_total_bytes']
+        device['memory_used_bytes'] = int(used) if used is not None else None
+        device['memory_total_bytes'] = int(total) if total is not None else None
+        device['memory_percent'] = round(used / total * 100, 1) if used is not None and total else None
+        devices.append(device)
+    return devices
+
+
+def to_canonical(readings):
+    """
+    Collector 'gpu' block summarising all GPUs, or None: mean utilization,
+    summed memory and power, hottest temperature.
+    """
+    if not readings:
+        return None
+    names = sorted({r['name'] for r in readings})
+    utilization = [r['utilization_percent'] for r in readings if r['utilization_percent'] is not None]
+    temperatures = [r['temperature_celsius'] for r in readings if r['temperature_celsius'] is not None]
+    used = sum(r['memory_used_bytes'] or 0 for r in readings)
+    total = sum(r['memory_total_bytes'] or 0 for r in readings)
+    return {
+        'vendor': 'NVIDIA',
+        'name': names[0] if len(names) == 1 else ' / '.join(names),
+        'count': len(readings),
+        'utilization_percent': sum(utilization) / len(utilization) if utilization else 0,
+        'memory_used_bytes': int(used),
+        'memory_total_bytes': int(total),
+        'memory_percent': (used / total * 100) if total > 0 else 0,
+        'temperature_celsius': max(temperatures) if temperatures else 0,
+        'power_watts': sum(r['power_watts'] or 0 for r in readings)
+    }
+
+
+# Shared by all collectors of one process
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """Process-wide sampler, started on first use"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = GpuSampler(default_backend()).start()
+            atexit.register(_sampler.stop)
+    return _sampler
+
+
+def latest():
+    """Newest reading of every GPU from the process-wide sampler"""
+    return get_sampler().latest()
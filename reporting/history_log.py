@@ -0,0 +1,380 @@
+"""
+Segmented History Log
+Append-only hourly segment files with a small footer index for time-range reads
+
+Layout: data/metrics/history/segments/<source>_<YYYYMMDD>_<HH>.seg
+
+Each record is one line: "<epoch_ms> <compact json>\\n". When a segment is
+closed out (the first append of the next hour), a footer holding a sparse
+(timestamp, offset) index is written after the records, followed by a fixed
+trailer that points back at the footer. Readers seek straight to the first
+record of a time range instead of opening one file per sample.
+"""
+
+import os
+import json
+import time
+import struct
+import bisect
+from datetime import datetime
+
+SEGMENT_DIRNAME = 'segments'
+SEGMENT_SUFFIX = '.seg'
+SEGMENT_HOUR_FORMAT = '%Y%m%d_%H'
+
+# One index entry every N records keeps the footer small (~40 entries/hour at 3s)
+INDEX_STRIDE = 32
+
+TRAILER_MAGIC = b'HSEGIDX1'
+TRAILER = struct.Struct('<Q8s')  # footer offset, magic
+
+
+def segment_dir(history_dir):
+    """Directory holding the segment files of a history directory"""
+    return os.path.join(history_dir, SEGMENT_DIRNAME)
+
+
+def segment_hour(timestamp):
+    """Hour key (local time) of the segment that holds a timestamp"""
+    return datetime.fromtimestamp(timestamp).strftime(SEGMENT_HOUR_FORMAT)
+
+
+def _parse_segment_name(filename):
+    """Split '<source>_<YYYYMMDD>_<HH>.seg' into (source, hour key)"""
+    if not filename.endswith(SEGMENT_SUFFIX):
+        return None
+    stem = filename[:-len(SEGMENT_SUFFIX)]
+    parts = stem.rsplit('_', 2)
+    if len(parts) != 3:
+        return None
+    return parts[0], parts[1] + '_' + parts[2]
+
+
+def segment_source(path):
+    """Source name of a segment path, or None for other files"""
+    parsed = _parse_segment_name(os.path.basename(path))
+    return parsed[0] if parsed else None
+
+
+def _read_trailer(f, size):
+    """Return the footer offset of a sealed segment, or None if unsealed"""
+    if size < TRAILER.size:
+        return None
+    f.seek(size - TRAILER.size)
+    footer_offset, magic = TRAILER.unpack(f.read(TRAILER.size))
+    if magic != TRAILER_MAGIC or footer_offset > size - TRAILER.size:
+        return None
+    return footer_offset
+
+
+def seal_segment(path):
+    """Write the footer index and trailer of a segment (no-op if already sealed)"""
+    with open(path, 'r+b') as f:
+        size = f.seek(0, os.SEEK_END)
+        if _read_trailer(f, size) is not None:
+            return
+
+        f.seek(0)
+        data = f.read()
+
+        # Drop a torn last record left behind by a crashed writer
+        data_end = data.rfind(b'\n') + 1
+        index = []
+        count = 0
+        first = last = None
+        offset = 0
+        while offset < data_end:
+            line_end = data.index(b'\n', offset)
+            space = data.find(b' ', offset, line_end)
+            try:
+                ts_ms = int(data[offset:space]) if space > offset else None
+            except ValueError:
+                ts_ms = None
+            if ts_ms is None:
+                offset = line_end + 1
+                continue
+            if count % INDEX_STRIDE == 0:
+                index.append([ts_ms, offset])
+            if first is None:
+                first = ts_ms
+            last = ts_ms
+            count += 1
+            offset = line_end + 1
+
+        footer = {'count': count, 'first': first, 'last': last, 'index': index}
+        f.seek(data_end)
+        f.truncate()
+        f.write(b'#' + json.dumps(footer, separators=(',', ':')).encode('utf-8') + b'\n')
+        f.write(TRAILER.pack(data_end, TRAILER_MAGIC))
+
+
+def _unseal_segment(path):
+    """Strip the footer of a sealed segment so records can be appended again"""
+    with open(path, 'r+b') as f:
+        size = f.seek(0, os.SEEK_END)
+        footer_offset = _read_trailer(f, size)
+        if footer_offset is not None:
+            f.truncate(footer_offset)
+
+
+def _raw_records(path):
+    """(epoch_ms, payload bytes) of every complete record in a segment, footer excluded"""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        footer_offset = _read_trailer(f, size)
+        f.seek(0)
+        data = f.read(footer_offset if footer_offset is not None else size)
+    records = []
+    for line in data[:data.rfind(b'\n') + 1].split(b'\n'):
+        ts_field, sep, payload = line.partition(b' ')
+        if not sep:
+            continue
+        try:
+            records.append((int(ts_field), payload))
+        except ValueError:
+            continue
+    return records
+
+
+def rewrite_segment(path, records):
+    """
+    Replace a segment with (epoch_ms, record) pairs in time order. A record
+    given as bytes is already single-line JSON. The result is unsealed.
+    """
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for ts_ms, record in sorted(records, key=lambda item: item[0]):
+            payload = record if isinstance(record, bytes) else encode(record).encode('utf-8')
+            f.write(b'%d %s\n' % (ts_ms, payload))
+    os.replace(tmp_path, path)
+
+
+class HistoryLog:
+    """Append-only writer for one metrics source (e.g. 'windows', 'linux')"""
+
+    def __init__(self, history_dir, source, retention_days=7):
+        self.directory = segment_dir(history_dir)
+        self.source = source
+        self.retention_days = retention_days
+        self._hour = None
+        self._file = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path_for(self, hour):
+        return os.path.join(self.directory, f'{self.source}_{hour}{SEGMENT_SUFFIX}')
+
+    def _open_segment(self, hour):
+        """Switch the open handle to the segment for the given hour"""
+        self.close()
+        path = self._path_for(hour)
+        if os.path.exists(path):
+            # Restarted within the same hour: reopen the segment for appending
+            _unseal_segment(path)
+        else:
+            self._seal_previous(hour)
+            self.prune()
+        self._file = open(path, 'ab')
+        self._hour = hour
+
+    def _seal_previous(self, hour):
+        """Seal every older segment of this source that is still open-ended"""
+        for filename in os.listdir(self.directory):
+            parsed = _parse_segment_name(filename)
+            if parsed and parsed[0] == self.source and parsed[1] < hour:
+                try:
+                    seal_segment(os.path.join(self.directory, filename))
+                except OSError:
+                    continue
+
+    def prune(self):
+        """Delete whole segments older than the retention period"""
+        if not self.retention_days:
+            return
+        cutoff = segment_hour(time.time() - self.retention_days * 86400)
+        for filename in os.listdir(self.directory):
+            parsed = _parse_segment_name(filename)
+            if parsed and parsed[0] == self.source and parsed[1] < cutoff:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    continue
+
+    def append(self, record, timestamp=None):
+        """Append one metrics record; timestamp defaults to now (epoch seconds)"""
+        if timestamp is None:
+            timestamp = time.time()
+        self.extend([(record, timestamp)])
+
+    def extend(self, records):
+        """
+        Append (record, timestamp) pairs in time order with one flush per
+        segment. A record given as bytes is already single-line JSON (e.g.
+        as received from an agent) and is written as is.
+        """
+        encode = json.JSONEncoder(separators=(',', ':')).encode
+        for record, timestamp in records:
+            hour = segment_hour(timestamp)
+            if hour != self._hour or self._file is None:
+                self._open_segment(hour)
+            payload = record if isinstance(record, bytes) else encode(record).encode('utf-8')
+            self._file.write(b'%d %s\n' % (int(timestamp * 1000), payload))
+        if self._file is not None:
+            self._file.flush()
+
+    def insert(self, records):
+        """
+        Add (record, timestamp) pairs that are older than records already in
+        their segment (a clock stepped back, a late agent): each affected
+        segment is merged and rewritten in time order, and re-sealed if it
+        was sealed, since readers rely on that order.
+        """
+        by_hour = {}
+        for record, timestamp in records:
+            by_hour.setdefault(segment_hour(timestamp), []).append((int(timestamp * 1000), record))
+        for hour, added in sorted(by_hour.items()):
+            if hour == self._hour:
+                # Our own append handle would keep writing to the replaced file
+                self.close()
+            path = self._path_for(hour)
+            sealed = False
+            existing = []
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    sealed = _read_trailer(f, f.seek(0, os.SEEK_END)) is not None
+                existing = _raw_records(path)
+            rewrite_segment(path, existing + added)
+            if sealed:
+                seal_segment(path)
+
+    def close(self):
+        """Close the open segment (it stays unsealed until the hour rolls over)"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._hour = None
+
+
+def list_segments(history_dir, source=None, start=None, end=None):
+    """List segment paths for a source, ordered by hour, overlapping [start, end]"""
+    directory = segment_dir(history_dir)
+    if not os.path.isdir(directory):
+        return []
+
+    start_hour = segment_hour(start) if start is not None else None
+    end_hour = segment_hour(end) if end is not None else None
+
+    segments = []
+    for filename in os.listdir(directory):
+        parsed = _parse_segment_name(filename)
+        if not parsed:
+            continue
+        seg_source, hour = parsed
+        if source and seg_source != source:
+            continue
+        if start_hour and hour < start_hour:
+            continue
+        if end_hour and hour > end_hour:
+            continue
+        segments.append((hour, seg_source, os.path.join(directory, filename)))
+
+    segments.sort()
+    return [path for _, _, path in segments]
+
+
+def read_segment(path, start_ms=None, end_ms=None):
+    """Yield (epoch_ms, record) pairs from one segment within [start_ms, end_ms]"""
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return
+
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        footer_offset = _read_trailer(f, size)
+        offset = 0
+        data_end = size
+
+        if footer_offset is not None:
+            data_end = footer_offset
+            f.seek(footer_offset)
+            try:
+                footer = json.loads(f.read(size - TRAILER.size - footer_offset)[1:])
+            except ValueError:
+                footer = None
+
+            if footer:
+                if not footer['count']:
+                    return
+                if start_ms is not None and footer['last'] < start_ms:
+                    return
+                if end_ms is not None and footer['first'] > end_ms:
+                    return
+                if start_ms is not None and footer['index']:
+                    keys = [entry[0] for entry in footer['index']]
+                    pos = bisect.bisect_right(keys, start_ms) - 1
+                    if pos > 0:
+                        offset = footer['index'][pos][1]
+
+        f.seek(offset)
+        data = f.read(data_end - offset)
+
+    for line in data.split(b'\n'):
+        ts_field, sep, payload = line.partition(b' ')
+        if not sep:
+            continue
+        try:
+            ts_ms = int(ts_field)
+        except ValueError:
+            continue
+        if start_ms is not None and ts_ms < start_ms:
+            continue
+        if end_ms is not None and ts_ms > end_ms:
+            break
+        try:
+            yield ts_ms, json.loads(payload)
+        except ValueError:
+            # Torn record at the tail of a segment that is being written
+            continue
+
+
+def tail_segment(path, offset=0):
+    """
+    Read the complete records appended to a segment since byte `offset`.
+    Returns ([(epoch_ms, record), ...], new_offset); the new offset never
+    moves past the footer, so it stays valid if the segment is reopened.
+    """
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return [], offset
+
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        footer_offset = _read_trailer(f, size)
+        data_end = footer_offset if footer_offset is not None else size
+        if data_end <= offset:
+            return [], min(offset, data_end)
+        f.seek(offset)
+        data = f.read(data_end - offset)
+
+    # Leave a partially written last record for the next call
+    consumed = data.rfind(b'\n') + 1
+    records = []
+    for line in data[:consumed].split(b'\n'):
+        ts_field, sep, payload = line.partition(b' ')
+        if not sep:
+            continue
+        try:
+            records.append((int(ts_field), json.loads(payload)))
+        except ValueError:
+            continue
+    return records, offset + consumed
+
+
+def read_range(history_dir, source=None, start=None, end=None):
+    """Yield (epoch_ms, record) pairs for a source between two epoch timestamps"""
+    start_ms = int(start * 1000) if start is not None else None
+    end_ms = int(end * 1000) if end is not None else None
+    for path in list_segments(history_dir, source, start, end):
+        yield from read_segment(path, start_ms, end_ms)
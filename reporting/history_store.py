@@ -0,0 +1,98 @@
+"""
+History Store
+Single entry point that writes canonical samples to every history backend
+
+For one source, each sample is appended to the hourly segment log
+(full documents), the chart columns, and the rollup tiers. Samples that list
+GPU devices also get a row in the per-GPU columns ('<source>.gpu').
+"""
+
+import os
+
+from reporting.metrics_schema import sample_time
+from reporting.history_log import HistoryLog
+from reporting.column_store import ColumnWriter, gpu_source, gpu_device_columns
+from reporting.rollups import RollupWriter
+
+
+class HistoryStore:
+    """Writes canonical samples of one source under a metrics directory"""
+
+    def __init__(self, metrics_dir, source):
+        self.source = source
+        self.log = HistoryLog(os.path.join(metrics_dir, 'history'), source)
+        # Columns and rollup tiers are kept exactly as long as the segment log
+        retention_days = self.log.retention_days
+        columns_dir = os.path.join(metrics_dir, 'columns')
+        self.columns = ColumnWriter(columns_dir, source, retention_days=retention_days)
+        self.rollups = RollupWriter(columns_dir, source, retention_days=retention_days)
+        self.gpu_columns = ColumnWriter(columns_dir, gpu_source(source), {}, retention_days)
+
+    def append(self, sample, timestamp=None):
+        """Append one sample; the timestamp defaults to its collection_time"""
+        if timestamp is None:
+            timestamp = sample_time(sample)
+        self.log.append(sample, timestamp)
+        self.columns.append(sample, timestamp)
+        self.rollups.update(timestamp)
+
+        devices = gpu_device_columns(sample)
+        if devices:
+            self.gpu_columns.add_columns(devices)
+            self.gpu_columns.append(sample, timestamp)
+
+    def extend(self, samples, payloads=None):
+        """
+        Append many (sample, timestamp) pairs, which must be in time order:
+        each backend writes the whole batch and flushes once, and the rollups
+        are brought up to date once at the end. `payloads` optionally holds
+        each sample already encoded as single-line JSON for the segment log.
+        """
+        if not samples:
+            return
+        if payloads is None:
+            self.log.extend(samples)
+        else:
+            self.log.extend(zip(payloads, (timestamp for _, timestamp in samples)))
+        self.columns.extend(samples)
+        self.rollups.update(samples[-1][1])
+
+        gpu_rows = []
+        for sample, timestamp in samples:
+            devices = gpu_device_columns(sample)
+            if devices:
+                self.gpu_columns.add_columns(devices)
+                gpu_rows.append((sample, timestamp))
+        self.gpu_columns.extend(gpu_rows)
+
+    def insert(self, samples, payloads=None):
+        """
+        Add (sample, timestamp) pairs that are older than what is already
+        stored (e.g. from an agent whose clock was stepped back). Slower than
+        extend(): the affected segments and column partitions are rewritten
+        in time order and the rollup buckets covering them are recomputed.
+        """
+        if not samples:
+            return
+        if payloads is None:
+            self.log.insert(samples)
+        else:
+            self.log.insert(zip(payloads, (timestamp for _, timestamp in samples)))
+        self.columns.merge(samples)
+        self.rollups.rebuild(min(t for _, t in samples), max(t for _, t in samples))
+
+        gpu_rows = []
+        for sample, timestamp in samples:
+            devices = gpu_device_columns(sample)
+            if devices:
+                self.gpu_columns.add_columns(devices)
+                gpu_rows.append((sample, timestamp))
+        if gpu_rows:
+            self.gpu_columns.merge(gpu_rows)
+
+    def close(self):
+        """Close every open history file"""
+        self.log.close()
+        self.columns.close()
+        self.rollups.close()
+        self.gpu_columns.close()
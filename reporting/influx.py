@@ -0,0 +1,474 @@
+"""
+InfluxDB Writer
+Samples converted to line protocol and written to InfluxDB 2.x in gzip batches
+
+When INFLUX_URL is set (e.g. http://influxdb:8086, the compose service of
+the 'with-influxdb' profile), every sample written to the local history
+store is also handed to write(). It is converted to line protocol at once:
+one point per family and device (cpu, cpu_core, memory, filesystem,
+interface, gpu, pressure, container ...), tagged host and source, all
+numbers written as floats so a field never changes type, nanosecond
+timestamps (millisecond resolution, as in the segment log). Lines are buffered until BATCH_BYTES or
+FLUSH_SECONDS, then POSTed gzip-compressed to /api/v2/write over a small
+pool of keep-alive connections by one background thread.
+
+The local history store stays the source of truth. A batch that cannot be
+written (InfluxDB down, 5xx, 429) is not kept in memory: the time range it
+covered is recorded per source in '<metrics_dir>/influx_<source>.gap' and,
+once writes succeed again, replayed from the segment log chunk by chunk.
+InfluxDB overwrites a point with the same series and timestamp, so
+replaying a range twice is harmless. Batches InfluxDB rejects as malformed
+(400, 413, 422) are dropped.
+"""
+
+import os
+import gzip
+import math
+import time
+import random
+import threading
+import http.client
+import urllib.parse
+
+from reporting import history_log
+from reporting.metrics_schema import sample_time
+
+INFLUX_URL = os.getenv('INFLUX_URL')
+INFLUX_TOKEN = os.getenv('INFLUX_TOKEN')
+INFLUX_ORG = os.getenv('INFLUX_ORG', 'system-monitor')
+INFLUX_BUCKET = os.getenv('INFLUX_BUCKET', 'metrics')
+
+# Flush once this much line protocol (uncompressed) is buffered, or once the
+# oldest buffered line has waited FLUSH_SECONDS
+BATCH_BYTES = int(os.getenv('INFLUX_BATCH_BYTES', 1024 * 1024))
+FLUSH_SECONDS = float(os.getenv('INFLUX_FLUSH_SECONDS', 10))
+
+REQUEST_TIMEOUT = 10
+POOL_SIZE = 2
+MIN_BACKOFF = 1
+MAX_BACKOFF = 300
+
+# Statuses meaning the batch itself is bad; retrying it cannot succeed
+REJECTED = (400, 413, 422)
+
+_KEY_ESCAPES = str.maketrans({',': r'\,', '=': r'\=', ' ': r'\ ', '\n': ' '})
+_MEASUREMENT_ESCAPES = str.maketrans({',': r'\,', ' ': r'\ ', '\n': ' '})
+
+
+# =================================================================
+# Line Protocol
+# =================================================================
+
+def _numeric(values, exclude=()):
+    """The numeric and boolean entries of a dict (names, lists ... are left out)"""
+    return {key: value for key, value in values.items()
+            if key not in exclude and isinstance(value, (int, float))}
+
+
+def _points(sample):
+    """(measurement, tags, fields) for every point of a canonical sample"""
+    info = sample.get('system_info') or {}
+    cpu = sample.get('cpu') or {}
+    disk = sample.get('disk') or {}
+    network = sample.get('network') or {}
+    connections = network.get('connections') or {}
+    load = sample.get('system_load') or {}
+    averages = load.get('load_average') or {}
+
+    yield 'system', {}, {'uptime_seconds': info.get('uptime_seconds')}
+    yield 'collection', {}, _numeric(sample.get('collection') or {})
+
+    yield 'cpu', {}, _numeric(cpu)
+    for core, usage in enumerate(cpu.get('per_core') or []):
+        yield 'cpu_core', {'core': core}, {'usage_percent': usage}
+    for sensor, celsius in (cpu.get('temperatures') or {}).items():
+        yield 'temperature', {'sensor': sensor}, {'celsius': celsius}
+    yield 'memory', {}, _numeric(sample.get('memory') or {})
+
+    for fs in disk.get('filesystems') or []:
+        yield 'filesystem', {'device': fs.get('device'), 'mount': fs.get('mount'), 'fstype': fs.get('fstype')}, \
+            _numeric(fs)
+    yield 'disk_io', {}, _numeric(disk.get('io_stats') or {})
+    for device in disk.get('devices') or []:
+        yield 'disk_device', {'device': device.get('device')}, _numeric(device)
+
+    yield 'network', {}, dict(_numeric(network.get('rates') or {}),
+                              active_connections=network.get('active_connections'))
+    for interface in network.get('interfaces') or []:
+        yield 'interface', {'interface': interface.get('interface')}, _numeric(interface)
+    yield 'connections', {}, _numeric(connections)
+    for state, count in (connections.get('by_state') or {}).items():
+        yield 'tcp_sockets', {'state': state}, {'count': count}
+
+    for device in (sample.get('gpu') or {}).get('devices') or []:
+        yield 'gpu', {'gpu': device.get('index'), 'name': device.get('name'), 'uuid': device.get('uuid')}, \
+            _numeric(device, exclude=('index',))
+
+    yield 'system_load', {}, dict(_numeric(load), load1=averages.get('1min'),
+                                  load5=averages.get('5min'), load15=averages.get('15min'))
+    for resource, kinds in (load.get('pressure') or {}).items():
+        for kind, values in kinds.items():
+            yield 'pressure', {'resource': resource, 'kind': kind}, _numeric(values)
+
+    for container in (sample.get('containers') or {}).get('containers') or []:
+        tags = {'container': container.get('name'), 'id': container.get('id')}
+        yield 'container', tags, _numeric(container)
+        for resource, kinds in (container.get('pressure') or {}).items():
+            yield 'container_pressure', dict(tags, resource=resource), _numeric(kinds or {})
+
+
+def _field_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        # Always a float: an integer that is sometimes 0.0 would be a type conflict
+        return repr(float(value))
+    return None
+
+
+def timestamp_ns(timestamp):
+    """
+    Epoch seconds -> integer nanoseconds, cut to the millisecond the segment
+    log keys samples by, so a replayed point overwrites the live one
+    """
+    return int(timestamp * 1000) * 1000000
+
+
+def to_lines(sample, source, timestamp=None):
+    """A canonical sample as line protocol (bytes, one point per line)"""
+    if timestamp is None:
+        timestamp = sample_time(sample)
+    suffix = f' {timestamp_ns(timestamp)}\n'
+    base = {'host': (sample.get('system_info') or {}).get('hostname'), 'source': source}
+    lines = []
+    for measurement, tags, fields in _points(sample):
+        encoded = []
+        for key, value in fields.items():
+            value = _field_value(value)
+            if value is not None:
+                encoded.append(f'{str(key).translate(_KEY_ESCAPES)}={value}')
+        if not encoded:
+            continue
+        tags = dict(base, **tags)
+        tag_text = ''.join(f',{key.translate(_KEY_ESCAPES)}={str(value).translate(_KEY_ESCAPES)}'
+                           for key, value in sorted(tags.items()) if value not in (None, ''))
+        lines.append(measurement.translate(_MEASUREMENT_ESCAPES) + tag_text + ' ' + ','.join(encoded) + suffix)
+    return ''.join(lines).encode('utf-8')
+
+
+# =================================================================
+# HTTP
+# =================================================================
+
+class ConnectionPool:
+    """Keep-alive connections to one HTTP(S) server, reused across requests"""
+
+    def __init__(self, url, size=POOL_SIZE, timeout=REQUEST_TIMEOUT):
+        parts = urllib.parse.urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, headers, body) of one request; raises OSError / HTTPException on failure"""
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            reused = connection is not None
+            if connection is None:
+                connection = self._connect()
+            try:
+                connection.request(method, self.base_path + path, body, headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if reused:
+                    # The server closed an idle keep-alive connection: retry on a new one
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                with self._lock:
+                    if len(self._idle) < self.size:
+                        self._idle.append(connection)
+                        connection = None
+                if connection is not None:
+                    connection.close()
+            return response.status, response.headers, data
+
+    def close(self):
+        with self._lock:
+            for connection in self._idle:
+                connection.close()
+            self._idle = []
+
+
+# =================================================================
+# Writer
+# =================================================================
+
+class InfluxWriter:
+    """Buffers line protocol, flushes it in batches, replays failed ranges from local history"""
+
+    def __init__(self, url, org=INFLUX_ORG, bucket=INFLUX_BUCKET, token=None, batch_bytes=BATCH_BYTES,
+                 flush_seconds=FLUSH_SECONDS, timeout=REQUEST_TIMEOUT, pool_size=POOL_SIZE):
+        self.pool = ConnectionPool(url, pool_size, timeout)
+        self.path = '/api/v2/write?' + urllib.parse.urlencode(
+            {'org': org, 'bucket': bucket, 'precision': 'ns'})
+        self.headers = {'Content-Type': 'text/plain; charset=utf-8', 'Content-Encoding': 'gzip'}
+        if token:
+            self.headers['Authorization'] = f'Token {token}'
+        self.batch_bytes = batch_bytes
+        self.flush_seconds = flush_seconds
+        self.last_error = None
+        self._stats = {'points': 0, 'batches': 0, 'failed_batches': 0, 'rejected_batches': 0,
+                       'deferred_samples': 0, 'replayed_samples': 0}
+        self._buffer = []          # (lines, source, metrics_dir, timestamp)
+        self._buffered_bytes = 0
+        self._buffered_since = None
+        self._gaps = {}            # (metrics_dir, source) -> [start, end] or None
+        self._backoff = 0
+        self._retry_at = 0
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='influx-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def write(self, sample, source, metrics_dir=None, timestamp=None):
+        """
+        Queue one sample. `metrics_dir` is where the sample's local history
+        lives; without it a failed batch cannot be replayed and is lost.
+        """
+        if timestamp is None:
+            timestamp = sample_time(sample)
+        lines = to_lines(sample, source, timestamp)
+        with self._lock:
+            if metrics_dir is not None:
+                self._load_gap(metrics_dir, source)
+            self._buffer.append((lines, source, metrics_dir, timestamp))
+            self._buffered_bytes += len(lines)
+            if self._buffered_since is None:
+                self._buffered_since = time.monotonic()
+            full = self._buffered_bytes >= self.batch_bytes
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                since = self._buffered_since
+            wait = self.flush_seconds if since is None else since + self.flush_seconds - time.monotonic()
+            self._wake.wait(max(0, wait))
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self.flush() and self.replay():
+                # More of a gap is waiting: continue without the full wait
+                self._wake.set()
+
+    def flush(self):
+        """Send what is buffered; True unless InfluxDB could not be reached"""
+        with self._lock:
+            if not self._buffer:
+                return time.monotonic() >= self._retry_at
+            if time.monotonic() < self._retry_at and self._buffered_bytes < self.batch_bytes:
+                # Backing off: keep buffering up to one batch
+                return False
+            batch, self._buffer = self._buffer, []
+            self._buffered_bytes = 0
+            self._buffered_since = None
+        if time.monotonic() >= self._retry_at and self._send(b''.join(lines for lines, _, _, _ in batch), len(batch)):
+            return True
+        # Not written: leave it to the local history and replay it later
+        with self._lock:
+            for _, source, metrics_dir, timestamp in batch:
+                if metrics_dir is not None:
+                    self._extend_gap(metrics_dir, source, timestamp)
+            self._stats['deferred_samples'] += len(batch)
+        return False
+
+    def _send(self, body, samples):
+        """POST one batch; False when it should be retried later"""
+        with self._send_lock:
+            try:
+                status, headers, data = self.pool.request('POST', self.path, gzip.compress(body, 6), self.headers)
+            except (OSError, http.client.HTTPException) as e:
+                return self._failed(str(e) or e.__class__.__name__)
+            if 200 <= status < 300:
+                with self._lock:
+                    self._stats['points'] += body.count(b'\n')
+                    self._stats['batches'] += 1
+                    self._backoff = 0
+                    self._retry_at = 0
+                self.last_error = None
+                return True
+            message = data.decode('utf-8', 'replace')[:200]
+            if status in REJECTED:
+                # Malformed for InfluxDB: replaying it would fail the same way
+                print(f"InfluxDB rejected {samples} samples: HTTP {status} {message}")
+                with self._lock:
+                    self._stats['rejected_batches'] += 1
+                self.last_error = f'HTTP {status}: {message}'
+                return True
+            return self._failed(f'HTTP {status}: {message}', headers.get('Retry-After'))
+
+    def _failed(self, error, retry_after=None):
+        with self._lock:
+            self._stats['failed_batches'] += 1
+            self._backoff = min(MAX_BACKOFF, max(MIN_BACKOFF, self._backoff * 2))
+            delay = self._backoff * random.uniform(0.5, 1.0)
+            try:
+                delay = max(0, float(retry_after))
+            except (TypeError, ValueError):
+                pass
+            self._retry_at = time.monotonic() + delay
+        self.last_error = error
+        return False
+
+    # -- gaps ---------------------------------------------------------
+
+    @staticmethod
+    def _gap_path(metrics_dir, source):
+        return os.path.join(metrics_dir, f'influx_{source}.gap')
+
+    def _load_gap(self, metrics_dir, source):
+        """Pick up a gap left by an earlier process (caller holds the lock)"""
+        key = (metrics_dir, source)
+        if key in self._gaps:
+            return
+        try:
+            with open(self._gap_path(metrics_dir, source)) as f:
+                start_ms, end_ms = map(int, f.read().split())
+            self._gaps[key] = [start_ms, end_ms]
+        except (OSError, ValueError):
+            self._gaps[key] = None
+
+    def _save_gap(self, metrics_dir, source):
+        gap = self._gaps.get((metrics_dir, source))
+        path = self._gap_path(metrics_dir, source)
+        try:
+            if gap is None:
+                if os.path.exists(path):
+                    os.remove(path)
+                return
+            with open(path + '.tmp', 'w') as f:
+                f.write('%d %d\n' % tuple(gap))
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"InfluxDB gap file error ({path}): {e}")
+
+    def _extend_gap(self, metrics_dir, source, timestamp):
+        """Widen a source's gap (epoch ms, as keyed in the segment log) to cover a sample"""
+        ts_ms = int(timestamp * 1000)
+        gap = self._gaps.get((metrics_dir, source))
+        if gap is None:
+            self._gaps[(metrics_dir, source)] = [ts_ms, ts_ms]
+        else:
+            gap[0] = min(gap[0], ts_ms)
+            gap[1] = max(gap[1], ts_ms)
+        self._save_gap(metrics_dir, source)
+
+    def replay(self):
+        """
+        Send one batch of a recorded gap, read back from the local segment
+        log. Returns True while more remains to be replayed.
+        """
+        with self._lock:
+            pending = [(key, tuple(gap)) for key, gap in self._gaps.items() if gap]
+        if not pending:
+            return False
+        (metrics_dir, source), (start_ms, end_ms) = pending[0]
+        history_dir = os.path.join(metrics_dir, 'history')
+        chunks, size, last_ms, complete = [], 0, None, True
+        for path in history_log.list_segments(history_dir, source, start_ms / 1000, end_ms / 1000):
+            for ts_ms, sample in history_log.read_segment(path, start_ms, end_ms):
+                chunks.append(to_lines(sample, source, ts_ms / 1000))
+                size += len(chunks[-1])
+                last_ms = ts_ms
+                if size >= self.batch_bytes:
+                    complete = False
+                    break
+            if not complete:
+                break
+        if chunks and not self._send(b''.join(chunks), len(chunks)):
+            return False
+        with self._lock:
+            gap = self._gaps.get((metrics_dir, source))
+            if gap is not None:
+                if not complete:
+                    gap[0] = max(gap[0], last_ms + 1)
+                elif gap[1] <= end_ms:
+                    self._gaps[(metrics_dir, source)] = None
+                else:
+                    # Widened by a failure while this range was being replayed
+                    gap[0] = end_ms + 1
+                self._save_gap(metrics_dir, source)
+            self._stats['replayed_samples'] += len(chunks)
+            return any(self._gaps.values())
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, buffered_bytes=self._buffered_bytes, last_error=self.last_error,
+                        gaps={source: tuple(gap) for (_, source), gap in self._gaps.items() if gap})
+
+    def close(self, timeout=REQUEST_TIMEOUT):
+        """Stop the thread, then send the buffer and as much of any gap as time allows"""
+        deadline = time.monotonic() + timeout
+        self.stop(timeout)
+        with self._lock:
+            self._retry_at = 0
+        if self.flush():
+            while time.monotonic() < deadline and self.replay():
+                pass
+        self.pool.close()
+
+
+# One writer per process (all sources), started on the first write()
+_default = None
+_default_lock = threading.Lock()
+
+
+def write(sample, source, metrics_dir=None, timestamp=None):
+    """Queue a sample for InfluxDB; a no-op unless INFLUX_URL is set"""
+    global _default
+    if not INFLUX_URL:
+        return
+    with _default_lock:
+        if _default is None:
+            _default = InfluxWriter(INFLUX_URL, INFLUX_ORG, INFLUX_BUCKET, INFLUX_TOKEN).start()
+    _default.write(sample, source, metrics_dir, timestamp)
+
+
+def flush(timeout=REQUEST_TIMEOUT):
+    """Send what is buffered before a short-lived process exits (failures are replayed next run)"""
+    global _default
+    with _default_lock:
+        writer, _default = _default, None
+    if writer is not None:
+        writer.close(timeout)
@@ -0,0 +1,325 @@
+"""
+Batched Sample Ingest
+Samples pushed by remote agents, validated and appended to the history store
+
+Agents POST one batch per request as newline-delimited JSON, optionally
+gzip-compressed (Content-Encoding: gzip): a header line {"source": "<name>"}
+followed by one sample per line. Each sample is checked with a cheap
+structural test (current schema, the sections and numbers the charts rely
+on, a parseable collection_time) and the batch is queued whole; a single
+writer thread drains the queue and appends each source's samples with
+HistoryStore.extend (one flush per file for everything queued meanwhile).
+A request is answered only once its samples are written and flushed, as
+the agent deletes its spooled copy on the reply: a reporter restart or a
+failed write therefore loses nothing, the agent sends the batch again. The segment log gets
+each sample's line as received, so nothing is encoded to JSON again.
+The queue is bounded in samples: when a batch does not fit, submit() raises
+Busy with the number of seconds the writer needs to catch up, which the
+endpoint returns as 429 with Retry-After; a batch larger than the whole
+queue is refused with 413. A sample is identified by its source and
+collection time (to the millisecond, the segment log key): one already
+stored, checked against the source's timestamp column, is dropped, so a
+batch retried after a lost response does not duplicate history. A new
+sample older than the newest stored one (an agent whose clock was stepped
+back) is still kept, merged into the history in time order. Written
+samples are also handed to reporting/influx.py (a no-op unless INFLUX_URL
+is set).
+"""
+
+import os
+import re
+import json
+import math
+import zlib
+import time
+import threading
+from collections import deque
+
+from reporting import column_store, influx, metrics_schema
+from reporting.history_store import HistoryStore
+
+# Decompressed size limit of one batch
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+
+# Samples accepted but not yet written before agents are told to back off
+MAX_PENDING_SAMPLES = int(os.getenv('INGEST_MAX_PENDING', 20000))
+
+# Longest a request waits for its samples to be written (below the agents'
+# 10 second request timeout); past it the agent is told to retry
+WRITE_TIMEOUT = 8
+
+# Source names become file names ('<source>_<hour>.seg', columns/<source>)
+SOURCE_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+
+# Section -> fields that must be numeric for a sample to be accepted
+REQUIRED_NUMBERS = {
+    'cpu': ('usage_percent',),
+    'memory': ('total_bytes', 'used_bytes', 'usage_percent'),
+}
+
+# Per-sample errors reported back to the agent
+MAX_REPORTED_ERRORS = 10
+
+
+class IngestError(ValueError):
+    """Request that cannot be taken; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Busy(Exception):
+    """The write queue is full; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'ingest queue full, retry in {retry_after}s')
+        self.retry_after = retry_after
+
+
+def decode_batch(body, content_encoding=None):
+    """Request body -> (source, [sample line, ...]), bounded in decompressed size"""
+    if (content_encoding or '').lower() == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, MAX_BATCH_BYTES + 1)
+        except zlib.error as e:
+            raise IngestError(f'bad gzip body: {e}')
+        if len(body) > MAX_BATCH_BYTES or decompressor.unconsumed_tail:
+            raise IngestError('batch too large', 413)
+    elif content_encoding and content_encoding.lower() != 'identity':
+        raise IngestError(f'unsupported Content-Encoding: {content_encoding}', 415)
+    elif len(body) > MAX_BATCH_BYTES:
+        raise IngestError('batch too large', 413)
+
+    header, _, rest = body.partition(b'\n')
+    try:
+        header = json.loads(header)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise IngestError(f'bad header line: {e}')
+    source = header.get('source') if isinstance(header, dict) else None
+    if not isinstance(source, str) or not SOURCE_PATTERN.match(source):
+        raise IngestError('header line must be {"source": ...} matching ' + SOURCE_PATTERN.pattern)
+    return source, [line for line in rest.split(b'\n') if line.strip()]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate(line):
+    """
+    One sample line -> (canonical sample, timestamp, line to store), or
+    ValueError with the problem. Legacy samples are converted and re-encoded.
+    """
+    try:
+        sample = json.loads(line)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'bad JSON: {e}')
+    if not isinstance(sample, dict):
+        raise ValueError('sample is not an object')
+    if not metrics_schema.is_current(sample):
+        sample = metrics_schema.normalize(sample)
+        line = json.dumps(sample, separators=(',', ':')).encode('utf-8')
+    for section, fields in REQUIRED_NUMBERS.items():
+        values = sample.get(section)
+        if not isinstance(values, dict):
+            raise ValueError(f'missing section: {section}')
+        for field in fields:
+            if not _is_number(values.get(field)):
+                raise ValueError(f'{section}.{field} is not a number')
+    try:
+        timestamp = metrics_schema.sample_time(sample)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('system_info.collection_time is missing or not ISO 8601')
+    return sample, timestamp, line.strip()
+
+
+class _Batch:
+    """The valid samples of one request, and how writing them ended"""
+
+    __slots__ = ('source', 'samples', 'done', 'error')
+
+    def __init__(self, source, samples):
+        self.source = source
+        self.samples = samples
+        self.done = threading.Event()
+        self.error = None
+
+
+class IngestWriter:
+    """Bounded queue of validated batches drained by one writer thread"""
+
+    def __init__(self, metrics_dir, max_pending=MAX_PENDING_SAMPLES, write_timeout=WRITE_TIMEOUT):
+        self.metrics_dir = metrics_dir
+        self.max_pending = max_pending
+        self.write_timeout = write_timeout
+        self._queue = deque()
+        self._pending = 0
+        self._stores = {}
+        self._last_time = {}
+        self._rate = None   # samples written per second, smoothed
+        self._stats = {'accepted': 0, 'rejected': 0, 'duplicates': 0, 'written': 0, 'late': 0,
+                       'failed': 0, 'throttled': 0}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, source, samples):
+        """
+        Validate the sample lines of a decoded batch, queue the valid ones and
+        wait until the writer has stored and flushed them. Returns
+        {'accepted', 'rejected', 'errors'}; raises Busy when the queue is full
+        and IngestError (503) when the write failed or did not finish in time.
+        """
+        if len(samples) > self.max_pending:
+            # Could never fit, however long the agent waits: it has to split the batch
+            raise IngestError(f'batch of {len(samples)} samples exceeds the ingest queue '
+                              f'({self.max_pending})', 413)
+        with self._condition:
+            if self._pending + len(samples) > self.max_pending:
+                self._stats['throttled'] += 1
+                raise Busy(self._retry_after())
+
+        valid, errors = [], []
+        for index, sample in enumerate(samples):
+            try:
+                valid.append(validate(sample))
+            except ValueError as e:
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'index': index, 'error': str(e)})
+        rejected = len(samples) - len(valid)
+
+        batch = _Batch(source, valid)
+        with self._condition:
+            if valid:
+                self._queue.append(batch)
+                self._pending += len(valid)
+                self._condition.notify()
+            self._stats['accepted'] += len(valid)
+            self._stats['rejected'] += rejected
+            self._ensure_thread()
+
+        # Only acknowledge what is on disk: the agent deletes its copy on our reply
+        if valid:
+            if not batch.done.wait(self.write_timeout):
+                raise IngestError('samples not written yet, retry later', 503)
+            if batch.error is not None:
+                raise IngestError(f'write failed: {batch.error}', 503)
+        return {'accepted': len(valid), 'rejected': rejected, 'errors': errors}
+
+    def _retry_after(self):
+        """Seconds until the queue has drained at the recent write rate"""
+        rate = self._rate or 1000.0
+        return max(1, math.ceil(self._pending / rate))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                # Everything queued so far, written per source in one go
+                batches = list(self._queue)
+                self._queue.clear()
+            started = time.monotonic()
+            count = written = failed = 0
+            for source, group in _group_by_source(batches):
+                samples = [item for batch in group for item in batch.samples]
+                count += len(samples)
+                try:
+                    written += self._write(source, samples)
+                except Exception as e:
+                    failed += len(samples)
+                    print(f"Ingest write error ({source}): {e}")
+                    for batch in group:
+                        batch.error = str(e)
+            elapsed = time.monotonic() - started
+            with self._condition:
+                self._pending -= count
+                self._stats['written'] += written
+                self._stats['failed'] += failed
+                self._stats['duplicates'] += count - written - failed
+                if elapsed > 0 and count:
+                    rate = count / elapsed
+                    self._rate = rate if self._rate is None else 0.8 * self._rate + 0.2 * rate
+            for batch in batches:
+                batch.done.set()
+
+    def _write(self, source, samples):
+        """Store the samples of one source not stored yet; returns how many were written"""
+        if source not in self._stores:
+            self._stores[source] = HistoryStore(self.metrics_dir, source)
+            self._last_time[source] = column_store.last_timestamp(
+                os.path.join(self.metrics_dir, 'columns'), source)
+        samples.sort(key=lambda item: item[1])
+        samples = self._unseen(source, samples)
+        if not samples:
+            return 0
+
+        store = self._stores[source]
+        last = self._last_time[source]
+        late = [item for item in samples if last is not None and item[1] <= last]
+        newer = samples[len(late):]
+        if late:
+            # Older than what is stored: merged in place, which rewrites files
+            store.insert([(sample, timestamp) for sample, timestamp, _ in late],
+                         [line for _, _, line in late])
+            with self._condition:
+                self._stats['late'] += len(late)
+        if newer:
+            store.extend([(sample, timestamp) for sample, timestamp, _ in newer],
+                         [line for _, _, line in newer])
+            self._last_time[source] = newer[-1][1]
+            _write_latest(os.path.join(self.metrics_dir, f'latest_{source}.json'), newer[-1][2])
+        for sample, timestamp, _ in samples:
+            influx.write(sample, source, self.metrics_dir, timestamp)
+        return len(samples)
+
+    def _unseen(self, source, samples):
+        """
+        The samples (sorted by time) that are neither stored already nor
+        repeated earlier in the batch, by _sample_key
+        """
+        seen = set()
+        last = self._last_time[source]
+        if last is not None and samples[0][1] <= last:
+            rows = column_store.query(os.path.join(self.metrics_dir, 'columns'), source, [],
+                                      start=samples[0][1], end=last)
+            seen.update(_sample_key(timestamp) for timestamp in rows[column_store.TIMESTAMP])
+        unseen = []
+        for item in samples:
+            key = _sample_key(item[1])
+            if key not in seen:
+                seen.add(key)
+                unseen.append(item)
+        return unseen
+
+    def stats(self):
+        """Counters since start, queue depth and the recent write rate"""
+        with self._condition:
+            return dict(self._stats, pending=self._pending,
+                        samples_per_second=round(self._rate, 1) if self._rate else None)
+
+def _sample_key(timestamp):
+    """Identity of a sample within its source: its collection time in milliseconds"""
+    return int(timestamp * 1000)
+
+
+def _group_by_source(batches):
+    """[(source, [batch, ...])] in arrival order"""
+    grouped = {}
+    for batch in batches:
+        grouped.setdefault(batch.source, []).append(batch)
+    return grouped.items()
+
+
+def _write_latest(path, line):
+    """Replace latest_<source>.json atomically, as the local collectors do"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(line)
+    os.replace(tmp_path, path)
@@ -0,0 +1,244 @@
+"""
+Canonical Metrics Schema
+Versioned sample format shared by the collectors, the history store and the reporter
+
+The canonical sample is the dashboard format (system_info / cpu / memory /
+disk / network / gpu / system_load) tagged with 'schema_version'. The Python
+collectors emit it directly, so the reporter can hand current-version samples
+through untouched; only legacy documents take the conversion path below.
+
+One-shot migration of existing history:
+    python -m reporting.metrics_schema data/metrics [--keep-legacy]
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+from reporting import history_log
+
+SCHEMA_VERSION = 2
+
+
+def is_current(data):
+    """True if a sample already uses the current canonical schema"""
+    return isinstance(data, dict) and data.get('schema_version') == SCHEMA_VERSION
+
+
+def normalize(data):
+    """Return a sample in the canonical schema, converting legacy formats"""
+    if is_current(data):
+        return data
+    # Windows Python format (monitor_windows.py before schema versioning)
+    if 'system' in data and 'cpu' in data:
+        return from_legacy(data)
+    # Bash collector format already has the canonical layout
+    data = dict(data)
+    data['schema_version'] = SCHEMA_VERSION
+    return data
+
+
+def from_legacy(data):
+    """Convert a pre-versioning Python collector sample (GB/MB units)"""
+    converted = {
+        'schema_version': SCHEMA_VERSION,
+        'system_info': {
+            'hostname': data['system']['hostname'],
+            'platform': data['system']['platform'],
+            'version': data['system'].get('version', 'Unknown'),
+            'architecture': data['system'].get('architecture', 'Unknown'),
+            'collection_time': data.get('timestamp', ''),
+            'uptime_seconds': 0
+        },
+        'cpu': {
+            'usage_percent': data['cpu']['usage_percent'],
+            'temperature_celsius': data['cpu'].get('temperature', 'N/A'),
+            'core_count': data['cpu']['count'],
+            'model': 'Unknown',
+            'frequency_ghz': data['cpu']['frequency_mhz'] / 1000
+        },
+        'memory': {
+            'total_bytes': int(data['memory']['total_gb'] * 1024**3),
+            'used_bytes': int(data['memory']['used_gb'] * 1024**3),
+            'available_bytes': int(data['memory']['available_gb'] * 1024**3),
+            'usage_percent': data['memory']['percent'],
+            'swap_total_bytes': int(data['swap']['total_gb'] * 1024**3),
+            'swap_used_bytes': int(data['swap']['used_gb'] * 1024**3),
+            'swap_usage_percent': data['swap']['percent']
+        },
+        'disk': {
+            'filesystems': [
+                {
+                    'device': d['device'],
+                    'mount': d['mountpoint'],
+                    'total': int(d['total_gb'] * 1024**3),
+                    'used': int(d['used_gb'] * 1024**3),
+                    'available': int(d['free_gb'] * 1024**3),
+                    'usage_percent': d['percent']
+                } for d in data.get('disk', [])
+            ],
+            'io_stats': {
+                'reads_completed': 0,
+                'writes_completed': 0,
+                'bytes_read': 0,
+                'bytes_written': 0
+            },
+            'smart_status': 'N/A'
+        },
+        'network': {
+            'interfaces': [
+                {
+                    'interface': 'All',
+                    'rx_bytes': int(data['network']['bytes_recv_mb'] * 1024**2),
+                    'rx_packets': data['network']['packets_recv'],
+                    'rx_errors': 0,
+                    'tx_bytes': int(data['network']['bytes_sent_mb'] * 1024**2),
+                    'tx_packets': data['network']['packets_sent'],
+                    'tx_errors': 0
+                }
+            ],
+            'active_connections': 0,
+            'active_interface_names': ['All']
+        },
+        'gpu': {
+            'gpu': {
+                'vendor': 'NVIDIA' if data.get('gpu', {}).get('available') else 'None',
+                'name': data.get('gpu', {}).get('name', 'No GPU detected'),
+                'count': 1 if data.get('gpu', {}).get('available') else 0,
+                'utilization_percent': data.get('gpu', {}).get('utilization', 0),
+                'memory_used_bytes': int(data.get('gpu', {}).get('memory_used_mb', 0) * 1024**2),
+                'memory_total_bytes': int(data.get('gpu', {}).get('memory_total_mb', 1) * 1024**2),
+                'memory_percent': (data.get('gpu', {}).get('memory_used_mb', 0) / data.get('gpu', {}).get('memory_total_mb', 1) * 100) if data.get('gpu', {}).get('memory_total_mb', 0) > 0 else 0,
+                'temperature_celsius': data.get('gpu', {}).get('temperature', 0),
+                'power_watts': 0
+            },
+            'timestamp': data.get('timestamp', '')
+        },
+        'system_load': {
+            'load_average': {
+                '1min': data.get('system_load', {}).get('load_average', {}).get('1min', 0),
+                '5min': data.get('system_load', {}).get('load_average', {}).get('5min', 0),
+                '15min': data.get('system_load', {}).get('load_average', {}).get('15min', 0)
+            },
+            'total_processes': data.get('system_load', {}).get('total_processes', 0),
+            'running_processes': data.get('system_load', {}).get('running_processes', 0),
+            'sleeping_processes': data.get('system_load', {}).get('sleeping_processes', 0),
+            'zombie_processes': data.get('system_load', {}).get('zombie_processes', 0),
+            'top_cpu_processes': data.get('system_load', {}).get('top_cpu_processes', []),
+            'timestamp': data.get('timestamp', '')
+        }
+    }
+    return converted
+
+
+def sample_time(data):
+    """Epoch timestamp of a canonical sample"""
+    return datetime.fromisoformat(data['system_info']['collection_time']).timestamp()
+
+
+# =================================================================
+# One-shot History Migration
+# =================================================================
+
+def migrate_legacy_files(history_dir, keep_legacy=False):
+    """
+    Merge <source>_metrics_*.json files into the segment log of their source.
+    Each affected segment is read, merged in time order with the legacy
+    records and rewritten, since readers rely on records being sorted.
+    Files of the current hour are left alone: a collector may still be
+    appending to that segment (the reporter reads legacy files as they are).
+    """
+    current_hour = history_log.segment_hour(datetime.now().timestamp())
+    by_segment = {}
+    for filename in os.listdir(history_dir):
+        if not filename.endswith('.json') or '_metrics_' not in filename:
+            continue
+        source, _, stamp = filename[:-len('.json')].partition('_metrics_')
+        try:
+            timestamp = datetime.strptime(stamp, '%Y%m%d_%H%M%S').timestamp()
+        except ValueError:
+            continue
+        hour = history_log.segment_hour(timestamp)
+        if hour >= current_hour:
+            continue
+        by_segment.setdefault((source, hour), []).append((timestamp, filename))
+
+    migrated = 0
+    directory = history_log.segment_dir(history_dir)
+    os.makedirs(directory, exist_ok=True)
+    for (source, hour), files in sorted(by_segment.items()):
+        path = os.path.join(directory, f'{source}_{hour}{history_log.SEGMENT_SUFFIX}')
+        records = dict(history_log.read_segment(path)) if os.path.exists(path) else {}
+        added = []
+        for timestamp, filename in sorted(files):
+            ts_ms = int(timestamp * 1000)
+            if ts_ms not in records:
+                try:
+                    with open(os.path.join(history_dir, filename), 'r') as f:
+                        records[ts_ms] = normalize(json.load(f))
+                except (OSError, ValueError, KeyError):
+                    continue
+            added.append(filename)
+        if not added:
+            continue
+        history_log.rewrite_segment(path, records.items())
+        history_log.seal_segment(path)
+        migrated += len(added)
+        if not keep_legacy:
+            for filename in added:
+                os.remove(os.path.join(history_dir, filename))
+    return migrated
+
+
+def migrate_segments(history_dir):
+    """
+    Rewrite segments that still hold legacy records in the current schema.
+    Segments of the current hour are skipped: a running writer appends to
+    its open handle, and those appends would be lost with the replaced file.
+    """
+    current_hour = history_log.segment_hour(datetime.now().timestamp())
+    rewritten = 0
+    for path in history_log.list_segments(history_dir):
+        if _segment_hour(path) >= current_hour:
+            continue
+        records = list(history_log.read_segment(path))
+        if all(is_current(record) for _, record in records):
+            continue
+        history_log.rewrite_segment(path, [(ts_ms, normalize(record)) for ts_ms, record in records])
+        rewritten += 1
+
+    # Everything but the segments of the current hour is complete
+    for path in history_log.list_segments(history_dir):
+        if _segment_hour(path) < current_hour:
+            history_log.seal_segment(path)
+    return rewritten
+
+
+def _segment_hour(path):
+    return os.path.basename(path)[:-len(history_log.SEGMENT_SUFFIX)][-len('YYYYMMDD_HH'):]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Migrate metrics history to the current schema')
+    parser.add_argument('data_dir', nargs='?', default='data/metrics',
+                        help='metrics directory containing history/ (default: data/metrics)')
+    parser.add_argument('--keep-legacy', action='store_true',
+                        help='keep legacy per-sample JSON files after migrating them')
+    args = parser.parse_args(argv)
+
+    history_dir = os.path.join(args.data_dir, 'history')
+    if not os.path.isdir(history_dir):
+        print(f"No history directory at {history_dir}")
+        return 1
+
+    migrated = migrate_legacy_files(history_dir, args.keep_legacy)
+    rewritten = migrate_segments(history_dir)
+    print(f"Migrated {migrated} legacy files, rewrote {rewritten} segments "
+          f"(schema version {SCHEMA_VERSION})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Mount Discovery and Filesystem Usage
+Cached partition list plus statvfs calls that cannot stall a sample
+
+Listing partitions and stat'ing each one on every sample is wasteful, and a
+single hung NFS/CIFS server makes statvfs() block forever. The mount table
+is parsed once and re-read only when the kernel reports a change on
+/proc/self/mountinfo (poll() returns POLLPRI/POLLERR after mount or umount);
+platforms without it re-list partitions every REFRESH_SECONDS. Usage calls
+run on a worker pool (reporting/collection.py) with a per-mount deadline: a
+mount that misses it is reported unreachable with its last known figures and
+is not queried again until the stuck call returns.
+"""
+
+import os
+import time
+import threading
+from collections import namedtuple
+
+from reporting.collection import CollectionEngine, OK, ERROR
+
+try:
+    import psutil
+except ImportError:
+    # Only needed off Linux and for disk_usage when available (see _statvfs_usage)
+    psutil = None
+
+try:
+    from select import poll, POLLPRI, POLLERR
+except ImportError:
+    # Windows: no poll(), partitions are re-listed periodically instead
+    poll = None
+
+MOUNTINFO = '/proc/self/mountinfo'
+
+# Without change notification, re-list partitions this often
+REFRESH_SECONDS = 60
+
+# Deadline of one usage call; each mount has its own worker, so a hung
+# network mount never delays the others (it is not re-run until it returns)
+STATVFS_TIMEOUT = 2.0
+
+# Same as monitor_linux / monitor_windows used to skip
+EXCLUDED_FSTYPES = ('', 'tmpfs', 'devtmpfs', 'squashfs', 'overlay')
+
+# Network filesystems are 'nodev' but are exactly the mounts worth watching
+NETWORK_FSTYPES = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', 'ceph', 'glusterfs')
+
+# Same leading fields as psutil.disk_partitions() entries
+Partition = namedtuple('Partition', 'device mountpoint fstype opts')
+Usage = namedtuple('Usage', 'total used free percent')
+
+
+def _unescape(field):
+    """mountinfo escapes space, tab, newline and backslash as \\ooo"""
+    if '\\' not in field:
+        return field
+    return field.encode().decode('unicode_escape').encode('latin-1').decode('utf-8', 'replace')
+
+
+def parse_mountinfo(text):
+    """[Partition] from the contents of /proc/<pid>/mountinfo"""
+    partitions = []
+    for line in text.splitlines():
+        fields = line.split()
+        try:
+            separator = fields.index('-', 6)
+        except ValueError:
+            continue
+        if len(fields) < separator + 3:
+            continue
+        partitions.append(Partition(_unescape(fields[separator + 2]), _unescape(fields[4]),
+                                    fields[separator + 1], fields[5]))
+    return partitions
+
+
+def physical_fstypes(path='/proc/filesystems'):
+    """Filesystem types backed by a device (what psutil.disk_partitions() keeps)"""
+    fstypes = {'zfs'}
+    try:
+        with open(path) as f:
+            for line in f:
+                if not line.startswith('nodev'):
+                    fstypes.add(line.strip())
+    except OSError:
+        return None
+    return fstypes
+
+
+class MountTable:
+    """Partition list that is re-read only when the mount table changes"""
+
+    def __init__(self, path=MOUNTINFO, refresh_seconds=REFRESH_SECONDS, physical_only=True):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.physical_only = physical_only
+        self._partitions = None
+        self._loaded = 0
+        self._file = None
+        self._poller = None
+        self._fstypes = None
+        self._lock = threading.Lock()
+        if poll is not None and os.path.exists(path):
+            self._file = open(path, 'rb')
+            self._poller = poll()
+            self._poller.register(self._file, POLLPRI | POLLERR)
+            fstypes = physical_fstypes() if physical_only else None
+            self._fstypes = fstypes | set(NETWORK_FSTYPES) if fstypes else None
+
+    def _changed(self):
+        if self._poller is not None:
+            # Reported once per change; the poll itself re-arms it
+            return bool(self._poller.poll(0))
+        return time.monotonic() - self._loaded >= self.refresh_seconds
+
+    def _load(self):
+        if self._file is None:
+            return [Partition(p.device, p.mountpoint, p.fstype, p.opts)
+                    for p in psutil.disk_partitions(all=not self.physical_only)]
+        self._file.seek(0)
+        partitions = parse_mountinfo(self._file.read().decode('utf-8', 'replace'))
+        if self._fstypes:
+            partitions = [p for p in partitions if p.fstype in self._fstypes]
+        # Bind and repeated mounts: keep the first mount of each mount point
+        seen = set()
+        unique = []
+        for p in partitions:
+            if p.mountpoint not in seen:
+                seen.add(p.mountpoint)
+                unique.append(p)
+        return unique
+
+    def partitions(self):
+        """Current partitions; parses the mount table only after a change"""
+        with self._lock:
+            if self._partitions is None or self._changed():
+                self._partitions = self._load()
+                self._loaded = time.monotonic()
+            return list(self._partitions)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._poller = None
+
+
+def _statvfs_usage(mountpoint):
+    """psutil.disk_usage() equivalent from os.statvfs (no psutil needed)"""
+    st = os.statvfs(mountpoint)
+    total = st.f_blocks * st.f_frsize
+    free = st.f_bavail * st.f_frsize
+    used = (st.f_blocks - st.f_bfree) * st.f_frsize
+    denominator = used + free
+    return Usage(total, used, free, round(used / denominator * 100, 1) if denominator else 0.0)
+
+
+def _default_include(partition):
+    return partition.fstype not in EXCLUDED_FSTYPES and 'cdrom' not in partition.opts
+
+
+class FilesystemSampler:
+    """Usage of every mounted filesystem, each stat'ed on the pool with its own deadline"""
+
+    def __init__(self, table=None, include=None, timeout=STATVFS_TIMEOUT, usage=None):
+        self.table = table or MountTable()
+        self.include = include or _default_include
+        self.usage = usage or (psutil.disk_usage if psutil is not None else _statvfs_usage)
+        self.engine = CollectionEngine({}, default_timeout=timeout)
+        self._mounted = None
+
+    def sample(self):
+        """
+        [{'device', 'mount', 'fstype', 'total', 'used', 'available',
+          'usage_percent', 'reachable'}] for the included partitions. A mount
+        whose usage call errors is left out; one that misses its deadline is
+        listed with reachable=False and its last known (or zero) figures, as is
+        one that starts failing after having answered before.
+        """
+        partitions = [p for p in self.table.partitions() if self.include(p)]
+        mounted = tuple(p.mountpoint for p in partitions)
+        if mounted != self._mounted:
+            self.engine.set_collectors({
+                mount: (lambda mount=mount: self.usage(mount)) for mount in mounted})
+            self._mounted = mounted
+
+        values, status = self.engine.collect(mounted)
+        filesystems = []
+        for p in partitions:
+            state = status.get(p.mountpoint)
+            if state == ERROR:
+                # Never answered, only failed (e.g. an empty card reader)
+                continue
+            usage = values.get(p.mountpoint) or Usage(0, 0, 0, 0.0)
+            filesystems.append({
+                'device': p.device,
+                'mount': p.mountpoint,
+                'fstype': p.fstype,
+                'total': usage.total,
+                'used': usage.used,
+                'available': usage.free,
+                'usage_percent': round(usage.percent, 1),
+                'reachable': state == OK,
+            })
+        return filesystems
+
+    def close(self):
+        self.engine.close()
+        self.table.close()
+
+
+# Shared by the collectors of one process
+_default = None
+_default_lock = threading.Lock()
+
+
+def filesystems():
+    """Sample filesystem usage with the process-wide sampler"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = FilesystemSampler()
+    return _default.sample()
@@ -0,0 +1,126 @@
+"""
+Network I/O Sampler
+Per-interface throughput, packet, error and drop rates from cumulative counters
+
+Same approach as reporting/disk_io.py: the previous per-NIC snapshot is kept
+and rates are computed over the real (monotonic) time since then, with
+the same 32-bit wrap / reset handling (a re-created veth, tun or docker
+interface starts again from zero rather than reading as a wrap). Where the link speed is known, throughput is
+also expressed as a percentage of it, so a single saturated link shows up
+even when the host total looks moderate.
+"""
+
+import time
+import threading
+
+from reporting.disk_io import counter_delta
+
+try:
+    import psutil
+except ImportError:
+    # Only needed when no counters callable is supplied (see procfs)
+    psutil = None
+
+RATE_FIELDS = ('rx_bytes_per_sec', 'tx_bytes_per_sec', 'rx_packets_per_sec',
+               'tx_packets_per_sec', 'errors_per_sec', 'drops_per_sec')
+
+
+def is_loopback(name):
+    return name == 'lo' or name.lower().startswith('loopback')
+
+
+class NetIoSampler:
+    """Keeps the last per-NIC counter snapshot; sample() returns rates since then"""
+
+    def __init__(self, counters=None, if_stats=None):
+        # psutil.net_io_counters / net_if_stats-compatible callables (e.g. reporting.procfs)
+        self.counters = counters or psutil.net_io_counters
+        self.if_stats = if_stats or psutil.net_if_stats
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _take(self):
+        try:
+            nics = self.counters(pernic=True) or {}
+        except (OSError, RuntimeError):
+            nics = {}
+        return time.monotonic(), {name: c for name, c in nics.items() if not is_loopback(name)}
+
+    def _link_stats(self):
+        try:
+            return self.if_stats()
+        except (OSError, RuntimeError):
+            return {}
+
+    def sample(self):
+        """
+        Return {'interfaces': [...], 'active_interface_names': [...], 'rates': totals}.
+        Interfaces keep the cumulative rx_/tx_ counters of the canonical schema
+        plus drops, per-second rates and, when the link speed is known,
+        'utilization_percent' of the busier direction. The first call has no
+        previous snapshot and reports zero rates.
+        """
+        with self._lock:
+            previous = self._snapshot
+            current = self._take()
+            self._snapshot = current
+
+        now, nics = current
+        elapsed = now - previous[0] if previous else 0
+        links = self._link_stats()
+        interfaces = []
+        for name, c in sorted(nics.items()):
+            link = links.get(name)
+            row = {
+                'interface': name,
+                'rx_bytes': c.bytes_recv,
+                'rx_packets': c.packets_recv,
+                'rx_errors': c.errin,
+                'rx_drops': c.dropin,
+                'tx_bytes': c.bytes_sent,
+                'tx_packets': c.packets_sent,
+                'tx_errors': c.errout,
+                'tx_drops': c.dropout,
+                'speed_mbps': link.speed if link else 0,
+            }
+            before = previous[1].get(name) if previous else None
+            if before is not None and elapsed > 0:
+                def rate(field):
+                    return counter_delta(getattr(before, field), getattr(c, field)) / elapsed
+                row.update({
+                    'rx_bytes_per_sec': round(rate('bytes_recv'), 1),
+                    'tx_bytes_per_sec': round(rate('bytes_sent'), 1),
+                    'rx_packets_per_sec': round(rate('packets_recv'), 1),
+                    'tx_packets_per_sec': round(rate('packets_sent'), 1),
+                    'errors_per_sec': round(rate('errin') + rate('errout'), 2),
+                    'drops_per_sec': round(rate('dropin') + rate('dropout'), 2),
+                })
+            else:
+                row.update({field: 0.0 for field in RATE_FIELDS})
+            if row['speed_mbps']:
+                busiest = max(row['rx_bytes_per_sec'], row['tx_bytes_per_sec'])
+                row['utilization_percent'] = round(
+                    min(100.0, busiest * 8 / (row['speed_mbps'] * 1e6) * 100), 1)
+            interfaces.append(row)
+
+        rates = {field: round(sum(row[field] for row in interfaces), 2) for field in RATE_FIELDS}
+        rates['utilization_percent'] = max(
+            (row.get('utilization_percent', 0.0) for row in interfaces), default=0.0)
+        rates['interval'] = round(elapsed, 3)
+        return {
+            'interfaces': interfaces,
+            'active_interface_names': sorted(name for name in nics if links.get(name) and links[name].isup),
+            'rates': rates,
+        }
+
+
+# Shared by the collectors of one process
+_default = None
+
+
+def sample():
+    """Sample network I/O with the process-wide sampler"""
+    global _default
+    if _default is None:
+        _default = NetIoSampler()
+    return _default.sample()
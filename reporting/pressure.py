@@ -0,0 +1,88 @@
+"""
+Pressure Stall Information and Load Composition (Linux)
+How much of the time tasks were stalled, and how many run or wait right now
+
+The load average mixes runnable tasks with tasks in uninterruptible sleep
+and lags by minutes. /proc/pressure/{cpu,memory,io} (Linux 4.20+) reports
+the share of wall time in which some (or all) non-idle tasks were stalled
+on a resource, and /proc/stat gives the instantaneous run queue
+(procs_running) and the tasks blocked on I/O (procs_blocked). Besides the
+kernel's avg10/avg60/avg300, the sampler computes the stall share over the
+exact interval since its previous sample from the cumulative 'total'.
+"""
+
+import time
+import threading
+
+from reporting import procfs
+
+RESOURCES = ('cpu', 'memory', 'io')
+
+
+class PressureSampler:
+    """Keeps the previous PSI totals; sample() returns stall shares since then"""
+
+    def __init__(self, reader=None):
+        self.reader = reader or procfs.reader()
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _read_pressure(self):
+        stalls = {}
+        for resource in RESOURCES:
+            try:
+                stalls[resource] = self.reader.pressure(resource)
+            except OSError:
+                # Kernel without PSI (or booted with psi=0)
+                continue
+        return stalls
+
+    def sample(self):
+        """
+        {'procs_running', 'procs_blocked', 'pressure': {resource: {'some'|'full':
+        {'avg10', 'avg60', 'avg300', 'percent'}}}}. 'percent' covers the time
+        since the previous call (0.0 on the first). 'pressure' is empty
+        without PSI support.
+        """
+        _, _, counters = self.reader.stat()
+        with self._lock:
+            previous = self._snapshot
+            now = time.monotonic()
+            stalls = self._read_pressure()
+            self._snapshot = (now, stalls)
+
+        elapsed = now - previous[0] if previous else 0
+        pressure = {}
+        for resource, kinds in stalls.items():
+            pressure[resource] = {}
+            for kind, values in kinds.items():
+                before = previous[1].get(resource, {}).get(kind) if previous else None
+                percent = 0.0
+                if before is not None and elapsed > 0:
+                    stalled = max(0, values['total'] - before['total']) / 1e6
+                    percent = round(min(100.0, stalled / elapsed * 100), 2)
+                pressure[resource][kind] = {
+                    'avg10': values['avg10'],
+                    'avg60': values['avg60'],
+                    'avg300': values['avg300'],
+                    'percent': percent,
+                }
+        return {
+            'procs_running': counters.get('procs_running', 0),
+            'procs_blocked': counters.get('procs_blocked', 0),
+            'pressure': pressure,
+        }
+
+
+# Shared by the collectors of one process
+_default = None
+_default_lock = threading.Lock()
+
+
+def sample():
+    """Sample PSI and the run queue with the process-wide sampler"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PressureSampler()
+    return _default.sample()
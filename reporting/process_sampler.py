@@ -0,0 +1,189 @@
+"""
+Process Sampler
+Incremental process-table sampling with bounded-heap top-N selection
+
+psutil.process_iter() builds fresh Process objects every call, so their
+cpu_percent() is always 0.0 and every sample pays for a full scan plus a
+full sort. The sampler keeps one Process handle per PID across samples:
+each sample compares psutil.pids() with the tracked PIDs, creates handles
+only for new ones and drops exited ones, so the cost beyond reading the
+processes grows with churn, not with the table. A PID reused between two
+samples is noticed by its start time, taken from the /proc/<pid>/stat read
+oneshot() does anyway, and tracked as a new process on the next sample.
+Per-process CPU and I/O rates are real deltas since the previous sample. The top N processes by CPU, RSS
+and I/O rate are picked with heapq.nlargest (O(P log N), no full sort).
+"""
+
+import time
+import heapq
+import threading
+
+import psutil
+
+TOP_N = 5
+
+# Measuring window of the first sample, before any CPU baseline exists
+BOOTSTRAP_SECONDS = 0.1
+
+_STATUS_COUNTERS = {
+    psutil.STATUS_RUNNING: 'running_processes',
+    psutil.STATUS_SLEEPING: 'sleeping_processes',
+    psutil.STATUS_ZOMBIE: 'zombie_processes',
+}
+
+
+class _Tracked:
+    """A Process handle plus what is remembered about it between samples"""
+
+    __slots__ = ('process', 'name', 'start', 'io_bytes', 'io_time')
+
+    def __init__(self, process):
+        self.process = process
+        self.start = None
+        try:
+            self.name = process.name()
+        except psutil.Error:
+            self.name = '?'
+        self.io_bytes = None
+        self.io_time = None
+        # Establish the CPU baseline; the first cpu_percent() call returns 0.0
+        try:
+            process.cpu_percent(None)
+        except psutil.Error:
+            pass
+
+
+def _start_time(process):
+    """
+    Start time of whatever process holds the PID now. create_time() is
+    cached per handle and cannot tell; on Linux the stat fields parsed for
+    status() inside oneshot() carry it at no extra cost. None elsewhere.
+    """
+    try:
+        return process._proc._parse_stat_file()['create_time']
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+
+class ProcessSampler:
+    """Keeps Process handles across samples; sample() returns the load summary"""
+
+    def __init__(self, top_n=TOP_N, bootstrap=BOOTSTRAP_SECONDS):
+        self.top_n = top_n
+        self.bootstrap = bootstrap
+        self._tracked = {}
+        self._lock = threading.Lock()
+
+    def _refresh_pids(self):
+        """Add new processes and drop exited ones; returns True if any were added"""
+        pids = psutil.pids()
+        current = set(pids)
+        for pid in [pid for pid in self._tracked if pid not in current]:
+            del self._tracked[pid]
+        added = False
+        for pid in pids:
+            if pid in self._tracked:
+                continue
+            try:
+                self._tracked[pid] = _Tracked(psutil.Process(pid))
+            except psutil.Error:
+                continue
+            added = True
+        return added
+
+    def _read(self, pid, tracked, now, total_memory):
+        """One row for a tracked process, or None if it has gone away"""
+        process = tracked.process
+        try:
+            with process.oneshot():
+                status = process.status()
+                start = _start_time(process)
+                if tracked.start is None:
+                    tracked.start = start
+                elif start != tracked.start:
+                    # The PID now belongs to another process
+                    return None
+                cpu = process.cpu_percent(None)
+                rss = process.memory_info().rss
+                try:
+                    io = process.io_counters()
+                    io_bytes = io.read_bytes + io.write_bytes
+                except (psutil.AccessDenied, AttributeError):
+                    io_bytes = None
+        except psutil.ZombieProcess:
+            return {'pid': pid, 'name': tracked.name, 'status': psutil.STATUS_ZOMBIE,
+                    'cpu_percent': 0.0, 'rss_bytes': 0, 'memory_percent': 0.0,
+                    'io_bytes_per_sec': 0.0}
+        except psutil.Error:
+            return None
+
+        io_rate = 0.0
+        if io_bytes is not None:
+            if tracked.io_bytes is not None and now > tracked.io_time:
+                io_rate = max(0.0, (io_bytes - tracked.io_bytes) / (now - tracked.io_time))
+            tracked.io_bytes = io_bytes
+            tracked.io_time = now
+
+        return {
+            'pid': pid,
+            'name': tracked.name,
+            'status': status,
+            'cpu_percent': round(cpu, 1),
+            'rss_bytes': rss,
+            'memory_percent': round(rss / total_memory * 100, 2) if total_memory else 0.0,
+            'io_bytes_per_sec': round(io_rate, 1),
+        }
+
+    def _top(self, rows, key):
+        return [
+            {'pid': row['pid'], 'name': row['name'], 'cpu_percent': row['cpu_percent'],
+             'memory_percent': row['memory_percent'], 'rss_bytes': row['rss_bytes'],
+             'io_bytes_per_sec': row['io_bytes_per_sec']}
+            for row in heapq.nlargest(self.top_n, rows, key=lambda row: row[key])
+        ]
+
+    def sample(self):
+        """Process counts and top-N lists by CPU, resident memory and I/O rate"""
+        with self._lock:
+            first = not self._tracked
+            self._refresh_pids()
+            if first:
+                time.sleep(self.bootstrap)
+
+            now = time.monotonic()
+            total_memory = psutil.virtual_memory().total
+            rows = []
+            for pid, tracked in list(self._tracked.items()):
+                row = self._read(pid, tracked, now, total_memory)
+                if row is None:
+                    del self._tracked[pid]
+                else:
+                    rows.append(row)
+
+        summary = {
+            'total_processes': len(rows),
+            'running_processes': 0,
+            'sleeping_processes': 0,
+            'zombie_processes': 0,
+        }
+        for row in rows:
+            counter = _STATUS_COUNTERS.get(row['status'])
+            if counter:
+                summary[counter] += 1
+
+        summary['top_cpu_processes'] = self._top(rows, 'cpu_percent')
+        summary['top_memory_processes'] = self._top(rows, 'rss_bytes')
+        summary['top_io_processes'] = self._top(rows, 'io_bytes_per_sec')
+        return summary
+
+
+# Shared by the collectors of one process
+_default = None
+
+
+def sample():
+    """Sample the process table with the process-wide sampler"""
+    global _default
+    if _default is None:
+        _default = ProcessSampler()
+    return _default.sample()
@@ -0,0 +1,238 @@
+"""
+procfs Fast Path
+Direct readers for the Linux pseudo-files the collector samples every tick
+
+Each file is opened once and re-read with pread() at offset 0 into a reused
+buffer, and only the fields the collector needs are parsed. Roots come from
+HOST_PROC / HOST_SYS, so the privileged collector container (host /proc and
+/sys mounted at /host/proc and /host/sys) reports the host, not itself.
+"""
+
+import os
+import threading
+from collections import namedtuple
+
+PROC_ROOT = os.environ.get('HOST_PROC', '/proc')
+SYS_ROOT = os.environ.get('HOST_SYS', '/sys')
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+SECTOR_SIZE = 512
+
+# Same field names as psutil.cpu_times() on Linux, in seconds
+CpuTimes = namedtuple('CpuTimes', 'user nice system idle iowait irq softirq steal guest guest_nice')
+NetDev = namedtuple('NetDev', 'rx_bytes rx_packets rx_errors rx_drops tx_bytes tx_packets tx_errors tx_drops')
+# Same field names as psutil.net_io_counters()
+NetIo = namedtuple('NetIo', 'bytes_sent bytes_recv packets_sent packets_recv errin errout dropin dropout')
+NicStats = namedtuple('NicStats', 'isup speed')
+# Same field names as psutil.disk_io_counters() on Linux (times in ms)
+DiskIo = namedtuple('DiskIo', 'read_count write_count read_bytes write_bytes read_time write_time busy_time')
+
+MEMINFO_FIELDS = (b'MemTotal', b'MemFree', b'MemAvailable', b'SwapTotal', b'SwapFree')
+
+
+def proc_path(*parts):
+    return os.path.join(PROC_ROOT, *parts)
+
+
+def sys_path(*parts):
+    return os.path.join(SYS_ROOT, *parts)
+
+
+def is_whole_disk(name):
+    """True for block devices that are not partitions (sda, nvme0n1, dm-0 ...)"""
+    block = sys_path('block')
+    if not os.path.isdir(block):
+        return True
+    return os.path.exists(os.path.join(block, name.replace('/', '!')))
+
+
+def _read_sys(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        # e.g. EINVAL reading the speed of a virtual or down interface
+        return ''
+
+
+def net_if_stats():
+    """Drop-in for psutil.net_if_stats(): {interface: NicStats(isup, speed Mbit/s)}"""
+    stats = {}
+    directory = sys_path('class', 'net')
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return stats
+    for name in names:
+        speed = _read_sys(os.path.join(directory, name, 'speed'))
+        stats[name] = NicStats(
+            _read_sys(os.path.join(directory, name, 'operstate')) in ('up', 'unknown'),
+            max(0, int(speed)) if speed.lstrip('-').isdigit() else 0)
+    return stats
+
+
+def parse_pressure(text):
+    """PSI file -> {'some'|'full': {'avg10', 'avg60', 'avg300' (%), 'total' (usec)}}"""
+    if isinstance(text, bytes):
+        text = text.decode()
+    stalls = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        values = {}
+        for field in fields[1:]:
+            key, _, value = field.partition('=')
+            values[key] = int(value) if key == 'total' else float(value)
+        stalls[fields[0]] = values
+    return stalls
+
+
+class PseudoFile:
+    """A /proc or /sys file kept open and re-read from offset 0"""
+
+    def __init__(self, path, size=16384):
+        self.path = path
+        self._buffer = bytearray(size)
+        self._fd = None
+
+    def read(self):
+        """Current contents as bytes (one pread per call once the buffer fits)"""
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDONLY)
+        while True:
+            count = os.preadv(self._fd, [self._buffer], 0)
+            if count < len(self._buffer):
+                return bytes(memoryview(self._buffer)[:count])
+            # Did not fit: grow and read again from the start
+            self._buffer = bytearray(len(self._buffer) * 2)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class ProcReader:
+    """Parsers for /proc/stat, meminfo, net/dev, diskstats, loadavg and pressure/*"""
+
+    def __init__(self):
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _read(self, name):
+        with self._lock:
+            f = self._files.get(name)
+            if f is None:
+                f = self._files[name] = PseudoFile(proc_path(name))
+            try:
+                return f.read()
+            except OSError:
+                # Stale descriptor (e.g. the mount was replaced): reopen once
+                f.close()
+                return f.read()
+
+    def stat(self):
+        """(total CpuTimes, [per-core CpuTimes], {procs_running, procs_blocked, ctxt})"""
+        total = None
+        cores = []
+        counters = {}
+        for line in self._read('stat').split(b'\n'):
+            if line.startswith(b'cpu'):
+                fields = line.split()
+                values = [int(v) / CLOCK_TICKS for v in fields[1:11]]
+                values += [0.0] * (10 - len(values))
+                times = CpuTimes(*values)
+                if fields[0] == b'cpu':
+                    total = times
+                else:
+                    cores.append(times)
+            elif line.startswith((b'procs_running', b'procs_blocked', b'ctxt')):
+                key, value = line.split()
+                counters[key.decode()] = int(value)
+        return total, cores, counters
+
+    def cpu_times(self, percpu=False):
+        """Drop-in for psutil.cpu_times()"""
+        total, cores, _ = self.stat()
+        return cores if percpu else total
+
+    def meminfo(self):
+        """{field: bytes} for MEMINFO_FIELDS"""
+        values = {}
+        for line in self._read('meminfo').split(b'\n'):
+            key, _, rest = line.partition(b':')
+            if key in MEMINFO_FIELDS:
+                values[key.decode()] = int(rest.split()[0]) * 1024
+        return values
+
+    def net_dev(self):
+        """{interface: NetDev} from /proc/net/dev"""
+        interfaces = {}
+        for line in self._read('net/dev').split(b'\n')[2:]:
+            name, sep, rest = line.partition(b':')
+            if not sep:
+                continue
+            f = rest.split()
+            interfaces[name.strip().decode()] = NetDev(
+                int(f[0]), int(f[1]), int(f[2]), int(f[3]),
+                int(f[8]), int(f[9]), int(f[10]), int(f[11]))
+        return interfaces
+
+    def net_io_counters(self, pernic=False):
+        """Drop-in for psutil.net_io_counters()"""
+        nics = {name: NetIo(c.tx_bytes, c.rx_bytes, c.tx_packets, c.rx_packets,
+                            c.rx_errors, c.tx_errors, c.rx_drops, c.tx_drops)
+                for name, c in self.net_dev().items()}
+        if pernic:
+            return nics
+        return NetIo(*(sum(values) for values in zip(*nics.values()))) if nics else None
+
+    def diskstats(self):
+        """{device: DiskIo} from /proc/diskstats (partitions included)"""
+        devices = {}
+        for line in self._read('diskstats').split(b'\n'):
+            f = line.split()
+            if len(f) < 14:
+                continue
+            devices[f[2].decode()] = DiskIo(
+                int(f[3]), int(f[7]), int(f[5]) * SECTOR_SIZE, int(f[9]) * SECTOR_SIZE,
+                int(f[6]), int(f[10]), int(f[12]))
+        return devices
+
+    def disk_io_counters(self, perdisk=False):
+        """Drop-in for psutil.disk_io_counters(perdisk=True); totals skip partitions"""
+        devices = self.diskstats()
+        if perdisk:
+            return devices
+        disks = [c for name, c in devices.items() if is_whole_disk(name)]
+        return DiskIo(*(sum(values) for values in zip(*disks))) if disks else None
+
+    def loadavg(self):
+        """(1min, 5min, 15min) load averages"""
+        f = self._read('loadavg').split()
+        return float(f[0]), float(f[1]), float(f[2])
+
+    def pressure(self, resource):
+        """/proc/pressure/<cpu|memory|io> (Linux 4.20+, raises OSError without PSI)"""
+        return parse_pressure(self._read(os.path.join('pressure', resource)))
+
+    def close(self):
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+
+# Shared by the collectors of one process
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def reader():
+    """Process-wide ProcReader"""
+    global _reader
+    with _reader_lock:
+        if _reader is None:
+            _reader = ProcReader()
+    return _reader
@@ -6,12 +6,18 @@ Generates reports and serves web dashboard
 import os
 import json
 import glob
+import time
+import bisect
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
-from flask import Flask, render_template, jsonify, send_file, request
+from flask import Flask, Response, render_template, jsonify, send_file, request
 import plotly.graph_objs as go
 import plotly.utils
 import pandas as pd
+import numpy as np
+
+from reporting import history_log, column_store, rollups, metrics_schema, ingest, exposition, stream
 
 app = Flask(__name__)
 
@@ -19,6 +25,34 @@ app = Flask(__name__)
 PROJECT_ROOT = os.getenv('PROJECT_ROOT', os.path.dirname(os.path.dirname(__file__)))
 DATA_DIR = os.path.join(PROJECT_ROOT, 'data', 'metrics')
 REPORTS_DIR = os.path.join(PROJECT_ROOT, 'data', 'reports')
+COLUMNS_DIR = os.path.join(DATA_DIR, 'columns')
+
+# Shared secret agents send as 'Authorization: Bearer <token>' (unset: no check)
+INGEST_TOKEN = os.getenv('INGEST_TOKEN')
+
+# Numeric columns needed by the time-series charts
+CHART_COLUMNS = ['cpu.usage_percent', 'memory.percent', 'swap.percent',
+                 'network.bytes_sent', 'network.bytes_recv',
+                 'network.rx_bytes_per_sec', 'network.tx_bytes_per_sec',
+                 'network.errors_per_sec', 'network.drops_per_sec',
+                 'network.utilization_percent',
+                 'disk.read_bytes_per_sec', 'disk.write_bytes_per_sec',
+                 'disk.read_iops', 'disk.write_iops', 'disk.busy_percent',
+                 'load.procs_running', 'load.procs_blocked',
+                 'pressure.cpu_some', 'pressure.memory_some', 'pressure.memory_full',
+                 'pressure.io_some', 'pressure.io_full']
+
+# Stall series of the pressure chart (Linux PSI)
+PRESSURE_COLUMNS = ['pressure.cpu_some', 'pressure.memory_some', 'pressure.memory_full',
+                    'pressure.io_some', 'pressure.io_full']
+
+# Per-device disk and per-interface charts read full documents, so they cover a shorter window
+DEVICE_CHART_HOURS = 1
+
+# Charts use the coarsest rollup tier that still gives at least this many points
+MIN_CHART_POINTS = 300
+
+LOCAL_TZ = datetime.now().astimezone().tzinfo
 
 # Ensure directories exist
 Path(REPORTS_DIR).mkdir(parents=True, exist_ok=True)
@@ -33,13 +67,17 @@ def load_latest_metrics():
 
 def load_windows_metrics():
     """Load Windows metrics"""
-    latest_file = os.path.join(DATA_DIR, 'latest_windows.json')
-    return _load_and_convert_metrics(latest_file)
+    return load_source_metrics('windows')
 
 def load_wsl_metrics():
     """Load WSL/Docker metrics"""
-    latest_file = os.path.join(DATA_DIR, 'latest_wsl.json')
-    return _load_and_convert_metrics(latest_file)
+    return load_source_metrics('wsl')
+
+def load_source_metrics(source):
+    """Load the latest sample of a source (local collector or an agent pushing to /api/ingest)"""
+    if not ingest.SOURCE_PATTERN.match(source):
+        return None
+    return _load_and_convert_metrics(os.path.join(DATA_DIR, f'latest_{source}.json'))
 
 def _load_and_convert_metrics(latest_file):
     """Helper to load and convert metrics from file"""
@@ -53,104 +91,26 @@ def _load_and_convert_metrics(latest_file):
         except (json.JSONDecodeError, ValueError):
             return None
         
-        # Check if it's Windows Python format (from monitor_windows.py)
-        if 'system' in data and 'cpu' in data:
-            # Convert Windows format to expected format
-            converted = {
-                    'system_info': {
-                        'hostname': data['system']['hostname'],
-                        'platform': data['system']['platform'],
-                        'version': data['system'].get('version', 'Unknown'),
-                        'architecture': data['system'].get('architecture', 'Unknown'),
-                        'collection_time': data.get('timestamp', ''),
-                        'uptime_seconds': 0
-                    },
-                    'cpu': {
-                        'usage_percent': data['cpu']['usage_percent'],
-                        'temperature_celsius': data['cpu'].get('temperature', 'N/A'),
-                        'core_count': data['cpu']['count'],
-                        'model': 'Unknown',
-                        'frequency_ghz': data['cpu']['frequency_mhz'] / 1000
-                    },
-                    'memory': {
-                        'total_bytes': int(data['memory']['total_gb'] * 1024**3),
-                        'used_bytes': int(data['memory']['used_gb'] * 1024**3),
-                        'available_bytes': int(data['memory']['available_gb'] * 1024**3),
-                        'usage_percent': data['memory']['percent'],
-                        'swap_total_bytes': int(data['swap']['total_gb'] * 1024**3),
-                        'swap_used_bytes': int(data['swap']['used_gb'] * 1024**3),
-                        'swap_usage_percent': data['swap']['percent']
-                    },
-                    'disk': {
-                        'filesystems': [
-                            {
-                                'device': d['device'],
-                                'mount': d['mountpoint'],
-                                'total': int(d['total_gb'] * 1024**3),
-                                'used': int(d['used_gb'] * 1024**3),
-                                'available': int(d['free_gb'] * 1024**3),
-                                'usage_percent': d['percent']
-                            } for d in data.get('disk', [])
-                        ],
-                        'io_stats': {
-                            'reads_completed': 0,
-                            'writes_completed': 0,
-                            'bytes_read': 0,
-                            'bytes_written': 0
-                        },
-                        'smart_status': 'N/A'
-                    },
-                    'network': {
-                        'interfaces': [
-                            {
-                                'interface': 'All',
-                                'rx_bytes': int(data['network']['bytes_recv_mb'] * 1024**2),
-                                'rx_packets': data['network']['packets_recv'],
-                                'rx_errors': 0,
-                                'tx_bytes': int(data['network']['bytes_sent_mb'] * 1024**2),
-                                'tx_packets': data['network']['packets_sent'],
-                                'tx_errors': 0
-                            }
-                        ],
-                        'active_connections': 0,
-                        'active_interface_names': ['All']
-                    },
-                    'gpu': {
-                        'gpu': {
-                            'vendor': 'NVIDIA' if data.get('gpu', {}).get('available') else 'None',
-                            'name': data.get('gpu', {}).get('name', 'No GPU detected'),
-                            'count': 1 if data.get('gpu', {}).get('available') else 0,
-                            'utilization_percent': data.get('gpu', {}).get('utilization', 0),
-                            'memory_used_bytes': int(data.get('gpu', {}).get('memory_used_mb', 0) * 1024**2),
-                            'memory_total_bytes': int(data.get('gpu', {}).get('memory_total_mb', 1) * 1024**2),
-                            'memory_percent': (data.get('gpu', {}).get('memory_used_mb', 0) / data.get('gpu', {}).get('memory_total_mb', 1) * 100) if data.get('gpu', {}).get('memory_total_mb', 0) > 0 else 0,
-                            'temperature_celsius': data.get('gpu', {}).get('temperature', 0),
-                            'power_watts': 0
-                        },
-                        'timestamp': data.get('timestamp', '')
-                    },
-                    'system_load': {
-                        'load_average': {
-                            '1min': data.get('system_load', {}).get('load_average', {}).get('1min', 0),
-                            '5min': data.get('system_load', {}).get('load_average', {}).get('5min', 0),
-                            '15min': data.get('system_load', {}).get('load_average', {}).get('15min', 0)
-                        },
-                        'total_processes': data.get('system_load', {}).get('total_processes', 0),
-                        'running_processes': data.get('system_load', {}).get('running_processes', 0),
-                        'sleeping_processes': data.get('system_load', {}).get('sleeping_processes', 0),
-                        'zombie_processes': data.get('system_load', {}).get('zombie_processes', 0),
-                        'top_cpu_processes': data.get('system_load', {}).get('top_cpu_processes', []),
-                        'timestamp': data.get('timestamp', '')
-                    }
-                }
-            return converted
-        
-        # Return as-is if already in correct format
-        return data
+        return _convert_metrics(data)
+    return None
+
+def _convert_metrics(data):
+    """Convert a metrics document to the dashboard format"""
+    if data:
+        # Current-schema samples pass straight through; only legacy ones are converted
+        return metrics_schema.normalize(data)
     return None
 
 def load_historical_metrics(hours=24, source='windows'):
     """Load metrics from the last N hours for specified source"""
+    if hours <= HISTORY_CACHE_HOURS:
+        cached = _get_history_cache(source).get(hours)
+        if cached is not None:
+            return cached
+    return [data for _, data in _read_historical_metrics(hours, source)]
+
+def _read_historical_metrics(hours, source):
+    """Read (epoch_ms, converted) pairs for the last N hours straight from disk"""
     cutoff_time = datetime.now() - timedelta(hours=hours)
     
     # Look in history directory
@@ -158,18 +118,39 @@ def load_historical_metrics(hours=24, source='windows'):
     if not os.path.exists(history_dir):
         return []
     
+    # One-file-per-sample history written before the segment log existed
+    historical_data, _ = _load_legacy_history(history_dir, cutoff_time, source)
+    
+    # Segment log: seek to the first record in range instead of opening every file
+    for ts_ms, data in history_log.read_range(history_dir, _segment_source(source),
+                                              start=cutoff_time.timestamp()):
+        converted = _convert_metrics(data)
+        if converted:
+            historical_data.append((ts_ms, converted))
+    
+    return historical_data
+
+def _segment_source(source):
+    """Segment log source for a reporter source ('all' reads every source)"""
+    return None if source == 'all' else source
+
+def _load_legacy_history(history_dir, cutoff_time, source, after=None):
+    """
+    Load legacy <source>_metrics_YYYYMMDD_HHMMSS.json history files.
+    Returns ([(epoch_ms, converted), ...], high-water mark); files at or
+    before the `after` mark are skipped without being opened.
+    """
     # Pattern based on source
-    if source == 'windows':
-        pattern = 'windows_metrics_*.json'
-    elif source == 'wsl':
-        pattern = 'wsl_metrics_*.json'
-    else:
-        pattern = '*_metrics_*.json'
+    pattern = '*_metrics_*.json' if source == 'all' else f'{source}_metrics_*.json'
     
     metrics_files = glob.glob(os.path.join(history_dir, pattern))
     
+    # Filename timestamps sort lexically, so compare them as strings
+    cutoff_str = cutoff_time.strftime('%Y%m%d_%H%M%S')
+    
     historical_data = []
-    for file_path in sorted(metrics_files):
+    mark = after
+    for file_path in metrics_files:
         # Extract timestamp from filename
         filename = os.path.basename(file_path)
         try:
@@ -177,29 +158,262 @@ def load_historical_metrics(hours=24, source='windows'):
             parts = filename.split('_')
             if len(parts) >= 4:
                 timestamp_str = parts[2] + '_' + parts[3].replace('.json', '')
-                file_time = datetime.strptime(timestamp_str, '%Y%m%d_%H%M%S')
+                key = (timestamp_str, filename)
+                if timestamp_str < cutoff_str or (after and key <= after):
+                    continue
                 
-                if file_time >= cutoff_time:
-                    data = _load_and_convert_metrics(file_path)
-                    if data:
-                        historical_data.append(data)
+                data = _load_and_convert_metrics(file_path)
+                if data:
+                    file_time = datetime.strptime(timestamp_str, '%Y%m%d_%H%M%S')
+                    historical_data.append((int(file_time.timestamp() * 1000), data))
+                if mark is None or key > mark:
+                    mark = key
         except Exception as e:
             continue
     
-    return historical_data
+    historical_data.sort(key=lambda item: item[0])
+    return historical_data, mark
+
+# =================================================================
+# History Cache
+# =================================================================
+
+# Largest window served from memory; longer requests read from disk
+HISTORY_CACHE_HOURS = int(os.getenv('HISTORY_CACHE_HOURS', 24))
+# Upper bound on cached samples per contributing source (24h at 3s is 28,800);
+# the 'all' cache may hold this many for every source it merges
+HISTORY_CACHE_MAX_SAMPLES = int(os.getenv('HISTORY_CACHE_MAX_SAMPLES', 40000))
+
+class HistoryCache:
+    """
+    Converted history samples of one source, kept in timestamp order.
+    Each refresh only reads what arrived after the high-water marks: new
+    legacy files (the directory is not even listed unless its mtime changed)
+    and the bytes appended to segments since the last read. A segment that
+    was rewritten (a late sample inserted, a migration) is a new file: its
+    cached samples are dropped and it is read again from the start.
+    """
+    
+    def __init__(self, source):
+        self.source = source
+        self._times = []
+        self._samples = []
+        self._paths = []            # segment each sample came from (None: legacy file)
+        self._legacy_mark = None
+        self._legacy_mtime = None
+        self._segment_offsets = {}  # path -> (inode, offset)
+        self._source_count = 1
+        self._truncated = False
+        self._lock = threading.Lock()
+    
+    def get(self, hours):
+        """
+        Return cached samples from the last N hours (refreshing first), or
+        None when the cap evicted part of that window and it must be read from disk
+        """
+        with self._lock:
+            self._refresh()
+            cutoff_ms = (time.time() - hours * 3600) * 1000
+            if self._truncated and self._times and cutoff_ms < self._times[0]:
+                return None
+            return self._samples[bisect.bisect_left(self._times, cutoff_ms):]
+    
+    def _refresh(self):
+        history_dir = os.path.join(DATA_DIR, 'history')
+        if not os.path.exists(history_dir):
+            return
+        cutoff_time = datetime.now() - timedelta(hours=HISTORY_CACHE_HOURS)
+        new_samples = []
+        
+        mtime = os.stat(history_dir).st_mtime_ns
+        if mtime != self._legacy_mtime:
+            samples, self._legacy_mark = _load_legacy_history(
+                history_dir, cutoff_time, self.source, self._legacy_mark)
+            new_samples.extend((ts_ms, data, None) for ts_ms, data in samples)
+            self._legacy_mtime = mtime
+        
+        segments = history_log.list_segments(history_dir, _segment_source(self.source),
+                                             start=cutoff_time.timestamp())
+        cutoff_ms = cutoff_time.timestamp() * 1000
+        offsets = {}
+        replaced = set()
+        for path in segments:
+            try:
+                inode = os.stat(path).st_ino
+            except OSError:
+                continue
+            known_inode, offset = self._segment_offsets.get(path, (inode, 0))
+            if known_inode != inode:
+                replaced.add(path)
+                offset = 0
+            records, offset = history_log.tail_segment(path, offset)
+            offsets[path] = (inode, offset)
+            for ts_ms, data in records:
+                if ts_ms < cutoff_ms:
+                    continue
+                converted = _convert_metrics(data)
+                if converted:
+                    new_samples.append((ts_ms, converted, path))
+        if replaced:
+            self._forget(replaced)
+        # Segments that aged out of the window are forgotten
+        self._segment_offsets = offsets
+        self._source_count = max(1, len({history_log.segment_source(path) for path in segments}))
+        
+        self._merge(new_samples)
+        self._evict(cutoff_ms)
+    
+    def _forget(self, paths):
+        """Drop the cached samples read from the given segments"""
+        kept = [entry for entry in zip(self._times, self._samples, self._paths)
+                if entry[2] not in paths]
+        self._times = [t for t, _, _ in kept]
+        self._samples = [d for _, d, _ in kept]
+        self._paths = [p for _, _, p in kept]
+    
+    def _merge(self, new_samples):
+        if not new_samples:
+            return
+        new_samples.sort(key=lambda item: item[0])
+        if self._times and new_samples[0][0] < self._times[-1]:
+            merged = sorted(list(zip(self._times, self._samples, self._paths)) + new_samples,
+                            key=lambda item: item[0])
+            self._times = [t for t, _, _ in merged]
+            self._samples = [d for _, d, _ in merged]
+            self._paths = [p for _, _, p in merged]
+        else:
+            self._times.extend(t for t, _, _ in new_samples)
+            self._samples.extend(d for _, d, _ in new_samples)
+            self._paths.extend(p for _, _, p in new_samples)
+    
+    def _evict(self, cutoff_ms):
+        drop = bisect.bisect_left(self._times, cutoff_ms)
+        overflow = len(self._times) - HISTORY_CACHE_MAX_SAMPLES * self._source_count
+        truncated = overflow > drop
+        if truncated and not self._truncated:
+            print(f"History cache for '{self.source}' is full: samples before "
+                  f"{datetime.fromtimestamp(self._times[overflow] / 1000)} are not cached "
+                  f"(HISTORY_CACHE_MAX_SAMPLES={HISTORY_CACHE_MAX_SAMPLES} per source)")
+        self._truncated = truncated
+        drop = max(drop, overflow)
+        if drop > 0:
+            del self._times[:drop]
+            del self._samples[:drop]
+            del self._paths[:drop]
+
+_history_caches = {}
+_history_caches_lock = threading.Lock()
+
+def _get_history_cache(source):
+    """Return the history cache for a source, creating it on first use"""
+    with _history_caches_lock:
+        if source not in _history_caches:
+            _history_caches[source] = HistoryCache(source)
+        return _history_caches[source]
+
+# =================================================================
+# Chart Series Loading
+# =================================================================
+
+def select_tier(hours, source='windows'):
+    """Pick the coarsest rollup tier with enough points for an N hour window"""
+    start = time.time() - hours * 3600
+    for tier, step in reversed(rollups.TIERS):
+        if hours * 3600 / step < MIN_CHART_POINTS:
+            continue
+        if column_store.has_data(COLUMNS_DIR, rollups.tier_source(source, tier), start):
+            return tier
+    return 'raw'
+
+def load_chart_series(hours=24, source='windows', tier=None):
+    """Load the chart columns for the last N hours as {column: values}"""
+    start = time.time() - hours * 3600
+    if tier is None:
+        tier = select_tier(hours, source)
+    
+    if tier != 'raw':
+        series = _load_tier_series(source, tier, start)
+    elif column_store.has_data(COLUMNS_DIR, source, start):
+        # Columnar store: one slice per column, no JSON parsing
+        series = column_store.query(COLUMNS_DIR, source, CHART_COLUMNS, start=start)
+    else:
+        # Sources without a column store (e.g. the WSL bash writer) use full documents
+        return _series_from_history(load_historical_metrics(hours, source))
+    
+    series['timestamp'] = (pd.to_datetime(series['timestamp'], unit='s', utc=True)
+                           .tz_convert(LOCAL_TZ).tz_localize(None))
+    return series
+
+def _load_tier_series(source, tier, start):
+    """Load bucket averages from a rollup tier, topped up with raw samples"""
+    step = dict(rollups.TIERS)[tier]
+    rows = column_store.query(COLUMNS_DIR, rollups.tier_source(source, tier),
+                              [name + '.avg' for name in CHART_COLUMNS], start=start)
+    series = {name: rows[name + '.avg'] for name in CHART_COLUMNS}
+    series['timestamp'] = rows['timestamp']
+    
+    # The newest bucket is only written once it closes; fill it from raw data
+    tail_start = rows['timestamp'][-1] + step if len(rows['timestamp']) else start
+    tail = column_store.query(COLUMNS_DIR, source, CHART_COLUMNS, start=tail_start)
+    return {name: np.concatenate([values, tail[name]]) for name, values in series.items()}
+
+def load_gpu_device_series(hours=24, source='windows'):
+    """Per-GPU columns ('gpu<index>.<field>') for the last N hours, or None without GPU data"""
+    start = time.time() - hours * 3600
+    gpu_source = column_store.gpu_source(source)
+    if column_store.has_data(COLUMNS_DIR, gpu_source, start):
+        names = column_store.list_columns(COLUMNS_DIR, gpu_source, start)
+        series = column_store.query(COLUMNS_DIR, gpu_source, names, start=start)
+        series['timestamp'] = (pd.to_datetime(series['timestamp'], unit='s', utc=True)
+                               .tz_convert(LOCAL_TZ).tz_localize(None))
+    else:
+        # Sources without a column store: devices from full documents, shorter window
+        historical_data = load_historical_metrics(min(hours, DEVICE_CHART_HOURS), source)
+        series = {'timestamp': [data['system_info']['collection_time'] for data in historical_data]}
+        for i, data in enumerate(historical_data):
+            for device in data['gpu'].get('devices') or []:
+                for field in column_store.GPU_DEVICE_FIELDS:
+                    values = series.setdefault(f"gpu{device['index']}.{field}", [None] * len(historical_data))
+                    values[i] = device.get(field)
+    return series if len(series) > 1 and len(series['timestamp']) else None
+
+def _series_to_json(series):
+    """Convert chart columns to JSON-safe lists (NaN becomes null)"""
+    timestamps = series['timestamp']
+    if isinstance(timestamps, pd.DatetimeIndex):
+        timestamps = timestamps.strftime('%Y-%m-%dT%H:%M:%S').tolist()
+    result = {'timestamp': list(timestamps)}
+    for name in CHART_COLUMNS:
+        result[name] = [None if v != v else v for v in np.asarray(series[name], dtype=float).tolist()]
+    return result
+
+def _series_from_history(historical_data):
+    """Build chart columns from converted metrics documents"""
+    series = {
+        'timestamp': [data['system_info']['collection_time'] for data in historical_data],
+        'cpu.usage_percent': [float(data['cpu']['usage_percent']) for data in historical_data],
+        'memory.percent': [float(data['memory']['usage_percent']) for data in historical_data],
+        'swap.percent': [float(data['memory']['swap_usage_percent']) for data in historical_data],
+        'network.bytes_recv': [sum(int(iface['rx_bytes']) for iface in data['network']['interfaces'])
+                               for data in historical_data],
+        'network.bytes_sent': [sum(int(iface['tx_bytes']) for iface in data['network']['interfaces'])
+                               for data in historical_data]
+    }
+    # Rates, run queue and PSI exist only in samples written since the collectors computed them
+    for name in CHART_COLUMNS:
+        if name not in series:
+            series[name] = [column_store.COLUMNS[name](data) for data in historical_data]
+    return {name: np.asarray(values) if name != 'timestamp' else values
+            for name, values in series.items()}
 
 # =================================================================
 # Chart Generation Functions
 # =================================================================
 
-def generate_cpu_chart(historical_data):
+def generate_cpu_chart(series):
     """Generate CPU usage chart"""
-    timestamps = []
-    cpu_usage = []
-    
-    for data in historical_data:
-        timestamps.append(data['system_info']['collection_time'])
-        cpu_usage.append(float(data['cpu']['usage_percent']))
+    timestamps = series['timestamp']
+    cpu_usage = series['cpu.usage_percent']
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -220,16 +434,11 @@ def generate_cpu_chart(historical_data):
     
     return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
 
-def generate_memory_chart(historical_data):
+def generate_memory_chart(series):
     """Generate memory usage chart"""
-    timestamps = []
-    mem_usage = []
-    swap_usage = []
-    
-    for data in historical_data:
-        timestamps.append(data['system_info']['collection_time'])
-        mem_usage.append(float(data['memory']['usage_percent']))
-        swap_usage.append(float(data['memory']['swap_usage_percent']))
+    timestamps = series['timestamp']
+    mem_usage = series['memory.percent']
+    swap_usage = series['swap.percent']
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -257,6 +466,41 @@ def generate_memory_chart(historical_data):
     
     return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
 
+def generate_pressure_chart(series):
+    """Generate stall (PSI) chart with the run queue and blocked tasks"""
+    timestamps = series['timestamp']
+    
+    fig = go.Figure()
+    for name in PRESSURE_COLUMNS:
+        resource, _, kind = name.split('.')[1].partition('_')
+        fig.add_trace(go.Scatter(
+            x=timestamps,
+            y=series[name],
+            mode='lines',
+            name=f"{resource.upper() if resource != 'memory' else 'Memory'} {kind}",
+            line=dict(dash='solid' if kind == 'some' else 'dot')
+        ))
+    for name, label in (('load.procs_running', 'Run queue'), ('load.procs_blocked', 'Blocked on I/O')):
+        fig.add_trace(go.Scatter(
+            x=timestamps,
+            y=series[name],
+            mode='lines',
+            name=label,
+            yaxis='y2',
+            line=dict(color='#7f8c8d' if name == 'load.procs_running' else '#2c3e50', width=1)
+        ))
+    
+    fig.update_layout(
+        title='Pressure Stall (share of time tasks waited)',
+        xaxis_title='Time',
+        yaxis_title='Stalled (%)',
+        yaxis=dict(rangemode='tozero'),
+        yaxis2=dict(title='Tasks', overlaying='y', side='right', rangemode='tozero'),
+        template='plotly_white'
+    )
+    
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
 def generate_disk_chart(latest_data):
     """Generate disk usage chart"""
     filesystems = latest_data['disk']['filesystems']
@@ -285,21 +529,106 @@ def generate_disk_chart(latest_data):
     
     return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
 
-def generate_network_chart(historical_data):
-    """Generate network traffic chart"""
-    timestamps = []
-    total_rx = []
-    total_tx = []
+def generate_disk_io_chart(series):
+    """Generate disk throughput chart with busy time of the busiest device"""
+    timestamps = series['timestamp']
     
-    for data in historical_data:
-        timestamps.append(data['system_info']['collection_time'])
-        
-        interfaces = data['network']['interfaces']
-        rx = sum(int(iface['rx_bytes']) for iface in interfaces) / (1024**2)  # Convert to MB
-        tx = sum(int(iface['tx_bytes']) for iface in interfaces) / (1024**2)
-        
-        total_rx.append(rx)
-        total_tx.append(tx)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=timestamps,
+        y=series['disk.read_bytes_per_sec'] / (1024**2),
+        mode='lines',
+        name='Read',
+        line=dict(color='#2ecc71')
+    ))
+    fig.add_trace(go.Scatter(
+        x=timestamps,
+        y=series['disk.write_bytes_per_sec'] / (1024**2),
+        mode='lines',
+        name='Write',
+        line=dict(color='#9b59b6')
+    ))
+    fig.add_trace(go.Scatter(
+        x=timestamps,
+        y=series['disk.busy_percent'],
+        mode='lines',
+        name='Busy (max device)',
+        yaxis='y2',
+        line=dict(color='#e74c3c', dash='dot')
+    ))
+    
+    fig.update_layout(
+        title='Disk I/O Throughput',
+        xaxis_title='Time',
+        yaxis_title='Throughput (MB/s)',
+        yaxis2=dict(title='Busy (%)', overlaying='y', side='right', range=[0, 100]),
+        template='plotly_white'
+    )
+    
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+def generate_disk_device_chart(historical_data):
+    """Generate per-device busy time chart from full metrics documents"""
+    timestamps = [data['system_info']['collection_time'] for data in historical_data]
+    busy = {}
+    for i, data in enumerate(historical_data):
+        for device in data['disk'].get('devices') or []:
+            busy.setdefault(device['device'], [None] * len(historical_data))[i] = device['busy_percent']
+    
+    fig = go.Figure()
+    for name, values in sorted(busy.items()):
+        fig.add_trace(go.Scatter(
+            x=timestamps,
+            y=values,
+            mode='lines',
+            name=name
+        ))
+    
+    fig.update_layout(
+        title=f'Disk Busy Time by Device (last {DEVICE_CHART_HOURS}h)',
+        xaxis_title='Time',
+        yaxis_title='Busy (%)',
+        yaxis=dict(range=[0, 100]),
+        template='plotly_white'
+    )
+    
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+def generate_gpu_device_chart(series):
+    """Generate per-GPU utilization and memory chart"""
+    indexes = sorted({int(name[3:].split('.')[0]) for name in series if name.startswith('gpu')})
+    
+    fig = go.Figure()
+    for index in indexes:
+        fig.add_trace(go.Scatter(
+            x=series['timestamp'],
+            y=series[f'gpu{index}.utilization_percent'],
+            mode='lines',
+            name=f'GPU {index} utilization'
+        ))
+        fig.add_trace(go.Scatter(
+            x=series['timestamp'],
+            y=series[f'gpu{index}.memory_percent'],
+            mode='lines',
+            name=f'GPU {index} memory',
+            line=dict(dash='dot')
+        ))
+    
+    fig.update_layout(
+        title='Utilization and Memory by GPU',
+        xaxis_title='Time',
+        yaxis_title='Usage (%)',
+        yaxis=dict(range=[0, 100]),
+        template='plotly_white'
+    )
+    
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+def generate_network_chart(series):
+    """Generate network throughput chart (all interfaces)"""
+    timestamps = series['timestamp']
+    total_rx = series['network.rx_bytes_per_sec'] / (1024**2)  # Convert to MB/s
+    total_tx = series['network.tx_bytes_per_sec'] / (1024**2)
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -319,10 +648,71 @@ def generate_network_chart(historical_data):
         line=dict(color='#e74c3c')
     ))
     
+    fig.add_trace(go.Scatter(
+        x=timestamps,
+        y=series['network.errors_per_sec'] + series['network.drops_per_sec'],
+        mode='lines',
+        name='Errors + drops (/s)',
+        yaxis='y2',
+        line=dict(color='#7f8c8d', dash='dot')
+    ))
+    
     fig.update_layout(
-        title='Network Traffic',
+        title='Network Throughput',
         xaxis_title='Time',
-        yaxis_title='Data (MB)',
+        yaxis_title='Throughput (MB/s)',
+        yaxis2=dict(title='Errors + drops (/s)', overlaying='y', side='right', rangemode='tozero'),
+        template='plotly_white'
+    )
+    
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+def live_chart_points(row):
+    """
+    New y values of the time-series charts for one sample's chart columns,
+    one per trace in the order the generators above add them (the dashboard
+    appends them with Plotly.extendTraces)
+    """
+    mb = 1024**2
+    values = {
+        'cpu': [row['cpu.usage_percent']],
+        'memory': [row['memory.percent'], row['swap.percent']],
+        'pressure': [row[name] for name in PRESSURE_COLUMNS]
+                    + [row['load.procs_running'], row['load.procs_blocked']],
+        'disk_io': [row['disk.read_bytes_per_sec'] / mb, row['disk.write_bytes_per_sec'] / mb,
+                    row['disk.busy_percent']],
+        'network': [row['network.rx_bytes_per_sec'] / mb, row['network.tx_bytes_per_sec'] / mb,
+                    row['network.errors_per_sec'] + row['network.drops_per_sec']],
+    }
+    # NaN (missing in this sample) becomes null, which Plotly draws as a gap
+    return {chart: [None if v != v else round(v, 3) for v in points] for chart, points in values.items()}
+
+def generate_interface_chart(historical_data):
+    """Generate per-interface throughput chart from full metrics documents"""
+    timestamps = [data['system_info']['collection_time'] for data in historical_data]
+    traffic = {}
+    for i, data in enumerate(historical_data):
+        for iface in data['network']['interfaces']:
+            if 'rx_bytes_per_sec' not in iface:
+                continue
+            for direction, field in (('rx', 'rx_bytes_per_sec'), ('tx', 'tx_bytes_per_sec')):
+                values = traffic.setdefault((iface['interface'], direction), [None] * len(historical_data))
+                values[i] = iface[field] / (1024**2)
+    
+    fig = go.Figure()
+    for (name, direction), values in sorted(traffic.items()):
+        fig.add_trace(go.Scatter(
+            x=timestamps,
+            y=values,
+            mode='lines',
+            name=f'{name} {direction}',
+            line=dict(dash='solid' if direction == 'rx' else 'dot')
+        ))
+    
+    fig.update_layout(
+        title=f'Throughput by Interface (last {DEVICE_CHART_HOURS}h)',
+        xaxis_title='Time',
+        yaxis_title='Throughput (MB/s)',
         template='plotly_white'
     )
     
@@ -358,6 +748,17 @@ def api_latest():
 def api_historical(hours):
     """API endpoint for historical metrics"""
     source = request.args.get('source', 'windows')
+    resolution = request.args.get('resolution')
+    
+    # ?resolution=auto|raw|1m|5m|1h returns chart columns instead of documents
+    if resolution:
+        if resolution == 'auto':
+            resolution = select_tier(hours, source)
+        elif resolution != 'raw' and resolution not in dict(rollups.TIERS):
+            return jsonify({'error': f'Unknown resolution: {resolution}'}), 400
+        series = load_chart_series(hours, source, resolution)
+        return jsonify({'resolution': resolution, 'series': _series_to_json(series)})
+    
     data = load_historical_metrics(hours, source)
     return jsonify(data)
 
@@ -365,26 +766,131 @@ def api_historical(hours):
 def api_charts():
     """API endpoint for chart data"""
     source = request.args.get('source', 'windows')
-    latest = load_windows_metrics() if source == 'windows' else load_wsl_metrics()
-    historical = load_historical_metrics(24, source)
+    latest = load_source_metrics(source)
+    series = load_chart_series(24, source)
     
-    if not latest or not historical:
+    if not latest or not len(series['timestamp']):
         return jsonify({'error': 'Insufficient data'}), 404
     
     charts = {
-        'cpu': generate_cpu_chart(historical),
-        'memory': generate_memory_chart(historical),
+        'cpu': generate_cpu_chart(series),
+        'memory': generate_memory_chart(series),
         'disk': generate_disk_chart(latest),
-        'network': generate_network_chart(historical)
+        'disk_io': generate_disk_io_chart(series),
+        'network': generate_network_chart(series)
     }
     
+    # PSI and the run queue are Linux-only
+    if not np.isnan(np.asarray(series['load.procs_running'], dtype=float)).all():
+        charts['pressure'] = generate_pressure_chart(series)
+    
+    recent = load_historical_metrics(DEVICE_CHART_HOURS, source)
+    if any(data['disk'].get('devices') for data in recent):
+        charts['disk_devices'] = generate_disk_device_chart(recent)
+    if any(data['network'].get('rates') for data in recent):
+        charts['network_interfaces'] = generate_interface_chart(recent)
+    
+    gpu_series = load_gpu_device_series(24, source)
+    if gpu_series is not None:
+        charts['gpu_devices'] = generate_gpu_device_chart(gpu_series)
+    
     return jsonify(charts)
 
+_ingest_writer = ingest.IngestWriter(DATA_DIR)
+
+@app.route('/api/ingest', methods=['POST'])
+def api_ingest():
+    """Accept a batch of samples pushed by an agent (JSON, optionally gzip)"""
+    if INGEST_TOKEN and request.headers.get('Authorization') != f'Bearer {INGEST_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        source, samples = ingest.decode_batch(request.get_data(cache=False),
+                                              request.headers.get('Content-Encoding'))
+        result = _ingest_writer.submit(source, samples)
+    except ingest.IngestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except ingest.Busy as e:
+        return jsonify({'error': str(e)}), 429, {'Retry-After': str(e.retry_after)}
+    return jsonify(result), 200
+
+@app.route('/api/ingest', methods=['GET'])
+def api_ingest_stats():
+    """Ingest counters and queue depth"""
+    return jsonify(_ingest_writer.stats())
+
+# A source whose latest file is older than this (seconds, a few of the 3-5 s
+# writes or pushed batches) is left out of /metrics, so its series go stale
+EXPOSITION_MAX_AGE = int(os.getenv('EXPOSITION_MAX_AGE', 30))
+
+_exposition = exposition.Exposition()
+
+def _refresh_exposition():
+    """Re-render the sources whose latest_<source>.json changed since the last scrape"""
+    sources = []
+    oldest = time.time() - EXPOSITION_MAX_AGE
+    for path in glob.glob(os.path.join(DATA_DIR, 'latest_*.json')):
+        source = os.path.basename(path)[len('latest_'):-len('.json')]
+        if not ingest.SOURCE_PATTERN.match(source):
+            continue
+        try:
+            version = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        if version / 1e9 < oldest:
+            # Collector stopped: drop the source rather than repeat its last sample
+            continue
+        sources.append(source)
+        if _exposition.version(source) != version:
+            data = _load_and_convert_metrics(path)
+            if data:
+                _exposition.update(source, data, version)
+    _exposition.retain(sources)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Latest sample of every source in Prometheus text format (OpenMetrics on request)"""
+    _refresh_exposition()
+    openmetrics = exposition.wants_openmetrics(request.headers.get('Accept'))
+    compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+    headers = {'Content-Type': exposition.OPENMETRICS_CONTENT_TYPE if openmetrics
+               else exposition.TEXT_CONTENT_TYPE}
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    return _exposition.payload(openmetrics, compress), 200, headers
+
+def _stream_update(source, sample):
+    """Compact live update for one new sample: chart points and the summary card values"""
+    try:
+        timestamp = metrics_schema.sample_time(sample)
+    except (KeyError, TypeError, ValueError):
+        return None
+    row = {name: column_store.COLUMNS[name](sample) for name in CHART_COLUMNS}
+    load = sample.get('system_load', {})
+    return {
+        'source': source,
+        'time': datetime.fromtimestamp(timestamp, LOCAL_TZ).strftime('%Y-%m-%dT%H:%M:%S'),
+        'charts': live_chart_points(row),
+        'cpu': sample['cpu'].get('usage_percent'),
+        'memory': sample['memory'].get('usage_percent'),
+        'load1': load.get('load_average', {}).get('1min'),
+    }
+
+# One publisher reads each new sample once, however many dashboards are open
+_publisher = stream.Publisher(DATA_DIR, _load_and_convert_metrics, _stream_update,
+                              pattern=ingest.SOURCE_PATTERN)
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-sent events with one update per new sample (?source=windows,wsl; default: all)"""
+    sources = [source for source in request.args.get('source', '').split(',') if source] or None
+    return Response(_publisher.events(sources), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/report/html')
 def report_html():
     """Generate and serve HTML report"""
     source = request.args.get('source', 'windows')
-    latest = load_windows_metrics() if source == 'windows' else load_wsl_metrics()
+    latest = load_source_metrics(source)
     historical = load_historical_metrics(24, source)
     
     if not latest:
@@ -398,7 +904,7 @@ def report_markdown():
     from io import BytesIO
     
     source = request.args.get('source', 'windows')
-    latest = load_windows_metrics() if source == 'windows' else load_wsl_metrics()
+    latest = load_source_metrics(source)
     
     if not latest:
         return 'No data available', 404
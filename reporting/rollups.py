@@ -0,0 +1,158 @@
+"""
+Metrics Rollup Tiers
+min/max/avg/last rollups at 1-minute, 5-minute and 1-hour resolution
+
+Each tier is stored in the column store next to the raw columns, as the
+pseudo-source '<source>@<tier>' with columns '<column>.min', '.max', '.avg',
+'.last' and a 'count' column; a row's timestamp is the start of its bucket.
+Tiers cascade: 1m buckets are built from raw rows, 5m from 1m, 1h from 5m.
+A bucket is written once the first sample of a later bucket arrives, so the
+writer works the same from a long-running loop or a one-shot collector.
+"""
+
+import math
+
+from reporting import column_store
+
+# (tier name, bucket seconds), finest first
+TIERS = [('1m', 60), ('5m', 300), ('1h', 3600)]
+
+STATS = ('min', 'max', 'avg', 'last')
+
+# On the first run, backfill at most this far into existing raw data
+INITIAL_LOOKBACK = 86400
+
+
+def tier_source(source, tier):
+    """Column store source name of a rollup tier"""
+    return f'{source}@{tier}'
+
+
+def tier_columns(columns):
+    """Column names stored by a rollup tier for the given raw columns"""
+    return [f'{name}.{stat}' for name in columns for stat in STATS] + ['count']
+
+
+def _rollup_raw(rows, columns):
+    """Aggregate raw rows (dict of parallel value lists) into one bucket row"""
+    bucket = {'count': float(len(rows['timestamp']))}
+    for name in columns:
+        values = [v for v in rows[name] if not math.isnan(v)]
+        if values:
+            bucket[f'{name}.min'] = min(values)
+            bucket[f'{name}.max'] = max(values)
+            bucket[f'{name}.avg'] = sum(values) / len(values)
+            bucket[f'{name}.last'] = values[-1]
+        else:
+            for stat in STATS:
+                bucket[f'{name}.{stat}'] = math.nan
+    return bucket
+
+
+def _rollup_tier(rows, columns):
+    """Aggregate finer rollup rows into one coarser bucket row"""
+    counts = list(rows['count'])
+    bucket = {'count': float(sum(counts))}
+    for name in columns:
+        mins = [v for v in rows[f'{name}.min'] if not math.isnan(v)]
+        maxs = [v for v in rows[f'{name}.max'] if not math.isnan(v)]
+        lasts = [v for v in rows[f'{name}.last'] if not math.isnan(v)]
+        weighted = [(avg, n) for avg, n in zip(rows[f'{name}.avg'], counts) if not math.isnan(avg)]
+        total = sum(n for _, n in weighted)
+        bucket[f'{name}.min'] = min(mins) if mins else math.nan
+        bucket[f'{name}.max'] = max(maxs) if maxs else math.nan
+        bucket[f'{name}.avg'] = sum(avg * n for avg, n in weighted) / total if total else math.nan
+        bucket[f'{name}.last'] = lasts[-1] if lasts else math.nan
+    return bucket
+
+
+class RollupWriter:
+    """Maintains the rollup tiers of one source as raw samples are appended"""
+
+    def __init__(self, columns_dir, source, columns=None, retention_days=7):
+        self.columns_dir = columns_dir
+        self.source = source
+        self.columns = list(columns or column_store.COLUMNS)
+        names = tier_columns(self.columns)
+        self._writers = {
+            tier: column_store.ColumnWriter(
+                columns_dir, tier_source(source, tier),
+                {name: (lambda row, name=name: row[name]) for name in names},
+                retention_days=retention_days)
+            for tier, _ in TIERS
+        }
+        # Start of the newest bucket written per tier (read lazily from disk)
+        self._last_bucket = {}
+
+    def _last(self, tier):
+        if tier not in self._last_bucket:
+            self._last_bucket[tier] = column_store.last_timestamp(
+                self.columns_dir, tier_source(self.source, tier))
+        return self._last_bucket[tier]
+
+    def update(self, timestamp):
+        """Write every bucket that closed before the bucket of `timestamp`"""
+        finer_source, finer_columns, rollup = self.source, self.columns, _rollup_raw
+
+        for tier, step in TIERS:
+            current = timestamp - timestamp % step
+            last = self._last(tier)
+            start = last + step if last is not None else current - INITIAL_LOOKBACK
+            if start < current:
+                rows = column_store.query(self.columns_dir, finer_source, finer_columns,
+                                          start=start, end=current - 1e-6)
+                self._write_buckets(tier, step, rows, finer_columns, rollup)
+                # Empty buckets in the gap are never revisited
+                self._last_bucket[tier] = current - step
+
+            finer_source = tier_source(self.source, tier)
+            finer_columns = tier_columns(self.columns)
+            rollup = _rollup_tier
+
+    def rebuild(self, start, end):
+        """
+        Recompute the already written buckets that cover [start, end], after
+        raw rows were inserted there out of order (see ColumnWriter.merge).
+        Buckets that are not written yet are left to update().
+        """
+        finer_source, finer_columns, rollup = self.source, self.columns, _rollup_raw
+
+        for tier, step in TIERS:
+            last = self._last(tier)
+            first = start - start % step
+            if last is not None and first <= last:
+                stop = min(end - end % step, last)
+                rows = column_store.query(self.columns_dir, finer_source, finer_columns,
+                                          start=first, end=stop + step - 1e-6)
+                self._writers[tier].merge(self._buckets(step, rows, finer_columns, rollup))
+
+            finer_source = tier_source(self.source, tier)
+            finer_columns = tier_columns(self.columns)
+            rollup = _rollup_tier
+
+    def _buckets(self, step, rows, names, rollup):
+        """Group rows by bucket: [(rollup row, bucket start)]"""
+        timestamps = rows[column_store.TIMESTAMP]
+        buckets = []
+        begin = 0
+        while begin < len(timestamps):
+            bucket = timestamps[begin] - timestamps[begin] % step
+            end = begin
+            while end < len(timestamps) and timestamps[end] < bucket + step:
+                end += 1
+            chunk = {name: rows[name][begin:end] for name in names}
+            chunk['timestamp'] = timestamps[begin:end]
+            buckets.append((rollup(chunk, self.columns), float(bucket)))
+            begin = end
+        return buckets
+
+    def _write_buckets(self, tier, step, rows, names, rollup):
+        """Group rows by bucket and append one rollup row per bucket"""
+        for row, bucket in self._buckets(step, rows, names, rollup):
+            self._writers[tier].append(row, bucket)
+            self._last_bucket[tier] = bucket
+
+    def close(self):
+        """Close the tier column files"""
+        for writer in self._writers.values():
+            writer.close()
@@ -0,0 +1,106 @@
+"""
+Multi-Rate Scheduler
+Runs collection jobs on their own intervals, on wall-clock aligned ticks
+
+A job with a 5s interval runs at :00, :05, :10, ... regardless of how long
+the previous run took. The next deadline is computed from the previous
+deadline, not from "now + interval", so slow runs never push later ticks
+back (no drift). A run that overruns one or more whole ticks skips them
+and resumes on the next aligned tick instead of firing a burst. Wall-clock
+steps are handled both ways: a jump forward skips the ticks in between
+like an overrun, so a run is never stamped with a tick long past, and a step back (NTP correction, manual change)
+re-aligns every job to the grid at the new time instead of waiting for a
+deadline that may be an hour away.
+"""
+
+import sys
+import math
+import time
+import threading
+import traceback
+
+
+def next_aligned(now, interval):
+    """First multiple of `interval` (epoch seconds) strictly after `now`"""
+    return (math.floor(now / interval) + 1) * interval
+
+
+class Job:
+    """One scheduled function; func(tick) receives the scheduled tick time"""
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = None
+        self.runs = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+
+
+class Scheduler:
+    """Runs jobs until stop() is called; all jobs share one thread"""
+
+    def __init__(self, clock=time.time, on_error=None):
+        self.clock = clock
+        self.on_error = on_error
+        self.jobs = []
+        self._stop = threading.Event()
+
+    def add(self, name, interval, func):
+        """Register a job running every `interval` seconds"""
+        job = Job(name, interval, func)
+        self.jobs.append(job)
+        return job
+
+    def stop(self):
+        """Ask run() to return after the job in progress"""
+        self._stop.set()
+
+    def _run_job(self, job):
+        tick = job.next_run
+        started = self.clock()
+        try:
+            job.func(tick)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(job, e)
+            else:
+                print(f"[scheduler] job '{job.name}' failed:", file=sys.stderr)
+                traceback.print_exc()
+        finished = self.clock()
+        job.runs += 1
+        job.last_duration = finished - started
+
+        job.next_run = tick + job.interval
+        if job.next_run <= finished:
+            # Overran whole ticks: skip them but stay on the aligned grid
+            missed = int((finished - tick) // job.interval)
+            job.skipped += missed
+            job.next_run = tick + (missed + 1) * job.interval
+
+    def run(self):
+        """Run due jobs in deadline order until stopped"""
+        now = self.clock()
+        for job in self.jobs:
+            job.next_run = next_aligned(now, job.interval)
+
+        while not self._stop.is_set() and self.jobs:
+            now = self.clock()
+            for job in self.jobs:
+                if job.next_run - now > job.interval:
+                    # The clock stepped back: resume on the grid of the new time
+                    job.next_run = next_aligned(now, job.interval)
+                elif now - job.next_run >= job.interval:
+                    # It jumped forward (or other jobs held the thread): skip missed ticks
+                    missed = int((now - job.next_run) // job.interval)
+                    job.skipped += missed
+                    job.next_run += missed * job.interval
+            # Jobs sharing a tick run in registration order
+            job = min(self.jobs, key=lambda j: j.next_run)
+            delay = job.next_run - now
+            if delay > 0:
+                # Re-check after waking: the wall clock may have been adjusted
+                self._stop.wait(min(delay, 1.0))
+                continue
+            self._run_job(job)
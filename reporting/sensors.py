@@ -0,0 +1,209 @@
+"""
+Temperature Sensors (Linux)
+hwmon and thermal-zone inputs discovered once and re-read every tick
+
+psutil.sensors_temperatures() walks /sys/class/hwmon and reads every name,
+label and input file on each call. The registry does the walk once, keeps
+the selected temp*_input files open (procfs.PseudoFile, one pread each) and
+names every input by what it measures: 'cpu_package', 'cpu_core<N>',
+'nvme0', 'chipset', ... Thermal zones fill in what hwmon does not cover.
+Hotplug (a new NVMe drive, a module load) is picked up by re-listing
+/sys/class/hwmon every CHECK_SECONDS, or at once after an input vanishes.
+The sysfs root is a parameter, so any directory tree with the same layout
+can stand in for /sys.
+"""
+
+import os
+import re
+import time
+import errno
+import threading
+
+from reporting import procfs
+
+# Re-list /sys/class/hwmon this often to notice added or removed chips
+CHECK_SECONDS = 10
+
+# hwmon drivers that report the CPU package and cores
+CPU_CHIPS = ('coretemp', 'k10temp', 'zenpower', 'cpu_thermal', 'cpu-thermal')
+
+# Preference order for the single cpu.temperature_celsius figure
+CPU_KEYS = ('cpu_package', 'cpu_tctl', 'x86_pkg_temp')
+
+# Errors meaning the input is gone (device removed) rather than momentarily unreadable
+_GONE = (errno.ENOENT, errno.ENODEV, errno.ENXIO)
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+def _read_text(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def _chip_instance(hwmon_dir):
+    """Device of an hwmon chip: ('nvme0', 0) for NVMe, ('coretemp.1', 1) per CPU socket"""
+    device = os.path.basename(os.path.realpath(os.path.join(hwmon_dir, 'device')))
+    instance = device.rpartition('.')[2]
+    return device, int(instance) if instance.isdigit() else 0
+
+
+def sensor_key(chip, label, index, device='', instance=0):
+    """Map name for one hwmon input"""
+    label_slug = _slug(label) or f'temp{index}'
+    if chip in CPU_CHIPS:
+        prefix = 'cpu' if instance == 0 else f'cpu{instance}'
+        match = re.match(r'(package id|core|tccd)\s*(\d+)$', label.strip().lower())
+        if match and match.group(1) == 'package id':
+            return prefix + '_package'
+        if match:
+            return f"{prefix}_{match.group(1)}{match.group(2)}"
+        if label.lower() == 'tdie' or (not label and chip.startswith('cpu')):
+            return prefix + '_package'
+        return f'{prefix}_{label_slug}'
+    if chip == 'nvme':
+        name = device if device.startswith('nvme') else 'nvme'
+        return name if label.lower() in ('composite', '') else f'{name}_{label_slug}'
+    if chip.startswith('pch_'):
+        return 'chipset' if label_slug == f'temp{index}' else f'chipset_{label_slug}'
+    return f'{_slug(chip)}_{label_slug}'
+
+
+class SensorRegistry:
+    """Selected temperature inputs of one host, kept open between reads"""
+
+    def __init__(self, sys_root=None, check_seconds=CHECK_SECONDS):
+        self.sys_root = sys_root or procfs.SYS_ROOT
+        self.check_seconds = check_seconds
+        self._inputs = None
+        self._chips = None
+        self._checked = 0
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def _hwmon_dir(self):
+        return os.path.join(self.sys_root, 'class', 'hwmon')
+
+    def _list_chips(self):
+        try:
+            return tuple(sorted(os.listdir(self._hwmon_dir())))
+        except OSError:
+            return ()
+
+    def _discover(self, chips):
+        """{key: PseudoFile} for every hwmon temperature input, then thermal zones"""
+        inputs = {}
+
+        def add(key, path):
+            unique, n = key, 2
+            while unique in inputs:
+                unique, n = f'{key}_{n}', n + 1
+            inputs[unique] = procfs.PseudoFile(path, size=32)
+
+        chip_names = set()
+        for entry in chips:
+            hwmon_dir = os.path.join(self._hwmon_dir(), entry)
+            chip = _read_text(os.path.join(hwmon_dir, 'name'))
+            if not chip:
+                continue
+            chip_names.add(_slug(chip))
+            device, instance = _chip_instance(hwmon_dir)
+            try:
+                files = os.listdir(hwmon_dir)
+            except OSError:
+                continue
+            indexes = sorted(int(m.group(1)) for m in
+                             (re.match(r'temp(\d+)_input$', name) for name in files) if m)
+            for index in indexes:
+                label = _read_text(os.path.join(hwmon_dir, f'temp{index}_label'))
+                add(sensor_key(chip, label, index, device, instance),
+                    os.path.join(hwmon_dir, f'temp{index}_input'))
+
+        # Thermal zones whose driver has no hwmon chip (e.g. x86_pkg_temp)
+        thermal_dir = os.path.join(self.sys_root, 'class', 'thermal')
+        try:
+            zones = sorted(name for name in os.listdir(thermal_dir) if name.startswith('thermal_zone'))
+        except OSError:
+            zones = []
+        for zone in zones:
+            zone_type = _slug(_read_text(os.path.join(thermal_dir, zone, 'type')))
+            if zone_type == 'x86_pkg_temp' and 'coretemp' in chip_names:
+                continue
+            if zone_type and zone_type not in chip_names and zone_type not in inputs:
+                add(zone_type, os.path.join(thermal_dir, zone, 'temp'))
+        return inputs
+
+    def _refresh(self):
+        """Rediscover when never done, after a vanished input, or when the chip list changed"""
+        now = time.monotonic()
+        if self._inputs is not None and not self._stale and now - self._checked < self.check_seconds:
+            return
+        chips = self._list_chips()
+        self._checked = now
+        if self._inputs is not None and not self._stale and chips == self._chips:
+            return
+        self._close_inputs()
+        self._inputs = self._discover(chips)
+        self._chips = chips
+        self._stale = False
+
+    def temperatures(self):
+        """{key: degrees Celsius} for every readable input; sleeping sensors are left out"""
+        with self._lock:
+            self._refresh()
+            readings = {}
+            for key, f in self._inputs.items():
+                try:
+                    readings[key] = round(int(f.read()) / 1000.0, 1)
+                except OSError as e:
+                    # EIO/ENODATA: sensor powered down for now; gone: rediscover next time
+                    f.close()
+                    if e.errno in _GONE:
+                        self._stale = True
+                except ValueError:
+                    continue
+            return readings
+
+    def _close_inputs(self):
+        for f in (self._inputs or {}).values():
+            f.close()
+
+    def close(self):
+        with self._lock:
+            self._close_inputs()
+            self._inputs = None
+
+
+def cpu_temperature(readings):
+    """Single CPU figure from a temperatures() map: package, else hottest core, else ACPI zone"""
+    for key in CPU_KEYS:
+        if key in readings:
+            return readings[key]
+    cores = [value for key, value in readings.items() if re.match(r'cpu\d*_(core|tccd)\d+$', key)]
+    if cores:
+        return max(cores)
+    cpu = [value for key, value in readings.items() if key.startswith('cpu')]
+    if cpu:
+        return max(cpu)
+    # No CPU driver loaded (VMs, some laptops): the ACPI zone tracks the CPU best
+    acpi = [value for key, value in readings.items() if key.startswith('acpitz')]
+    return acpi[0] if acpi else None
+
+
+# Shared by the collectors of one process
+_default = None
+_default_lock = threading.Lock()
+
+
+def temperatures():
+    """Read every temperature with the process-wide registry"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SensorRegistry()
+    return _default.temperatures()
@@ -0,0 +1,334 @@
+"""
+Agent Spool and Uploader
+On-disk queue of samples waiting for the central reporter, drained in the background
+
+When MONITOR_PUSH_URL is set (e.g. http://reporter:8080/api/ingest), the
+collectors hand every sample to push(), which appends it as one JSON line to
+the spool and returns at once; sampling never waits on the network. The
+spool is a directory of append-only segment files plus a cursor file
+holding the position of the first sample not yet acknowledged by the
+reporter. An uploader thread reads from the cursor in batches bounded by
+count and size (or whatever is there once the oldest sample has waited
+MAX_DELAY seconds), POSTs them gzip-compressed to /api/ingest
+(reporting/ingest.py) and advances the cursor only after a 2xx reply. A
+lost reply therefore means the batch is sent again; the reporter drops
+samples it already holds, keyed by source and collection_time (delivery is
+at least once, storage exactly once). Failures back off exponentially up to
+MAX_BACKOFF, and a 429 waits for its Retry-After. Only a batch the
+reporter rejects as malformed (400, 422) is skipped; any other status,
+including a 404 from a wrong MONITOR_PUSH_URL or a proxy, backs off and
+keeps the samples. A 413 halves the batch size until the reporter takes
+it (each accepted batch doubles it again, back up to BATCH_SAMPLES); a
+single sample that is still too large is skipped. The spool is
+bounded by MAX_SPOOL_BYTES: past that, the oldest segment is discarded.
+"""
+
+import os
+import re
+import json
+import gzip
+import time
+import random
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+PUSH_URL = os.getenv('MONITOR_PUSH_URL')
+PUSH_TOKEN = os.getenv('INGEST_TOKEN')
+SPOOL_DIR = os.getenv('MONITOR_SPOOL_DIR', os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'data', 'spool'))
+
+# Rotate segment files at this size; whole segments are deleted once acknowledged
+SEGMENT_BYTES = 1024 * 1024
+# Oldest samples are dropped beyond this much unsent data (~10k samples of 6 KB)
+MAX_SPOOL_BYTES = int(os.getenv('MONITOR_SPOOL_MAX_BYTES', 64 * 1024 * 1024))
+
+# Batch limits: samples, uncompressed bytes, and the longest a sample waits
+BATCH_SAMPLES = 500
+BATCH_BYTES = 4 * 1024 * 1024
+MAX_DELAY = 5
+
+REQUEST_TIMEOUT = 10
+MIN_BACKOFF = 1
+MAX_BACKOFF = 300
+
+# Statuses meaning the batch itself is bad; sending it again cannot succeed
+REJECTED = (400, 422)
+TOO_LARGE = 413
+
+CURSOR_FILE = 'cursor'
+_SEGMENT_NAME = re.compile(r'^(\d{12})\.ndjson$')
+
+
+def _segment_name(number):
+    return f'{number:012d}.ndjson'
+
+
+class Spool:
+    """Append-only sample queue in a directory; read from a cursor, acknowledged in order"""
+
+    def __init__(self, directory, max_bytes=MAX_SPOOL_BYTES, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.dropped = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._segments = sorted(int(m.group(1)) for m in
+                                map(_SEGMENT_NAME.match, os.listdir(directory)) if m)
+        self._cursor = self._read_cursor()
+        self._file = None
+        if self._segments:
+            self._repair(self._segments[-1])
+
+    def _path(self, number):
+        return os.path.join(self.directory, _segment_name(number))
+
+    def _read_cursor(self):
+        if not self._segments:
+            return 0, 0
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                segment, offset = map(int, f.read().split())
+        except (OSError, ValueError):
+            return self._segments[0], 0
+        if segment < self._segments[0]:
+            return self._segments[0], 0
+        return segment, offset
+
+    def _write_cursor(self):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        with open(path + '.tmp', 'w') as f:
+            f.write('%d %d\n' % self._cursor)
+        os.replace(path + '.tmp', path)
+
+    def _repair(self, number):
+        """Cut a line torn by a crash off the end of the newest segment"""
+        with open(self._path(number), 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                f.truncate(end)
+
+    def _size(self):
+        return sum(os.path.getsize(self._path(number)) for number in self._segments
+                   if os.path.exists(self._path(number))) - self._cursor[1]
+
+    def append(self, sample):
+        """Queue one sample (dict) as a JSON line"""
+        line = json.dumps(sample, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._lock:
+            if self._file is None or self._file.tell() >= self.segment_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._file.flush()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        number = self._segments[-1] + 1 if self._segments else 1
+        self._segments.append(number)
+        if self._cursor == (0, 0):
+            self._cursor = (number, 0)
+        self._file = open(self._path(number), 'ab')
+        # Over the bound: give up the oldest whole segment rather than block sampling
+        while len(self._segments) > 1 and self._size() > self.max_bytes:
+            oldest = self._segments.pop(0)
+            with open(self._path(oldest), 'rb') as f:
+                if oldest == self._cursor[0]:
+                    f.seek(self._cursor[1])
+                self.dropped += f.read().count(b'\n')
+            os.remove(self._path(oldest))
+            self._cursor = (self._segments[0], 0)
+            self._write_cursor()
+
+    def read_batch(self, max_samples=BATCH_SAMPLES, max_bytes=BATCH_BYTES):
+        """(lines, position after them) from the cursor on; nothing is consumed until ack()"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            lines, size = [], 0
+            segment, offset = self._cursor
+            for number in [n for n in self._segments if n >= segment]:
+                start = offset if number == segment else 0
+                with open(self._path(number), 'rb') as f:
+                    f.seek(start)
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        if lines and (len(lines) >= max_samples or size + len(line) > max_bytes):
+                            return lines, (number, start)
+                        lines.append(line[:-1])
+                        size += len(line)
+                        start += len(line)
+                segment, offset = number, start
+            return lines, (segment, offset)
+
+    def ack(self, position):
+        """Mark everything before `position` as delivered and delete finished segments"""
+        with self._lock:
+            if position <= self._cursor:
+                return
+            self._cursor = position
+            while len(self._segments) > 1 and self._segments[0] < position[0]:
+                os.remove(self._path(self._segments.pop(0)))
+            self._write_cursor()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Uploader:
+    """Background thread draining a spool into the reporter's /api/ingest"""
+
+    def __init__(self, spool, url, source, token=None, batch_samples=BATCH_SAMPLES,
+                 batch_bytes=BATCH_BYTES, max_delay=MAX_DELAY, timeout=REQUEST_TIMEOUT):
+        self.spool = spool
+        self.url = url
+        self.source = source
+        self.token = token
+        self.batch_samples = batch_samples
+        self.batch_bytes = batch_bytes
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.sent = 0
+        self.skipped = 0
+        self.last_error = None
+        # Lowered when the reporter answers 413
+        self._batch_limit = batch_samples
+        self._backoff = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='spool-uploader', daemon=True)
+            self._thread.start()
+        return self
+
+    def notify(self):
+        """A sample was queued; wake the thread early when a full batch may be waiting"""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def read_batch(self):
+        """Next batch from the spool within the current size limits"""
+        return self.spool.read_batch(self._batch_limit, self.batch_bytes)
+
+    def _run(self):
+        waited_since = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.wait(self.max_delay)
+            self._wake.clear()
+            # Send full batches at once, partial ones once MAX_DELAY has passed
+            lines, position = self.read_batch()
+            if not lines:
+                waited_since = time.monotonic()
+                continue
+            if len(lines) < self._batch_limit and time.monotonic() - waited_since < self.max_delay:
+                continue
+            delay = self.send(lines, position)
+            waited_since = time.monotonic()
+            if delay:
+                self._stop.wait(delay)
+            else:
+                # More may be queued behind this batch
+                self._wake.set()
+
+    def send(self, lines, position):
+        """POST one batch; acknowledge it on success. Returns seconds to wait before the next try."""
+        body = gzip.compress(json.dumps({'source': self.source}).encode('utf-8') + b'\n'
+                             + b'\n'.join(lines), compresslevel=6)
+        request = urllib.request.Request(self.url, data=body, method='POST', headers={
+            'Content-Type': 'application/x-ndjson',
+            'Content-Encoding': 'gzip',
+        })
+        if self.token:
+            request.add_header('Authorization', f'Bearer {self.token}')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            self.last_error = f'HTTP {e.code}'
+            if e.code == 429:
+                return _retry_after(e.headers.get('Retry-After'), self._next_backoff())
+            if e.code == TOO_LARGE and len(lines) > 1:
+                # Send the same samples again in smaller batches
+                self._batch_limit = max(1, len(lines) // 2)
+                return 0
+            if e.code in REJECTED or e.code == TOO_LARGE:
+                # The reporter will never take this batch: skip it
+                self.spool.ack(position)
+                self.skipped += len(lines)
+                return 0
+            # Anything else (404 from a wrong URL or a proxy, 5xx ...) may pass later
+            return self._next_backoff()
+        except (urllib.error.URLError, OSError) as e:
+            self.last_error = str(e)
+            return self._next_backoff()
+        self.spool.ack(position)
+        self.sent += len(lines)
+        self.last_error = None
+        self._backoff = 0
+        # Grow back after a 413: one oversized batch must not shrink every later one
+        self._batch_limit = min(self.batch_samples, self._batch_limit * 2)
+        return 0
+
+    def _next_backoff(self):
+        """Exponential backoff with jitter, capped at MAX_BACKOFF"""
+        self._backoff = min(MAX_BACKOFF, max(MIN_BACKOFF, self._backoff * 2))
+        return self._backoff * random.uniform(0.5, 1.0)
+
+
+def _retry_after(header, default):
+    try:
+        return max(0, float(header))
+    except (TypeError, ValueError):
+        return default
+
+
+def default_source():
+    """Source name under which this host's samples are stored by the reporter"""
+    name = os.getenv('MONITOR_SOURCE') or socket.gethostname() or 'agent'
+    return re.sub(r'[^a-z0-9_-]+', '-', name.lower()).strip('-')[:64] or 'agent'
+
+
+# One spool and uploader per process, started on the first push()
+_default = None
+_default_lock = threading.Lock()
+
+
+def push(metrics):
+    """Queue a sample for the reporter; a no-op unless MONITOR_PUSH_URL is set"""
+    global _default
+    if not PUSH_URL:
+        return
+    with _default_lock:
+        if _default is None:
+            source = default_source()
+            _default = Uploader(Spool(os.path.join(SPOOL_DIR, source)), PUSH_URL, source,
+                                PUSH_TOKEN).start()
+    _default.spool.append(metrics)
+    _default.notify()
+
+
+def flush(timeout=REQUEST_TIMEOUT):
+    """Try to send what is spooled before a short-lived process exits (the rest waits on disk)"""
+    if _default is None:
+        return
+    deadline = time.monotonic() + timeout
+    _default.stop(timeout)
+    while time.monotonic() < deadline:
+        lines, position = _default.read_batch()
+        if not lines or _default.send(lines, position):
+            return
@@ -0,0 +1,153 @@
+"""
+Live Sample Stream
+One publisher per process fanning new samples out to server-sent-event clients
+
+The publisher thread stats the latest_<source>.json files of the metrics
+directory once per POLL_SECONDS, whatever the number of open dashboards.
+When a file changes it is read and converted once, passed to the `encode`
+callback (which reduces it to the compact update the dashboard needs) and
+formatted as one SSE message. The same bytes are then put on the queue of
+every subscriber of that source. A subscriber that falls QUEUE_SIZE
+messages behind loses its oldest ones rather than holding memory; idle
+connections get a comment line every KEEPALIVE_SECONDS so proxies keep
+them open and a closed browser tab is noticed.
+"""
+
+import os
+import json
+import glob
+import time
+import queue
+import threading
+
+POLL_SECONDS = 1
+KEEPALIVE_SECONDS = 15
+QUEUE_SIZE = 32
+
+# Browsers reconnect this long after a dropped stream (milliseconds)
+RETRY_MS = 5000
+
+
+def format_event(data, event='sample', event_id=None):
+    """One SSE message (bytes); `data` is encoded as single-line JSON"""
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return (f'{head}event: {event}\ndata: '
+            + json.dumps(data, separators=(',', ':'), allow_nan=False) + '\n\n').encode('utf-8')
+
+
+class Subscription:
+    """Queue of encoded messages for one client, limited to some sources"""
+
+    def __init__(self, sources=None, size=QUEUE_SIZE):
+        self.sources = set(sources) if sources else None
+        self.dropped = 0
+        self._queue = queue.Queue(size)
+
+    def deliver(self, source, message):
+        if self.sources is not None and source not in self.sources:
+            return
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                # Slow client: the oldest update is the least useful one
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        return self._queue.get(timeout=timeout)
+
+
+class Publisher:
+    """Watches latest_<source>.json and publishes each new sample once to all subscribers"""
+
+    def __init__(self, directory, load, encode, poll_seconds=POLL_SECONDS, pattern=None):
+        self.directory = directory
+        self.load = load
+        self.encode = encode
+        self.poll_seconds = poll_seconds
+        self.pattern = pattern
+        self.published = 0
+        self._versions = None   # path -> mtime_ns
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, sources=None):
+        subscription = Subscription(sources)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stream-publisher', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            if self.subscriber_count():
+                try:
+                    self.poll()
+                except Exception as e:
+                    print(f"Stream publisher error: {e}")
+            else:
+                # Nobody listening: forget what was seen, so nothing stale is sent on return
+                self._versions = None
+
+    def poll(self):
+        """Publish the sources whose latest file changed since the previous poll"""
+        versions = {}
+        for path in glob.glob(os.path.join(self.directory, 'latest_*.json')):
+            try:
+                versions[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+        previous, self._versions = self._versions, versions
+        if previous is None:
+            # First poll: clients loaded the charts already; only later samples are news
+            return
+        for path, version in sorted(versions.items()):
+            if previous.get(path) == version:
+                continue
+            source = os.path.basename(path)[len('latest_'):-len('.json')]
+            if self.pattern is not None and not self.pattern.match(source):
+                continue
+            sample = self.load(path)
+            try:
+                update = self.encode(source, sample) if sample else None
+                if update is None:
+                    continue
+                message = format_event(update, event_id=f'{source}:{version}')
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Stream: skipped a sample of {source}: {e}")
+                continue
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for subscription in subscribers:
+                subscription.deliver(source, message)
+            self.published += 1
+
+    def events(self, sources=None, keepalive=KEEPALIVE_SECONDS):
+        """SSE byte stream for one client; unsubscribes when the client goes away"""
+        subscription = self.subscribe(sources)
+        try:
+            yield f'retry: {RETRY_MS}\n\n'.encode('utf-8')
+            while True:
+                try:
+                    yield subscription.get(keepalive)
+                except queue.Empty:
+                    yield b': keepalive\n\n'
+        finally:
+            self.unsubscribe(subscription)
@@ -40,7 +40,7 @@ echo 1. View CLI: python monitor_windows.py
 echo 2. Install Flask for web dashboard:
 echo    pip install flask plotly
 echo 3. Run web dashboard:
-echo    python reporting/reporter.py
+echo    python -m reporting.reporter
 echo    Then open: http://localhost:8080
 echo ========================================
 echo.
@@ -70,7 +70,12 @@ echo "Running in background..."
 echo ""
 
 # Start metrics collection in background
-nohup bash -c "while true; do python3 $MONITOR_SCRIPT >/dev/null 2>&1; sleep 5; done" >/dev/null 2>&1 &
+if [ "$PLATFORM" == "Linux" ]; then
+    # Long-running collector: one process, aligned 5s samples
+    nohup python3 $MONITOR_SCRIPT --daemon --interval 5 >/dev/null 2>&1 &
+else
+    nohup bash -c "while true; do python3 $MONITOR_SCRIPT >/dev/null 2>&1; sleep 5; done" >/dev/null 2>&1 &
+fi
 MONITOR_PID=$!
 
 # Save PID for later stopping
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+System Monitor Engine
+One-process replacement for the collector fan-out of scripts/monitor.sh
+
+Produces the same system_info / cpu / memory / disk / network / gpu /
+system_load document as the bash collectors, validates it and evaluates
+alert thresholds in memory, and writes metrics_<timestamp>.json and
+latest.json exactly where monitor.sh did. On Linux everything is read from
+/proc and /sys (HOST_PROC / HOST_SYS aware); on other platforms each family
+falls back to its scripts/collectors/*.sh script.
+
+Usage: monitor_engine.py [--test] [--interval SECONDS]
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import socket
+import shutil
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.environ.get('PROJECT_ROOT') or os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+
+from reporting import procfs, gpu_sampler, sensors
+from reporting.cgroups import CgroupSampler
+from reporting.connections import ConnectionSampler
+from reporting.pressure import PressureSampler
+from reporting.disk_io import DiskIoSampler
+from reporting.net_io import NetIoSampler
+from reporting.mounts import FilesystemSampler, MountTable
+from reporting.cpu_sampler import CpuSampler
+from reporting.alerts import AlertEvaluator, read_shell_config
+from reporting.scheduler import Scheduler
+
+CONFIG_FILE = os.path.join(PROJECT_ROOT, 'config', 'monitor.conf')
+THRESHOLD_CONFIG = os.path.join(PROJECT_ROOT, 'config', 'alert_thresholds.conf')
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data', 'metrics')
+ALERT_LOG = os.path.join(PROJECT_ROOT, 'data', 'alerts', 'alerts.log')
+LOG_DIR = os.path.join(PROJECT_ROOT, 'data', 'logs')
+
+DEFAULT_INTERVAL = 60
+TOP_PROCESSES = 5
+
+# smartctl is slow and needs root; its answer rarely changes
+SMART_CACHE_SECONDS = 3600
+
+# Collector script per family, used where the native reader does not apply
+LEGACY_COLLECTORS = {
+    'cpu': 'cpu_monitor.sh',
+    'memory': 'memory_monitor.sh',
+    'disk': 'disk_monitor.sh',
+    'network': 'network_monitor.sh',
+    'gpu': 'gpu_monitor.sh',
+    'system_load': 'system_load.sh',
+}
+
+NO_GPU = {
+    'vendor': 'None',
+    'name': 'No GPU detected or monitoring tools not available',
+    'count': 0,
+    'utilization_percent': 0,
+    'memory_used_bytes': 0,
+    'memory_total_bytes': 0,
+    'memory_percent': 0.00,
+    'temperature_celsius': 0,
+    'power_watts': 0
+}
+
+# Device names excluded from the filesystem list (same filter as disk_monitor.sh)
+_EXCLUDED_FILESYSTEMS = re.compile(r'tmpfs|cdrom|loop')
+
+
+def _df_include(partition):
+    return not (_EXCLUDED_FILESYSTEMS.search(partition.device)
+                or _EXCLUDED_FILESYSTEMS.search(partition.mountpoint))
+
+
+# =================================================================
+# Logging (same format as scripts/utils.sh)
+# =================================================================
+
+def log(level, message):
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if level == 'DEBUG' and os.environ.get('DEBUG', '0') != '1':
+        return
+    line = f'[{level}] {timestamp} - {message}'
+    print(line, file=sys.stderr if level == 'ERROR' else sys.stdout, flush=True)
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        with open(os.path.join(LOG_DIR, 'monitor.log'), 'a') as f:
+            f.write(line + '\n')
+        if level == 'ERROR':
+            with open(os.path.join(LOG_DIR, 'error.log'), 'a') as f:
+                f.write(line + '\n')
+    except OSError:
+        pass
+
+
+def iso_timestamp():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def detect_platform():
+    system = platform.system()
+    if system == 'Linux':
+        return 'linux'
+    if system == 'Darwin':
+        return 'macos'
+    if system.startswith(('CYGWIN', 'MINGW', 'MSYS')) or system == 'Windows':
+        return 'windows'
+    return 'unknown'
+
+
+def _read_text(path, default=None):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+# =================================================================
+# Linux Collectors
+# =================================================================
+
+class LinuxCollectors:
+    """Native /proc and /sys readers; state (CPU, processes) lives in memory"""
+
+    def __init__(self):
+        self.proc = procfs.reader()
+        self.cpu_sampler = CpuSampler(cpu_times=self.proc.cpu_times)
+        self.disk_io = DiskIoSampler(counters=self.proc.disk_io_counters)
+        self.net_io = NetIoSampler(counters=self.proc.net_io_counters, if_stats=procfs.net_if_stats)
+        # Like df: every mounted filesystem, pseudo ones dropped by size below
+        self.filesystems = FilesystemSampler(MountTable(physical_only=False), include=_df_include)
+        self.sensors = sensors.SensorRegistry()
+        self.cgroups = CgroupSampler()
+        self.pressure = PressureSampler(self.proc)
+        self.connections = ConnectionSampler()
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self._process_ticks = {}
+        self._process_time = None
+        self._smart = None
+        self._smart_time = 0
+
+    def uptime_seconds(self):
+        uptime = _read_text(procfs.proc_path('uptime'), '0')
+        return float(uptime.split()[0])
+
+    def cpu(self):
+        temperatures = self.sensors.temperatures()
+        temperature = sensors.cpu_temperature(temperatures)
+        temperature = f'{temperature:.1f}' if temperature is not None else 'N/A'
+
+        model = 'Unknown'
+        for line in (_read_text(procfs.proc_path('cpuinfo'), '') or '').splitlines():
+            if line.startswith('model name'):
+                model = line.split(':', 1)[1].strip()
+                break
+
+        frequency = 0.0
+        khz = _read_text(procfs.sys_path('devices', 'system', 'cpu', 'cpu0', 'cpufreq', 'scaling_cur_freq'))
+        if khz and khz.isdigit():
+            frequency = round(int(khz) / 1000000, 2)
+
+        usage = self.cpu_sampler.sample()
+        return {
+            'usage_percent': usage['usage_percent'],
+            'per_core': usage['per_core'],
+            'temperature_celsius': temperature,
+            'temperatures': temperatures,
+            'core_count': os.cpu_count() or 1,
+            'model': model,
+            'frequency_ghz': frequency,
+            'timestamp': iso_timestamp()
+        }
+
+    def memory(self):
+        info = self.proc.meminfo()
+        total = info.get('MemTotal', 0)
+        available = info.get('MemAvailable', info.get('MemFree', 0))
+        used = total - available
+        swap_total = info.get('SwapTotal', 0)
+        swap_used = swap_total - info.get('SwapFree', 0)
+        return {
+            'total_bytes': total,
+            'used_bytes': used,
+            'available_bytes': available,
+            'usage_percent': round(used / total * 100, 2) if total else 0.0,
+            'swap_total_bytes': swap_total,
+            'swap_used_bytes': swap_used,
+            'swap_usage_percent': round(swap_used / swap_total * 100, 2) if swap_total else 0.0,
+            'timestamp': iso_timestamp()
+        }
+
+    def _smart_status(self):
+        if not shutil.which('smartctl'):
+            return 'Not Available (smartctl not installed)'
+        if self._smart is not None and time.time() - self._smart_time < SMART_CACHE_SECONDS:
+            return self._smart
+        status = 'N/A'
+        root_device = next((p.device for p in self.filesystems.table.partitions()
+                            if p.mountpoint == '/'), None)
+        if root_device:
+            try:
+                result = subprocess.run(['smartctl', '-H', root_device],
+                                        capture_output=True, text=True, timeout=10)
+                for line in result.stdout.splitlines():
+                    if 'SMART overall-health' in line:
+                        status = line.split()[-1]
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self._smart, self._smart_time = status, time.time()
+        return status
+
+    def disk(self):
+        # Zero-sized filesystems are pseudo ones, hidden by df as well
+        filesystems = [fs for fs in self.filesystems.sample() if fs['total'] or not fs['reachable']]
+        return {
+            'filesystems': filesystems,
+            **self.disk_io.sample(),
+            'smart_status': self._smart_status(),
+            'timestamp': iso_timestamp()
+        }
+
+    def network(self):
+        network = self.net_io.sample()
+        connections = self.connections.sample()
+        return {
+            'interfaces': network['interfaces'],
+            # What `ss -tun | grep -c ESTAB` counts
+            'active_connections': connections['established'],
+            'connections': connections,
+            'active_interface_names': network['active_interface_names'],
+            'rates': network['rates'],
+            'timestamp': iso_timestamp()
+        }
+
+    def gpu(self):
+        readings = gpu_sampler.latest()
+        gpu = gpu_sampler.to_canonical(readings)
+        return {
+            'gpu': gpu if gpu is not None else dict(NO_GPU),
+            'devices': gpu_sampler.to_devices(readings),
+            'timestamp': iso_timestamp()
+        }
+
+    def _processes(self):
+        """Yield (pid, state, cpu ticks, start ticks, rss pages, uid, comm) per process"""
+        for entry in os.scandir(procfs.PROC_ROOT):
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(os.path.join(entry.path, 'stat'), 'rb') as f:
+                    data = f.read()
+                uid = entry.stat().st_uid
+            except OSError:
+                continue
+            # comm may contain spaces and parentheses: split at the last ')'
+            end = data.rfind(b')')
+            comm = data[data.find(b'(') + 1:end].decode(errors='replace')
+            fields = data[end + 2:].split()
+            yield (int(entry.name), fields[0].decode(), int(fields[11]) + int(fields[12]),
+                   int(fields[19]), int(fields[21]), uid, comm)
+
+    def _user(self, uid):
+        try:
+            import pwd
+            return pwd.getpwuid(uid).pw_name
+        except (ImportError, KeyError):
+            return str(uid)
+
+    def system_load(self):
+        load1, load5, load15 = self.proc.loadavg()
+        now = time.monotonic()
+        uptime = self.uptime_seconds()
+        memory_total = self.proc.meminfo().get('MemTotal', 0)
+        elapsed = now - self._process_time if self._process_time else None
+
+        states = {'R': 0, 'S': 0, 'Z': 0}
+        ticks = {}
+        rows = []
+        for pid, state, cpu_ticks, start_ticks, rss_pages, uid, comm in self._processes():
+            states[state] = states.get(state, 0) + 1
+            ticks[pid] = (start_ticks, cpu_ticks)
+            previous = self._process_ticks.get(pid)
+            if elapsed and previous and previous[0] == start_ticks:
+                cpu = (cpu_ticks - previous[1]) / procfs.CLOCK_TICKS / elapsed * 100
+            else:
+                # New process: lifetime average, like ps
+                lifetime = uptime - start_ticks / procfs.CLOCK_TICKS
+                cpu = cpu_ticks / procfs.CLOCK_TICKS / lifetime * 100 if lifetime > 0 else 0.0
+            rows.append((cpu, pid, uid, rss_pages, comm))
+        self._process_ticks = ticks
+        self._process_time = now
+
+        top = []
+        for cpu, pid, uid, rss_pages, comm in sorted(rows, reverse=True)[:TOP_PROCESSES]:
+            cmdline = _read_text(procfs.proc_path(str(pid), 'cmdline'), '') or ''
+            command = cmdline.split('\0', 1)[0] or f'[{comm}]'
+            top.append({
+                'pid': pid,
+                'user': self._user(uid),
+                'cpu': round(cpu, 2),
+                'mem': round(rss_pages * self.page_size / memory_total * 100, 2) if memory_total else 0.0,
+                'command': command
+            })
+
+        return {
+            'load_average': {'1min': load1, '5min': load5, '15min': load15},
+            'total_processes': len(rows),
+            'running_processes': states['R'],
+            'sleeping_processes': states['S'],
+            'zombie_processes': states['Z'],
+            'top_cpu_processes': top,
+            **self.pressure.sample(),
+            'timestamp': iso_timestamp()
+        }
+
+    def containers(self):
+        """Per-container cgroup v2 figures, or None on cgroup v1 hosts"""
+        if not self.cgroups.available():
+            return None
+        return dict(self.cgroups.sample(), timestamp=iso_timestamp())
+
+
+class LegacyCollectors:
+    """Runs the bash collector of each family (platforms without /proc)"""
+
+    def __init__(self):
+        self.directory = os.path.join(SCRIPT_DIR, 'collectors')
+
+    def uptime_seconds(self):
+        return time.time() - _boot_time() if _boot_time() else 0
+
+    def _run(self, family):
+        result = subprocess.run(['bash', os.path.join(self.directory, LEGACY_COLLECTORS[family])],
+                                capture_output=True, text=True, timeout=60)
+        return json.loads(result.stdout)
+
+    def __getattr__(self, family):
+        if family in LEGACY_COLLECTORS:
+            return lambda: self._run(family)
+        raise AttributeError(family)
+
+
+def _boot_time():
+    try:
+        output = subprocess.run(['sysctl', '-n', 'kern.boottime'],
+                                capture_output=True, text=True, timeout=5).stdout
+        return int(re.search(r'sec = (\d+)', output).group(1))
+    except (OSError, AttributeError, subprocess.TimeoutExpired):
+        return None
+
+
+# =================================================================
+# Collection, Validation, Storage
+# =================================================================
+
+FAMILIES = ('cpu', 'memory', 'disk', 'network', 'gpu', 'system_load')
+
+# Sections present only where the platform provides them
+OPTIONAL_FAMILIES = ('containers',)
+
+# Section -> fields that must be numeric for the document to be accepted
+REQUIRED_NUMBERS = {
+    'system_info': ('uptime_seconds',),
+    'cpu': ('usage_percent', 'core_count'),
+    'memory': ('total_bytes', 'used_bytes', 'usage_percent'),
+    'network': ('active_connections',),
+    'system_load': ('total_processes',),
+}
+
+
+def collect_all_metrics(collectors):
+    """Build one sample; a failing family is logged and left empty"""
+    platform_name = detect_platform()
+    metrics = {
+        'system_info': {
+            'hostname': socket.gethostname() or 'unknown',
+            'platform': platform_name,
+            'uptime_seconds': collectors.uptime_seconds(),
+            'collection_time': iso_timestamp()
+        }
+    }
+    for family in FAMILIES:
+        try:
+            metrics[family] = getattr(collectors, family)()
+        except Exception as e:
+            log('ERROR', f'{family} collector failed: {e}')
+            metrics[family] = {}
+    for family in OPTIONAL_FAMILIES:
+        collector = getattr(collectors, family, None)
+        try:
+            value = collector() if collector is not None else None
+        except Exception as e:
+            log('ERROR', f'{family} collector failed: {e}')
+            continue
+        if value:
+            metrics[family] = value
+    return metrics
+
+
+def validate(metrics):
+    """Return a list of problems (empty when the document is valid)"""
+    problems = []
+    for section in ('system_info',) + FAMILIES:
+        if not isinstance(metrics.get(section), dict) or not metrics[section]:
+            problems.append(f'missing section: {section}')
+    for section, fields in REQUIRED_NUMBERS.items():
+        values = metrics.get(section) or {}
+        for field in fields:
+            value = values.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                problems.append(f'{section}.{field} is not a number')
+    if not isinstance((metrics.get('gpu') or {}).get('gpu'), dict):
+        problems.append('gpu.gpu is not an object')
+    try:
+        json.dumps(metrics, allow_nan=False)
+    except ValueError as e:
+        problems.append(str(e))
+    return problems
+
+
+def _write_json(path, metrics):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(metrics, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def save_metrics(metrics):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    filepath = os.path.join(DATA_DIR, f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    try:
+        _write_json(filepath, metrics)
+        _write_json(os.path.join(DATA_DIR, 'latest.json'), metrics)
+    except OSError as e:
+        log('ERROR', f'Failed to save metrics to {filepath}: {e}')
+        return False
+    log('INFO', f'Metrics saved to {filepath}')
+    return True
+
+
+def cleanup_old_metrics(retention_days):
+    """Delete metrics_*.json samples older than the retention period"""
+    cutoff = time.time() - retention_days * 86400
+    for path in glob.glob(os.path.join(DATA_DIR, 'metrics_*.json')):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            continue
+
+
+class MonitorEngine:
+    """Collect -> validate -> save -> alert, all in one process"""
+
+    def __init__(self, config):
+        self.config = config
+        self.collectors = LinuxCollectors() if detect_platform() == 'linux' else LegacyCollectors()
+        self.alerts = None
+        if config.get('ENABLE_ALERTS', 'true') != 'false':
+            self.alerts = AlertEvaluator(THRESHOLD_CONFIG, ALERT_LOG, log=self._log_alert)
+        self.retention_days = float(config.get('RETENTION_DAYS', 7))
+        self._last_cleanup = 0
+
+    @staticmethod
+    def _log_alert(severity, message):
+        log({'CRITICAL': 'ERROR', 'WARNING': 'WARN'}.get(severity, 'INFO'), message)
+
+    def run_once(self):
+        """Collect and validate one sample; returns (metrics, problems)"""
+        log('DEBUG', 'Starting metrics collection...')
+        metrics = collect_all_metrics(self.collectors)
+        return metrics, validate(metrics)
+
+    def tick(self, scheduled=None):
+        metrics, problems = self.run_once()
+        if problems:
+            log('ERROR', 'Invalid metrics document: ' + '; '.join(problems))
+            return
+        save_metrics(metrics)
+        if self.alerts is not None:
+            log('DEBUG', 'Checking alert thresholds...')
+            self.alerts.process(metrics)
+        if time.time() - self._last_cleanup >= 3600:
+            cleanup_old_metrics(self.retention_days)
+            self._last_cleanup = time.time()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='System Monitor - Comprehensive Hardware and Software Monitoring')
+    parser.add_argument('--test', action='store_true',
+                        help='run once in test mode and output to console')
+    parser.add_argument('--interval', type=float,
+                        help=f'monitoring interval in seconds (default: {DEFAULT_INTERVAL})')
+    args = parser.parse_args(argv)
+
+    config = read_shell_config(CONFIG_FILE, dict(os.environ, PROJECT_ROOT=PROJECT_ROOT))
+    interval = (args.interval or float(os.environ.get('MONITOR_INTERVAL') or 0)
+                or float(config.get('MONITOR_INTERVAL') or DEFAULT_INTERVAL))
+    os.makedirs(DATA_DIR, exist_ok=True)
+    engine = MonitorEngine(config)
+
+    if args.test:
+        log('INFO', 'Running in test mode...')
+        metrics, problems = engine.run_once()
+        print(json.dumps(metrics, indent=4))
+        if problems:
+            log('ERROR', 'Metrics collection failed or produced invalid JSON: ' + '; '.join(problems))
+            return 1
+        log('INFO', 'Test completed successfully')
+        return 0
+
+    log('INFO', 'System monitoring started')
+    log('INFO', f'Platform: {detect_platform()}')
+    log('INFO', f'Hostname: {socket.gethostname()}')
+    log('INFO', f'Monitoring interval: {interval:g}s')
+
+    scheduler = Scheduler(on_error=lambda job, e: log('ERROR', f'Monitoring cycle failed: {e}'))
+    scheduler.add('collect', interval, engine.tick)
+    engine.tick()
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
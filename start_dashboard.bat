@@ -13,4 +13,4 @@ echo.
 echo [2/2] Starting Dashboard Server...
 echo Dashboard will be available at: http://127.0.0.1:8080
 echo.
-python reporting/reporter.py
+python -m reporting.reporter
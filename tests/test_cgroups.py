@@ -0,0 +1,178 @@
+"""Container sampler against a synthetic cgroup v2 tree"""
+
+import os
+import shutil
+import types
+
+import pytest
+
+from reporting import cgroups
+
+WEB = 'a' * 64
+DB = 'b' * 64
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def cpu_stat(usage_usec, nr_periods=0, nr_throttled=0, throttled_usec=0):
+    return (f'usage_usec {usage_usec}\nuser_usec {usage_usec // 2}\nsystem_usec {usage_usec // 2}\n'
+            f'nr_periods {nr_periods}\nnr_throttled {nr_throttled}\nthrottled_usec {throttled_usec}\n')
+
+
+def pressure(some, full=None):
+    text = f'some avg10={some:.2f} avg60=0.50 avg300=0.10 total=123456\n'
+    if full is not None:
+        text += f'full avg10={full:.2f} avg60=0.00 avg300=0.00 total=4567\n'
+    return text
+
+
+def add_container(root, directory, usage_usec=0, rbytes=0, wbytes=0, peak=True, psi=True):
+    path = os.path.join(root, directory)
+    write(os.path.join(path, 'cpu.stat'), cpu_stat(usage_usec))
+    write(os.path.join(path, 'memory.current'), '104857600\n')
+    write(os.path.join(path, 'memory.max'), '536870912\n')
+    if peak:
+        write(os.path.join(path, 'memory.peak'), '209715200\n')
+    write(os.path.join(path, 'io.stat'),
+          f'8:0 rbytes={rbytes} wbytes={wbytes} rios=10 wios=5 dbytes=0 dios=0\n'
+          f'259:0 rbytes=1000 wbytes=0 rios=1 wios=0 dbytes=0 dios=0\n')
+    if psi:
+        write(os.path.join(path, 'cpu.pressure'), pressure(1.5))
+        write(os.path.join(path, 'memory.pressure'), pressure(0.25, 0.1))
+        write(os.path.join(path, 'io.pressure'), pressure(3.0, 2.0))
+    return path
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cgroups, 'time', types.SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = str(tmp_path / 'cgroup')
+    write(os.path.join(root, 'cgroup.controllers'), 'cpuset cpu io memory pids\n')
+    write(os.path.join(root, 'system.slice', 'cron.service', 'cpu.stat'), cpu_stat(5))
+    add_container(root, f'system.slice/docker-{WEB}.scope', usage_usec=1_000_000, rbytes=4096)
+    # Podman and nested (docker/<id>) layouts; a child cgroup of a container is not another one
+    add_container(root, f'machine.slice/libpod-{DB}.scope', usage_usec=0, peak=False, psi=False)
+    os.makedirs(os.path.join(root, f'machine.slice/libpod-{DB}.scope', 'init'))
+    return root
+
+
+def make_sampler(root, names=None, rescan_seconds=0):
+    calls = []
+
+    def resolve(container_id):
+        calls.append(container_id)
+        return (names or {}).get(container_id)
+    return cgroups.CgroupSampler(root, resolve, rescan_seconds), calls
+
+
+def by_id(result):
+    return {row['id']: row for row in result['containers']}
+
+
+def test_detects_cgroup_v2(root, tmp_path):
+    assert cgroups.CgroupSampler(root).available()
+    assert not cgroups.CgroupSampler(str(tmp_path)).available()
+
+
+def test_first_sample(root, clock):
+    sampler, _ = make_sampler(root, {WEB: 'web'})
+    result = sampler.sample()
+    assert result['count'] == 2
+    web, db = by_id(result)[WEB[:12]], by_id(result)[DB[:12]]
+    assert web['name'] == 'web'
+    assert db['name'] == DB[:12]
+    assert web['cpu_usage_seconds'] == 1.0
+    assert web['memory_current_bytes'] == 100 << 20
+    assert web['memory_peak_bytes'] == 200 << 20
+    assert web['memory_limit_bytes'] == 512 << 20
+    assert db['memory_peak_bytes'] is None
+    assert web['io_read_bytes'] == 4096 + 1000
+    # No baseline yet
+    assert web['cpu_percent'] == 0.0 and web['io_read_bytes_per_sec'] == 0.0
+    assert result['interval'] == 0
+
+
+def test_pressure(root, clock):
+    sampler, _ = make_sampler(root)
+    rows = by_id(sampler.sample())
+    assert rows[WEB[:12]]['pressure'] == {
+        'cpu': {'some': 1.5},
+        'memory': {'some': 0.25, 'full': 0.1},
+        'io': {'some': 3.0, 'full': 2.0},
+    }
+    # No *.pressure files (PSI disabled)
+    assert rows[DB[:12]]['pressure'] == {'cpu': {}, 'memory': {}, 'io': {}}
+
+
+def test_cpu_throttling_and_io_rates(root, clock):
+    sampler, _ = make_sampler(root)
+    sampler.sample()
+    web = os.path.join(root, f'system.slice/docker-{WEB}.scope')
+    # 2 s later: 1.5 CPU-seconds used, 50 of 200 CFS periods throttled
+    write(os.path.join(web, 'cpu.stat'), cpu_stat(2_500_000, nr_periods=200, nr_throttled=50,
+                                                  throttled_usec=300_000))
+    write(os.path.join(web, 'io.stat'), '8:0 rbytes=8192 wbytes=20000 rios=12 wios=9\n'
+                                        '259:0 rbytes=1000 wbytes=0 rios=1 wios=0\n')
+    clock.now += 2
+    result = sampler.sample()
+    row = by_id(result)[WEB[:12]]
+    assert result['interval'] == 2
+    assert row['cpu_percent'] == 75.0
+    assert row['throttled_percent'] == 25.0
+    assert row['throttled_periods'] == 50
+    assert row['throttled_seconds'] == 0.3
+    assert row['io_read_bytes_per_sec'] == 2048.0
+    assert row['io_write_bytes_per_sec'] == 10000.0
+
+    # A device dropped from io.stat lowers the sums: rates never go negative
+    write(os.path.join(web, 'io.stat'), '8:0 rbytes=8192 wbytes=20000 rios=12 wios=9\n')
+    clock.now += 2
+    assert by_id(sampler.sample())[WEB[:12]]['io_read_bytes_per_sec'] == 0.0
+
+
+def test_names_are_resolved_once(root, clock):
+    sampler, calls = make_sampler(root, {WEB: 'web', DB: 'db'})
+    for _ in range(3):
+        clock.now += 1
+        sampler.sample()
+    assert sorted(calls) == [WEB, DB]
+    assert [row['name'] for row in sampler.sample()['containers']] == ['db', 'web']
+
+
+def test_container_disappears_between_rescans(root, clock):
+    sampler, _ = make_sampler(root, rescan_seconds=3600)
+    assert sampler.sample()['count'] == 2
+    shutil.rmtree(os.path.join(root, 'machine.slice'))
+    clock.now += 1
+    result = sampler.sample()
+    assert list(by_id(result)) == [WEB[:12]]
+    # New containers wait for the next walk
+    add_container(root, f'system.slice/docker-{DB}.scope')
+    clock.now += 1
+    assert sampler.sample()['count'] == 1
+    clock.now += 3600
+    assert sampler.sample()['count'] == 2
+
+
+def test_parsers():
+    assert cgroups.parse_flat_keyed('usage_usec 10\nbad line\nx -1\n') == {'usage_usec': 10}
+    assert cgroups.parse_io_stat(None) == (0, 0)
+    assert cgroups.parse_pressure('') == {}
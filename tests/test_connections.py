@@ -0,0 +1,205 @@
+"""Socket summary: sock_diag dumps from packed netlink buffers and /proc/net/tcp{,6} text"""
+
+import errno
+import socket
+import struct
+import ipaddress
+
+import pytest
+
+from reporting import connections
+
+NLM_F_MULTI = 0x2
+LISTEN, ESTABLISHED, TIME_WAIT, CLOSE = 10, 1, 6, 7
+
+
+def header(length, kind, sequence):
+    return connections.NLMSG_HEADER.pack(length, kind, NLM_F_MULTI, sequence, 0)
+
+
+def diag_msg(sequence, family, state, sport, dport=0, src='', dst='', attributes=b''):
+    """One SOCK_DIAG_BY_FAMILY message: nlmsghdr + inet_diag_msg (+ extension attributes)"""
+    def packed(address):
+        return ipaddress.ip_address(address).packed.ljust(16, b'\0') if address else bytes(16)
+    body = (struct.pack('=BBBB', family, state, 0, 0)
+            + struct.pack('>HH', sport, dport) + packed(src) + packed(dst)
+            + struct.pack('=IQ', 0, 0)                    # interface, cookie
+            + struct.pack('=IIIII', 0, 0, 0, 1000, 4242)  # expires, rqueue, wqueue, uid, inode
+            + attributes)
+    return header(connections.NLMSG_HEADER.size + len(body), connections.SOCK_DIAG_BY_FAMILY, sequence) + body
+
+
+def done(sequence):
+    return header(connections.NLMSG_HEADER.size + 4, connections.NLMSG_DONE, sequence) + struct.pack('=i', 0)
+
+
+def error(sequence, code):
+    request = header(connections.NLMSG_HEADER.size, connections.SOCK_DIAG_BY_FAMILY, sequence)
+    return (header(connections.NLMSG_HEADER.size * 2 + 4, connections.NLMSG_ERROR, sequence)
+            + struct.pack('=i', -code) + request)
+
+
+# A MEMINFO-sized extension attribute (nlattr header + payload), as the kernel may append
+ATTRIBUTE = struct.pack('=HH', 4 + 16, 1) + bytes(16)
+
+V4, V6 = socket.AF_INET, socket.AF_INET6
+TCP, UDP = socket.IPPROTO_TCP, socket.IPPROTO_UDP
+
+
+def host_dumps(sequence, family, protocol):
+    """Receive buffers of every dump the fake kernel answers"""
+    if (family, protocol) == (V4, TCP):
+        return [
+            diag_msg(sequence, V4, LISTEN, 22)
+            + diag_msg(sequence, V4, ESTABLISHED, 22, 51000, '10.0.0.1', '10.0.0.5')
+            + diag_msg(sequence, V4, ESTABLISHED, 22, 51002, '10.0.0.1', '10.0.0.5', ATTRIBUTE),
+            diag_msg(sequence, V4, TIME_WAIT, 40000, 443, '10.0.0.1', '198.51.100.9')
+            + done(sequence),
+        ]
+    if (family, protocol) == (V4, UDP):
+        return [diag_msg(sequence, V4, CLOSE, 53)
+                + diag_msg(sequence, V4, ESTABLISHED, 41000, 53, '10.0.0.1', '10.0.0.53')
+                + done(sequence)]
+    if (family, protocol) == (V6, TCP):
+        return [diag_msg(sequence, V6, LISTEN, 443)
+                + diag_msg(sequence, V6, ESTABLISHED, 443, 1234, '::ffff:10.0.0.1', '::ffff:192.0.2.7')
+                + diag_msg(sequence, V6, ESTABLISHED, 443, 1235, '2001:db8::2', '2001:db8::1', ATTRIBUTE)
+                + done(sequence)]
+    # udp_diag not loaded
+    return [error(sequence, errno.ENOENT)]
+
+
+class FakeNetlink:
+    """Answers one sock_diag request with the buffers of `dumps`"""
+
+    dumps = staticmethod(host_dumps)
+    requests = []
+
+    def __init__(self, family, kind, protocol):
+        assert (family, kind, protocol) == (socket.AF_NETLINK, socket.SOCK_RAW, connections.NETLINK_SOCK_DIAG)
+        self._buffers = []
+
+    def send(self, data):
+        _, kind, flags, sequence, _ = connections.NLMSG_HEADER.unpack_from(data)
+        family, protocol, _, _, states = connections.INET_DIAG_REQ.unpack_from(data, connections.NLMSG_HEADER.size)
+        assert kind == connections.SOCK_DIAG_BY_FAMILY
+        assert flags == connections.NLM_F_REQUEST | connections.NLM_F_DUMP
+        assert states == connections.ALL_STATES
+        FakeNetlink.requests.append((family, protocol))
+        self._buffers = list(self.dumps(sequence, family, protocol))
+        return len(data)
+
+    def recv_into(self, buffer):
+        if not self._buffers:
+            return 0
+        data = self._buffers.pop(0)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def netlink(monkeypatch):
+    FakeNetlink.requests = []
+    monkeypatch.setattr(FakeNetlink, 'dumps', staticmethod(host_dumps))
+    monkeypatch.setattr(connections.socket, 'socket', FakeNetlink)
+    return FakeNetlink
+
+
+def test_netlink_dump(netlink):
+    summary = connections.summarize(connections._netlink_tally())
+    assert netlink.requests == [(V4, TCP), (V4, UDP), (V6, TCP), (V6, UDP)]
+    assert summary['by_state'] == {'ESTABLISHED': 4, 'TIME_WAIT': 1, 'LISTEN': 2}
+    assert summary['total'] == 7
+    assert summary['listening_ports'] == [{'port': 22, 'connections': 2}, {'port': 443, 'connections': 2}]
+    assert summary['top_peers'] == [{'address': '10.0.0.5', 'connections': 2},
+                                    {'address': '192.0.2.7', 'connections': 1},
+                                    {'address': '2001:db8::1', 'connections': 1}]
+    assert summary['udp_sockets'] == 2
+    # Established TCP plus connected UDP
+    assert summary['established'] == 5
+
+
+def test_netlink_done_of_another_sequence_is_ignored(netlink):
+    # A DONE of a different sequence number must not end this dump
+    def dumps(sequence, family, protocol):
+        if (family, protocol) != (V4, TCP):
+            return [done(sequence)]
+        return [diag_msg(sequence, V4, LISTEN, 80) + done(sequence + 2),
+                diag_msg(sequence, V4, ESTABLISHED, 80, 5000, '10.0.0.1', '10.0.0.9') + done(sequence)]
+    netlink.dumps = staticmethod(dumps)
+    summary = connections.summarize(connections._netlink_tally())
+    assert summary['by_state'] == {'ESTABLISHED': 1, 'LISTEN': 1}
+
+
+def test_netlink_error_falls_back_to_procfs(netlink, tmp_path):
+    netlink.dumps = staticmethod(lambda sequence, family, protocol: [error(sequence, errno.EPERM)])
+    with pytest.raises(OSError) as e:
+        connections._netlink_tally()
+    assert e.value.errno == errno.EPERM
+
+    write_proc_net(tmp_path)
+    sampler = connections.ConnectionSampler(use_netlink=True, proc_net=str(tmp_path))
+    summary = sampler.sample()
+    assert summary['source'] == 'procfs'
+    assert not sampler.use_netlink
+    assert summary['total'] == 6
+
+
+PROC_HEADER = ('  sl  local_address                         remote_address                        '
+               'st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n')
+PROC_TAIL = ' 00000000:00000000 00:00000000 00000000  1000        0 4242 1 0000000000000000 20 4 30 10 -1\n'
+
+ANY6 = '0' * 32
+LOCAL6 = '0000000000000000FFFF00000100007F'        # ::ffff:127.0.0.1
+MAPPED_PEER = '0000000000000000FFFF0000070200C0'   # ::ffff:192.0.2.7
+PEER6 = 'B80D0120000000000000000001000000'         # 2001:db8::1
+
+
+def proc_line(number, local, remote, state):
+    return f'{number:4d}: {local} {remote} {state:02X}' + PROC_TAIL
+
+
+def write_proc_net(directory):
+    (directory / 'tcp').write_text(PROC_HEADER + ''.join([
+        proc_line(0, '00000000:0016', '00000000:0000', LISTEN),
+        proc_line(1, '0100000A:0016', '0500000A:C738', ESTABLISHED),
+        proc_line(2, '0100000A:9C40', '096433C6:01BB', TIME_WAIT),
+    ]))
+    (directory / 'tcp6').write_text(PROC_HEADER + ''.join([
+        proc_line(0, f'{ANY6}:01BB', f'{ANY6}:0000', LISTEN),
+        proc_line(1, f'{LOCAL6}:01BB', f'{MAPPED_PEER}:04D2', ESTABLISHED),
+        proc_line(2, f'{LOCAL6}:01BB', f'{PEER6}:04D3', ESTABLISHED),
+    ]))
+    (directory / 'udp').write_text(PROC_HEADER + proc_line(0, '00000000:0035', '00000000:0000', CLOSE))
+
+
+def test_proc_net(tmp_path):
+    write_proc_net(tmp_path)
+    summary = connections.summarize(connections._proc_net_tally(str(tmp_path)))
+    assert summary['by_state'] == {'ESTABLISHED': 3, 'TIME_WAIT': 1, 'LISTEN': 2}
+    assert summary['listening_ports'] == [{'port': 443, 'connections': 2}, {'port': 22, 'connections': 1}]
+    assert summary['top_peers'] == [{'address': '10.0.0.5', 'connections': 1},
+                                    {'address': '192.0.2.7', 'connections': 1},
+                                    {'address': '2001:db8::1', 'connections': 1}]
+    assert summary['udp_sockets'] == 1
+    assert summary['established'] == 3
+
+
+def test_peers_and_ports_are_capped(tmp_path):
+    lines = [proc_line(i, f'00000000:{port:04X}', '00000000:0000', LISTEN)
+             for i, port in enumerate((22, 80, 443, 8080))]
+    # 10.0.0.1 has 5 connections, 10.0.0.2 has 4 ... 10.0.0.5 has 1
+    for host in range(1, 6):
+        for n in range(6 - host):
+            lines.append(proc_line(len(lines), '0100000A:0050', f'{host:02X}00000A:{1000 + n:04X}', ESTABLISHED))
+    (tmp_path / 'tcp').write_text(PROC_HEADER + ''.join(lines))
+    summary = connections.summarize(connections._proc_net_tally(str(tmp_path)), top_n=2)
+    assert summary['top_peers'] == [{'address': '10.0.0.1', 'connections': 5},
+                                    {'address': '10.0.0.2', 'connections': 4}]
+    assert summary['other_peer_connections'] == 3 + 2 + 1
+    assert summary['distinct_peers'] == 5
+    assert summary['listening_ports'] == [{'port': 80, 'connections': 15}, {'port': 22, 'connections': 0}]
+    assert summary['other_listening_ports'] == 2
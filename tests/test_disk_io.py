@@ -0,0 +1,53 @@
+"""Disk I/O sampler: counter deltas and per-device rates from fake counters"""
+
+from collections import namedtuple
+
+from reporting import disk_io
+from reporting.disk_io import DiskIoSampler, counter_delta
+
+Counters = namedtuple('Counters', 'read_count write_count read_bytes write_bytes '
+                                  'read_time write_time busy_time')
+
+
+def test_increase():
+    assert counter_delta(100, 250) == 150
+
+
+def test_32bit_wrap():
+    assert counter_delta(2 ** 32 - 100, 50) == 150
+    assert counter_delta(2 ** 31 + 10, 5) == 2 ** 31 - 5
+
+
+def test_reset_with_small_previous_value():
+    # A re-created device restarting at zero is not a 4 GiB wrap
+    assert counter_delta(1000, 10) == 10
+    assert counter_delta(2 ** 31 - 1, 0) == 0
+
+
+def test_reset_of_64bit_counter():
+    assert counter_delta(2 ** 40, 4096) == 4096
+
+
+def test_reset_near_top_with_implausible_wrap():
+    # Wrapping would mean ~3 GiB in one interval; a reset is far more likely
+    assert counter_delta(2 ** 32 - 2 ** 30, 2 ** 30) == 2 ** 30
+
+
+def fake_counters(snapshots):
+    snapshots = iter(snapshots)
+    return lambda perdisk=True: next(snapshots)
+
+
+def test_recreated_device_has_no_rate_spike(monkeypatch):
+    monkeypatch.setattr(disk_io.procfs, 'is_whole_disk', lambda name: True)
+    clock = iter([100.0, 101.0])
+    monkeypatch.setattr(disk_io.time, 'monotonic', lambda: next(clock))
+    sampler = DiskIoSampler(fake_counters([
+        {'sdb': Counters(500, 500, 900000, 800000, 10, 10, 20)},
+        {'sdb': Counters(3, 1, 4096, 512, 0, 0, 1)},
+    ]))
+    sampler.sample()
+    row = sampler.sample()['devices'][0]
+    assert row['read_bytes_per_sec'] == 4096.0
+    assert row['write_bytes_per_sec'] == 512.0
+    assert row['read_iops'] == 3.0
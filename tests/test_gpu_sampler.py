@@ -0,0 +1,214 @@
+"""GPU sampler: nvidia-smi stream handling with a fake stream instead of a GPU"""
+
+import os
+import time
+import threading
+
+from reporting import gpu_sampler
+from reporting.gpu_sampler import GpuSampler, StreamBackend
+
+LINES = [
+    '0, GPU-aaaa, NVIDIA A100-SXM4-40GB, 41, 87, 30, 12000, 40960, 250.5, 400.00, 1410, 1215, [N/A]\n',
+    '1, GPU-bbbb, NVIDIA A100-SXM4-40GB, 39, 12, 2, 800, 40960, 61.2, 400.00, 210, 1215, [N/A]\n',
+]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_fake_stream_is_served_from_memory():
+    opened = []
+
+    def open_stream():
+        opened.append(1)
+        return iter(LINES)
+
+    sampler = GpuSampler(StreamBackend(open_stream, restart_delay=60))
+    try:
+        readings = sampler.latest()
+        assert [r['index'] for r in readings] == [0, 1]
+        assert readings[0]['utilization_percent'] == 87.0
+        assert readings[0]['memory_used_bytes'] == 12000 * 1024 ** 2
+        assert readings[0]['fan_percent'] is None
+        # Served from memory: the stream is opened once, not per call
+        sampler.latest()
+        assert len(opened) == 1
+    finally:
+        sampler.stop()
+
+
+def test_stream_that_ends_is_reopened():
+    opened = []
+
+    def open_stream():
+        opened.append(1)
+        return iter(LINES[:1])
+
+    sampler = GpuSampler(StreamBackend(open_stream, restart_delay=0.01))
+    try:
+        sampler.start()
+        assert wait_for(lambda: len(opened) >= 3)
+    finally:
+        sampler.stop()
+
+
+def test_stale_readings_are_dropped():
+    release = threading.Event()
+
+    def hung_stream():
+        yield LINES[0]
+        yield LINES[1]
+        release.wait(5)   # nvidia-smi stops printing
+
+    sampler = GpuSampler(StreamBackend(hung_stream, restart_delay=60), max_age=0.2)
+    try:
+        assert len(sampler.latest()) == 2
+        time.sleep(0.3)
+        assert sampler.latest() == []
+    finally:
+        release.set()
+        sampler.stop()
+
+
+class FailingBackend:
+    name = 'failing'
+
+    def __init__(self):
+        self.runs = 0
+        self.closed = 0
+
+    def run(self, publish, stop):
+        self.runs += 1
+        if self.runs == 1:
+            raise RuntimeError('driver went away')
+        publish(gpu_sampler.parse_line(LINES[0]))
+        stop.wait()
+
+    def close(self):
+        self.closed += 1
+
+
+def test_failing_backend_is_restarted():
+    backend = FailingBackend()
+    sampler = GpuSampler(backend, restart_delay=0.01)
+    try:
+        sampler.start()
+        assert wait_for(lambda: sampler.latest(timeout=0))
+        assert backend.runs == 2
+        assert backend.closed == 1
+    finally:
+        sampler.stop()
+
+
+# =================================================================
+# Parsing captured multi-GPU output
+# =================================================================
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def capture(name):
+    with open(os.path.join(FIXTURES, name), newline='') as f:
+        return f.readlines()
+
+
+def parse_capture(name):
+    return [gpu_sampler.parse_line(line) for line in capture(name)]
+
+
+def test_parse_four_gpus():
+    readings = parse_capture('nvidia_smi_4gpu.csv')
+    assert [r['index'] for r in readings] == [0, 1, 2, 3]
+    first = readings[0]
+    assert first['uuid'] == 'GPU-0d2e6a41-7c1b-4f7e-9a55-3f0c2b1d9e01'
+    assert first['name'] == 'NVIDIA GeForce RTX 4090'
+    assert first['temperature_celsius'] == 52.0
+    assert first['memory_total_bytes'] == 24564 * 1024 ** 2
+    assert first['power_watts'] == 412.37
+    # The line ends with \r\n (Windows capture); the last field still parses
+    assert first['fan_percent'] == 68.0
+
+
+def test_parse_name_containing_commas():
+    readings = parse_capture('nvidia_smi_4gpu.csv')
+    assert readings[2]['name'] == 'NVIDIA RTX A4000, Ampere'
+    assert readings[2]['temperature_celsius'] == 44.0
+    assert readings[2]['fan_percent'] == 41.0
+
+
+def test_parse_unavailable_fields():
+    t4 = parse_capture('nvidia_smi_4gpu.csv')[3]
+    assert t4['temperature_celsius'] is None
+    assert t4['memory_total_bytes'] is None
+    assert t4['clock_graphics_mhz'] is None
+    assert t4['power_limit_watts'] == 70.0
+
+
+def test_parse_eight_gpus():
+    readings = parse_capture('nvidia_smi_8gpu.csv')
+    assert [r['index'] for r in readings] == list(range(8))
+    assert len({r['uuid'] for r in readings}) == 8
+    assert all(r['fan_percent'] is None for r in readings)   # [Not Supported]
+    assert readings[5]['utilization_percent'] is None
+    assert readings[5]['memory_total_bytes'] == 81920 * 1024 ** 2
+    assert readings[7]['name'] == 'NVIDIA H100, 80GB HBM3'
+    assert readings[7]['utilization_percent'] == 75.0
+
+
+def test_parse_rejects_short_or_garbled_lines():
+    assert gpu_sampler.parse_line('') is None
+    assert gpu_sampler.parse_line('0, GPU-x, Tesla, 40\n') is None
+    assert gpu_sampler.parse_line('Unable to determine the device handle for GPU 0000:3B:00.0: GPU is lost.'
+                                  ' Reboot the system to recover this GPU') is None
+
+
+def test_to_devices_eight_gpus():
+    devices = gpu_sampler.to_devices(parse_capture('nvidia_smi_8gpu.csv'))
+    assert [d['index'] for d in devices] == list(range(8))
+    assert devices[0]['memory_used_bytes'] == 4096 * 1024 ** 2
+    assert devices[0]['memory_percent'] == 5.0
+    assert isinstance(devices[0]['memory_total_bytes'], int)
+    # Unsupported values stay None instead of becoming 0
+    assert devices[5]['memory_used_bytes'] is None
+    assert devices[5]['memory_percent'] is None
+    assert devices[5]['temperature_celsius'] is None
+    assert set(gpu_sampler.DEVICE_FIELDS) <= set(devices[0])
+
+
+def test_to_devices_without_memory_total():
+    t4 = gpu_sampler.to_devices(parse_capture('nvidia_smi_4gpu.csv'))[3]
+    assert t4['memory_used_bytes'] == 15360 * 1024 ** 2
+    assert t4['memory_total_bytes'] is None
+    assert t4['memory_percent'] is None
+
+
+def test_to_canonical_four_gpus():
+    gpu = gpu_sampler.to_canonical(parse_capture('nvidia_smi_4gpu.csv'))
+    assert gpu['count'] == 4
+    assert gpu['name'] == 'NVIDIA GeForce RTX 4090 / NVIDIA RTX A4000, Ampere / NVIDIA T4'
+    # Mean of the GPUs that report utilization, hottest temperature, summed power
+    assert gpu['utilization_percent'] == (97 + 0 + 12 + 0) / 4
+    assert gpu['temperature_celsius'] == 52.0
+    assert abs(gpu['power_watts'] - (412.37 + 21.08 + 38.91)) < 1e-9
+    assert gpu['memory_used_bytes'] == (18432 + 3 + 1120 + 15360) * 1024 ** 2
+    assert gpu['memory_total_bytes'] == (24564 + 24564 + 16376) * 1024 ** 2
+
+
+def test_to_canonical_eight_gpus():
+    gpu = gpu_sampler.to_canonical(parse_capture('nvidia_smi_8gpu.csv'))
+    assert gpu['count'] == 8
+    assert gpu['name'] == 'NVIDIA A100-SXM4-80GB / NVIDIA H100, 80GB HBM3'
+    assert gpu['utilization_percent'] == (5 + 15 + 25 + 35 + 45 + 0 + 75) / 7
+    assert gpu['temperature_celsius'] == 47.0
+    assert gpu['memory_total_bytes'] == 8 * 81920 * 1024 ** 2
+    assert 0 < gpu['memory_percent'] < 100
+
+
+def test_to_canonical_without_gpus():
+    assert gpu_sampler.to_canonical([]) is None
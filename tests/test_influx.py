@@ -0,0 +1,183 @@
+"""InfluxDB writer against a fake /api/v2/write: batches, keep-alive, gaps and replay"""
+
+import os
+import re
+import gzip
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from reporting import influx
+from reporting.history_store import HistoryStore
+
+# measurement[,tag=value...] field=value[,field=value...] timestamp (escaped ',', '=', ' ')
+_NAME = r'(?:[^,= \\]|\\[,= ])+'
+_FIELD = r'[a-z_0-9]+=(?:-?[0-9.e+-]+|true|false)'
+LINE = re.compile(rf'^{_NAME}(?:,{_NAME}={_NAME})* {_FIELD}(?:,{_FIELD})* (\d{{19}})$')
+
+START = 1_790_000_000.0
+
+
+class FakeInflux(ThreadingHTTPServer):
+    """Records the points of every accepted write; answers with `status` (204 by default)"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.status = 204
+        self.requests = []   # (path, query, headers)
+        self.lines = []
+        self.clients = set()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        self.server.requests.append((url.path, parse_qs(url.query), dict(self.headers)))
+        self.server.clients.add(self.client_address)
+        body = gzip.decompress(self.rfile.read(int(self.headers['Content-Length'])))
+        status = self.server.status
+        if 200 <= status < 300:
+            self.server.lines.extend(body.decode('utf-8').splitlines())
+        self.send_response(status)
+        if status == 503:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FakeInflux()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def writer(server):
+    # Driven by flush()/replay() directly; the background thread is not started
+    writer = influx.InfluxWriter(server.url, token='secret')
+    yield writer
+    writer.pool.close()
+
+
+def sample(timestamp, cpu=10.0):
+    return {
+        'schema_version': 2,
+        'system_info': {'hostname': 'web 01',
+                        'collection_time': datetime.fromtimestamp(timestamp).isoformat()},
+        'cpu': {'usage_percent': cpu, 'cores': 4},
+        'memory': {'total_bytes': 8 << 30, 'used_bytes': 2 << 30, 'usage_percent': 25.0},
+    }
+
+
+def collect(writer, store, metrics_dir, timestamp):
+    """What the collectors do: store locally, then hand the sample to InfluxDB"""
+    data = sample(timestamp)
+    store.append(data, timestamp)
+    writer.write(data, 'web01', metrics_dir, timestamp)
+
+
+def point_times(server, measurement='cpu'):
+    return [int(LINE.match(line).group(1)) for line in server.lines if line.startswith(measurement + ',')]
+
+
+def test_gzip_line_protocol(server, writer):
+    writer.write(sample(START), 'web01')
+    writer.write(sample(START + 5), 'web01')
+    assert writer.flush()
+    assert len(server.requests) == 1
+    path, query, headers = server.requests[0]
+    assert path == '/api/v2/write'
+    assert query == {'org': [influx.INFLUX_ORG], 'bucket': [influx.INFLUX_BUCKET], 'precision': ['ns']}
+    assert headers['Authorization'] == 'Token secret'
+    assert headers['Content-Encoding'] == 'gzip'
+    assert server.lines and all(LINE.match(line) for line in server.lines), server.lines
+    assert point_times(server) == [influx.timestamp_ns(START), influx.timestamp_ns(START + 5)]
+    assert r'host=web\ 01' in server.lines[0]
+    assert writer.stats()['points'] == len(server.lines)
+
+
+def test_connection_is_reused(server, writer):
+    for i in range(5):
+        writer.write(sample(START + i), 'web01')
+        assert writer.flush()
+    assert len(server.requests) == 5
+    assert len(server.clients) == 1
+
+
+def test_outage_is_replayed_once_from_history(server, writer, tmp_path):
+    store = HistoryStore(str(tmp_path), 'web01')
+    collect(writer, store, str(tmp_path), START)
+    assert writer.flush()
+
+    server.status = 503
+    for i in range(1, 4):
+        collect(writer, store, str(tmp_path), START + i * 5)
+        assert not writer.flush()
+    gap_path = os.path.join(str(tmp_path), 'influx_web01.gap')
+    with open(gap_path) as f:
+        assert f.read().split() == [str(int((START + 5) * 1000)), str(int((START + 15) * 1000))]
+    assert writer.stats()['deferred_samples'] == 3
+
+    server.status = 204
+    collect(writer, store, str(tmp_path), START + 20)
+    assert writer.flush()
+    while writer.replay():
+        pass
+    assert not os.path.exists(gap_path)
+    assert writer.stats()['gaps'] == {}
+    assert writer.stats()['replayed_samples'] == 3
+    assert sorted(point_times(server)) == [influx.timestamp_ns(START + i * 5) for i in range(5)]
+    # Nothing left to send again
+    assert not writer.replay()
+    assert len(point_times(server)) == 5
+
+
+def test_gap_of_an_earlier_process_is_replayed(server, tmp_path):
+    store = HistoryStore(str(tmp_path), 'web01')
+    server.status = 503
+    first = influx.InfluxWriter(server.url)
+    collect(first, store, str(tmp_path), START)
+    first.close(1)
+    assert os.path.exists(os.path.join(str(tmp_path), 'influx_web01.gap'))
+
+    server.status = 204
+    second = influx.InfluxWriter(server.url)
+    collect(second, store, str(tmp_path), START + 5)
+    second.close(5)
+    assert sorted(point_times(server)) == [influx.timestamp_ns(START), influx.timestamp_ns(START + 5)]
+    assert not os.path.exists(os.path.join(str(tmp_path), 'influx_web01.gap'))
+
+
+def test_rejected_batch_is_dropped(server, writer, tmp_path):
+    store = HistoryStore(str(tmp_path), 'web01')
+    server.status = 400
+    collect(writer, store, str(tmp_path), START)
+    assert writer.flush()
+    stats = writer.stats()
+    assert stats['rejected_batches'] == 1
+    assert stats['gaps'] == {}
+    assert writer.last_error.startswith('HTTP 400')
+    assert not os.path.exists(os.path.join(str(tmp_path), 'influx_web01.gap'))
+
+    server.status = 204
+    collect(writer, store, str(tmp_path), START + 5)
+    assert writer.flush()
+    assert point_times(server) == [influx.timestamp_ns(START + 5)]
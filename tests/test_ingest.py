@@ -0,0 +1,189 @@
+"""Ingest writer: de-duplication and out-of-order samples pushed by agents"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from reporting import column_store, history_log, ingest, rollups
+
+
+def sample_line(timestamp, cpu=10.0, host='web01'):
+    return json.dumps({
+        'schema_version': 2,
+        'system_info': {'hostname': host,
+                        'collection_time': datetime.fromtimestamp(timestamp).isoformat()},
+        'cpu': {'usage_percent': cpu},
+        'memory': {'total_bytes': 8 << 30, 'used_bytes': 2 << 30, 'usage_percent': 25.0},
+    }).encode('utf-8')
+
+
+@pytest.fixture
+def writer(tmp_path):
+    return ingest.IngestWriter(str(tmp_path))
+
+
+def push(writer, lines, source='web01'):
+    return writer.submit(source, lines)
+
+
+def stored_times(writer, source='web01'):
+    history_dir = os.path.join(writer.metrics_dir, 'history')
+    return [ts for ts, _ in history_log.read_range(history_dir, source)]
+
+
+def column_times(writer, source='web01'):
+    rows = column_store.query(os.path.join(writer.metrics_dir, 'columns'), source, [])
+    return [float(t) for t in rows['timestamp']]
+
+
+def start_of_hour():
+    now = time.time()
+    return now - now % 3600 - 3600
+
+
+def test_retried_batch_is_not_stored_twice(writer):
+    base = start_of_hour()
+    lines = [sample_line(base + i * 5) for i in range(10)]
+    push(writer, lines)
+    push(writer, lines)
+    stats = writer.stats()
+    assert stats['written'] == 10
+    assert stats['duplicates'] == 10
+    assert len(stored_times(writer)) == 10
+    assert len(column_times(writer)) == 10
+
+
+def test_repeated_sample_within_a_batch(writer):
+    base = start_of_hour()
+    push(writer, [sample_line(base), sample_line(base), sample_line(base + 5)])
+    assert len(stored_times(writer)) == 2
+
+
+def test_interleaved_agents_on_one_source_are_all_kept(writer):
+    # Two hosts with the same name push to one source: neither loses samples
+    base = start_of_hour()
+    push(writer, [sample_line(base + i * 10, host='a') for i in range(30)])
+    push(writer, [sample_line(base + i * 10 + 3, host='b') for i in range(30)])
+    times = stored_times(writer)
+    assert len(times) == 60
+    assert times == sorted(times)
+    assert column_times(writer) == sorted(column_times(writer))
+    assert len(column_times(writer)) == 60
+    assert writer.stats()['late'] == 29
+    assert writer.stats()['duplicates'] == 0
+
+
+def test_clock_stepped_back(writer):
+    base = start_of_hour()
+    push(writer, [sample_line(base + 1800 + i * 5) for i in range(5)])
+    # The agent's clock went back 20 minutes
+    push(writer, [sample_line(base + 600 + i * 5, cpu=90.0) for i in range(5)])
+    times = stored_times(writer)
+    assert len(times) == 10 and times == sorted(times)
+
+    history_dir = os.path.join(writer.metrics_dir, 'history')
+    window = list(history_log.read_range(history_dir, 'web01', base + 600, base + 620))
+    assert [record['cpu']['usage_percent'] for _, record in window] == [90.0] * 5
+
+    # Latest stays the newest sample
+    with open(os.path.join(writer.metrics_dir, 'latest_web01.json')) as f:
+        assert json.load(f)['cpu']['usage_percent'] == 10.0
+
+
+def test_late_samples_update_closed_rollup_buckets(writer):
+    base = start_of_hour()
+    push(writer, [sample_line(base + i * 30, cpu=10.0) for i in range(20)])
+    columns_dir = os.path.join(writer.metrics_dir, 'columns')
+    tier = rollups.tier_source('web01', '1m')
+    before = column_store.query(columns_dir, tier, ['cpu.usage_percent.max', 'count'],
+                                start=base, end=base)
+    assert list(before['count']) == [2.0]
+
+    push(writer, [sample_line(base + 15, cpu=70.0)])
+    after = column_store.query(columns_dir, tier, ['cpu.usage_percent.max', 'count'],
+                               start=base, end=base)
+    assert list(after['count']) == [3.0]
+    assert list(after['cpu.usage_percent.max']) == [70.0]
+    tier_times = column_store.query(columns_dir, tier, [])['timestamp']
+    assert list(tier_times) == sorted(tier_times)
+
+
+def test_duplicates_are_found_after_a_restart(tmp_path):
+    base = start_of_hour()
+    lines = [sample_line(base + i * 5) for i in range(10)]
+    push(ingest.IngestWriter(str(tmp_path)), lines[:6])
+    writer = ingest.IngestWriter(str(tmp_path))
+    push(writer, lines)
+    assert writer.stats()['written'] == 4
+    assert len(stored_times(writer)) == 10
+
+
+def test_batch_larger_than_queue_is_refused(tmp_path):
+    writer = ingest.IngestWriter(str(tmp_path), max_pending=5)
+    with pytest.raises(ingest.IngestError) as error:
+        writer.submit('web01', [sample_line(start_of_hour() + i) for i in range(6)])
+    assert error.value.status == 413
+
+
+def test_reply_only_after_samples_are_on_disk(writer):
+    base = start_of_hour()
+    result = push(writer, [sample_line(base + i) for i in range(50)] + [b'{"bad": 1}'])
+    assert result['accepted'] == 50 and result['rejected'] == 1
+    # Nothing left in memory: a restart right now loses nothing
+    assert writer.stats()['pending'] == 0
+    assert len(stored_times(writer)) == 50
+
+
+def test_failed_write_is_reported_and_retried(writer, monkeypatch):
+    base = start_of_hour()
+    lines = [sample_line(base + i) for i in range(5)]
+
+    def broken(self, samples, payloads=None):
+        raise OSError('disk full')
+    monkeypatch.setattr(ingest.HistoryStore, 'extend', broken)
+    with pytest.raises(ingest.IngestError) as error:
+        push(writer, lines)
+    assert error.value.status == 503
+    assert writer.stats()['failed'] == 5
+    assert stored_times(writer) == []
+
+    # The agent keeps its copy and sends the batch again
+    monkeypatch.undo()
+    push(writer, lines)
+    assert len(stored_times(writer)) == 5
+
+
+def test_slow_write_asks_the_agent_to_retry(tmp_path, monkeypatch):
+    writer = ingest.IngestWriter(str(tmp_path), write_timeout=0.05)
+    real_write = writer._write
+    monkeypatch.setattr(writer, '_write', lambda source, samples: time.sleep(0.3) or real_write(source, samples))
+    with pytest.raises(ingest.IngestError) as error:
+        push(writer, [sample_line(start_of_hour())])
+    assert error.value.status == 503
+
+
+def test_history_cache_rereads_a_rewritten_segment(writer, monkeypatch):
+    reporter = pytest.importorskip('reporting.reporter')
+    monkeypatch.setattr(reporter, 'DATA_DIR', writer.metrics_dir)
+    cache = reporter.HistoryCache('web01')
+
+    def cached_cpu():
+        return [sample['cpu']['usage_percent'] for sample in cache.get(1)]
+
+    now = time.time()
+    push(writer, [sample_line(now - 100, cpu=1.0), sample_line(now - 90, cpu=2.0),
+                  sample_line(now - 80, cpu=3.0)])
+    assert cached_cpu() == [1.0, 2.0, 3.0]
+
+    # Late samples rewrite the segment under the cache's offsets, twice in a row
+    push(writer, [sample_line(now - 95, cpu=1.5)])
+    push(writer, [sample_line(now - 85, cpu=2.5)])
+    assert cached_cpu() == [1.0, 1.5, 2.0, 2.5, 3.0]
+
+    push(writer, [sample_line(now - 70, cpu=4.0)])
+    assert cached_cpu() == [1.0, 1.5, 2.0, 2.5, 3.0, 4.0]
+    assert cached_cpu() == [sample['cpu']['usage_percent']
+                            for _, sample in reporter._read_historical_metrics(1, 'web01')]
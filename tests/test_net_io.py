@@ -0,0 +1,55 @@
+"""Network I/O sampler: per-interface rates from fake counters"""
+
+from collections import namedtuple
+
+from reporting import net_io
+from reporting.net_io import NetIoSampler
+
+Counters = namedtuple('Counters', 'bytes_sent bytes_recv packets_sent packets_recv '
+                                  'errin errout dropin dropout')
+Link = namedtuple('Link', 'isup speed')
+
+
+def sampler_for(snapshots, monkeypatch):
+    snapshots = iter(snapshots)
+    clock = iter([100.0, 102.0])
+    monkeypatch.setattr(net_io.time, 'monotonic', lambda: next(clock))
+    return NetIoSampler(counters=lambda pernic=True: next(snapshots),
+                        if_stats=lambda: {'eth0': Link(True, 1000), 'veth1': Link(True, 10000)})
+
+
+def test_rates_over_elapsed_time(monkeypatch):
+    sampler = sampler_for([
+        {'eth0': Counters(1000, 2000, 10, 20, 0, 0, 0, 0)},
+        {'eth0': Counters(3000, 12000, 30, 60, 1, 1, 2, 0)},
+    ], monkeypatch)
+    sampler.sample()
+    row = sampler.sample()['interfaces'][0]
+    assert row['tx_bytes_per_sec'] == 1000.0
+    assert row['rx_bytes_per_sec'] == 5000.0
+    assert row['errors_per_sec'] == 1.0
+    assert row['drops_per_sec'] == 1.0
+
+
+def test_recreated_interface_has_no_burst(monkeypatch):
+    # A veth re-created between samples restarts its counters near zero
+    sampler = sampler_for([
+        {'veth1': Counters(90000000, 70000000, 60000, 50000, 0, 0, 0, 0)},
+        {'veth1': Counters(2000, 4000, 20, 40, 0, 0, 0, 0)},
+    ], monkeypatch)
+    sampler.sample()
+    sample = sampler.sample()
+    row = sample['interfaces'][0]
+    assert row['tx_bytes_per_sec'] == 1000.0
+    assert row['rx_bytes_per_sec'] == 2000.0
+    assert sample['rates']['rx_bytes_per_sec'] == 2000.0
+    assert row['utilization_percent'] < 0.1
+
+
+def test_32bit_counter_wrap(monkeypatch):
+    sampler = sampler_for([
+        {'eth0': Counters(2 ** 32 - 1000, 0, 0, 0, 0, 0, 0, 0)},
+        {'eth0': Counters(1000, 0, 0, 0, 0, 0, 0, 0)},
+    ], monkeypatch)
+    sampler.sample()
+    assert sampler.sample()['interfaces'][0]['tx_bytes_per_sec'] == 1000.0
@@ -0,0 +1,125 @@
+"""Scheduler: aligned ticks, overruns and wall-clock steps, on a fake clock"""
+
+from reporting import scheduler
+
+
+class FakeClock:
+    """Wall clock that only moves when told to (or while the scheduler waits)"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeStop:
+    """Stands in for the scheduler's stop event: waiting advances the fake clock"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.waited = 0.0
+        self.step = 0       # applied to the clock during the next wait
+        self._set = False
+
+    def wait(self, timeout):
+        self.clock.now += timeout + self.step
+        self.step = 0
+        self.waited += timeout
+        return self._set
+
+    def is_set(self):
+        return self._set
+
+    def set(self):
+        self._set = True
+
+
+def make_scheduler(now):
+    clock = FakeClock(now)
+    sched = scheduler.Scheduler(clock=clock)
+    sched._stop = FakeStop(clock)
+    return sched, clock
+
+
+def run_ticks(sched, job_name, interval, count, during=None):
+    """Run one job until it has run `count` times; `during(run, tick)` may move the clock"""
+    ticks = []
+
+    def func(tick):
+        ticks.append(tick)
+        if during is not None:
+            during(len(ticks), tick)
+        if len(ticks) == count:
+            sched.stop()
+    job = sched.add(job_name, interval, func)
+    sched.run()
+    return job, ticks
+
+
+def test_ticks_are_aligned():
+    sched, _ = make_scheduler(1003.2)
+    job, ticks = run_ticks(sched, 'cpu', 5, 3)
+    assert ticks == [1005, 1010, 1015]
+    assert job.skipped == 0
+
+
+def test_overrun_skips_ticks_on_the_grid():
+    sched, clock = make_scheduler(1003)
+
+    def slow_first_run(run, tick):
+        if run == 1:
+            clock.now += 12
+    job, ticks = run_ticks(sched, 'cpu', 5, 3, slow_first_run)
+    assert ticks == [1005, 1020, 1025]
+    assert job.skipped == 2
+
+
+def test_clock_step_forward_skips_to_the_current_tick():
+    sched, _ = make_scheduler(1003)
+
+    def jump(run, tick):
+        if run == 1:
+            sched._stop.step = 3600
+    job, ticks = run_ticks(sched, 'cpu', 5, 3, jump)
+    # No run stamped with a tick an hour old, no burst of missed ones
+    assert ticks == [1005, 4605, 4610]
+    assert job.skipped == 719
+
+
+def test_clock_step_forward_during_a_run():
+    sched, clock = make_scheduler(1003)
+
+    def jump(run, tick):
+        if run == 1:
+            clock.now += 3600
+    job, ticks = run_ticks(sched, 'cpu', 5, 2, jump)
+    assert ticks == [1005, 4610]
+    assert job.skipped == 720
+
+
+def test_clock_step_back_realigns_at_once():
+    sched, _ = make_scheduler(1003)
+
+    def step_back(run, tick):
+        if run == 2:
+            sched._stop.step = -3600
+    job, ticks = run_ticks(sched, 'cpu', 5, 4, step_back)
+    assert ticks == [1005, 1010, 1010 - 3600 + 5, 1010 - 3600 + 10]
+    # Waited a few seconds, not the hour until the old deadline
+    assert sched._stop.waited < 30
+
+
+def test_jobs_keep_their_own_intervals():
+    sched, _ = make_scheduler(1000.5)
+    runs = []
+    sched.add('fast', 1, lambda tick: runs.append(('fast', tick)))
+
+    def slow(tick):
+        runs.append(('slow', tick))
+        if tick >= 1004:
+            sched.stop()
+    sched.add('slow', 2, slow)
+    sched.run()
+    assert runs == [('fast', 1001), ('fast', 1002), ('slow', 1002), ('fast', 1003),
+                    ('fast', 1004), ('slow', 1004)]
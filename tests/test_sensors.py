@@ -0,0 +1,115 @@
+"""Sensor registry against a fake sysfs tree (class/hwmon and class/thermal)"""
+
+import os
+import shutil
+
+import pytest
+
+from reporting import sensors
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text + '\n')
+
+
+def add_chip(sys_root, entry, name, device, inputs):
+    """hwmon chip `entry` with temp<N>_input (millidegrees) and optional temp<N>_label files"""
+    hwmon_dir = os.path.join(sys_root, 'class', 'hwmon', entry)
+    write(os.path.join(hwmon_dir, 'name'), name)
+    if device:
+        device_dir = os.path.join(sys_root, 'devices', device)
+        os.makedirs(device_dir, exist_ok=True)
+        os.symlink(device_dir, os.path.join(hwmon_dir, 'device'))
+    for index, (label, millidegrees) in enumerate(inputs, 1):
+        if label is not None:
+            write(os.path.join(hwmon_dir, f'temp{index}_label'), label)
+        write(os.path.join(hwmon_dir, f'temp{index}_input'), str(millidegrees))
+    return hwmon_dir
+
+
+def add_zone(sys_root, number, zone_type, millidegrees):
+    zone_dir = os.path.join(sys_root, 'class', 'thermal', f'thermal_zone{number}')
+    write(os.path.join(zone_dir, 'type'), zone_type)
+    write(os.path.join(zone_dir, 'temp'), str(millidegrees))
+
+
+@pytest.fixture
+def sys_root(tmp_path):
+    root = str(tmp_path / 'sys')
+    add_chip(root, 'hwmon0', 'coretemp', 'platform/coretemp.0',
+             [('Package id 0', 45000), ('Core 0', 40000), ('Core 1', 41000)])
+    add_chip(root, 'hwmon1', 'nvme', 'pci0000:00/nvme/nvme0',
+             [('Composite', 38900), ('Sensor 1', 50000)])
+    add_chip(root, 'hwmon2', 'pch_cannonlake', None, [(None, 52000)])
+    add_zone(root, 0, 'acpitz', 27800)
+    # Covered by coretemp and by the pch chip: not listed twice
+    add_zone(root, 1, 'x86_pkg_temp', 45000)
+    add_zone(root, 2, 'pch_cannonlake', 52000)
+    return root
+
+
+@pytest.fixture
+def registry(sys_root):
+    registry = sensors.SensorRegistry(sys_root, check_seconds=0)
+    yield registry
+    registry.close()
+
+
+def test_inputs_are_named_by_what_they_measure(registry):
+    assert registry.temperatures() == {
+        'cpu_package': 45.0, 'cpu_core0': 40.0, 'cpu_core1': 41.0,
+        'nvme0': 38.9, 'nvme0_sensor_1': 50.0,
+        'chipset': 52.0,
+        'acpitz': 27.8,
+    }
+
+
+def test_second_cpu_socket(sys_root, registry):
+    add_chip(sys_root, 'hwmon3', 'coretemp', 'platform/coretemp.1',
+             [('Package id 1', 47000), ('Core 0', 43000)])
+    readings = registry.temperatures()
+    assert readings['cpu1_package'] == 47.0
+    assert readings['cpu1_core0'] == 43.0
+    assert readings['cpu_package'] == 45.0
+
+
+def test_inputs_are_re_read_each_time(sys_root, registry):
+    assert registry.temperatures()['cpu_core0'] == 40.0
+    write(os.path.join(sys_root, 'class', 'hwmon', 'hwmon0', 'temp2_input'), '62000')
+    assert registry.temperatures()['cpu_core0'] == 62.0
+
+
+def test_hotplugged_chip_is_picked_up(sys_root, registry):
+    assert 'nvme1' not in registry.temperatures()
+    add_chip(sys_root, 'hwmon3', 'nvme', 'pci0000:00/nvme/nvme1', [('Composite', 36000)])
+    assert registry.temperatures()['nvme1'] == 36.0
+
+
+def test_removed_chip_is_dropped(sys_root, registry):
+    assert 'nvme0' in registry.temperatures()
+    shutil.rmtree(os.path.join(sys_root, 'class', 'hwmon', 'hwmon1'))
+    readings = registry.temperatures()
+    assert 'nvme0' not in readings and 'nvme0_sensor_1' not in readings
+    assert readings['cpu_package'] == 45.0
+
+
+def test_chip_list_is_only_checked_every_check_seconds(sys_root):
+    registry = sensors.SensorRegistry(sys_root, check_seconds=3600)
+    registry.temperatures()
+    add_chip(sys_root, 'hwmon3', 'nvme', 'pci0000:00/nvme/nvme1', [('Composite', 36000)])
+    assert 'nvme1' not in registry.temperatures()
+    registry.close()
+
+
+def test_no_sysfs():
+    registry = sensors.SensorRegistry('/nonexistent-sys', check_seconds=0)
+    assert registry.temperatures() == {}
+
+
+def test_cpu_temperature_preference():
+    assert sensors.cpu_temperature({'cpu_core0': 40.0, 'cpu_package': 45.0}) == 45.0
+    assert sensors.cpu_temperature({'cpu_core0': 40.0, 'cpu_core1': 48.0, 'nvme0': 60.0}) == 48.0
+    assert sensors.cpu_temperature({'acpitz': 27.8, 'nvme0': 38.9}) == 27.8
+    assert sensors.cpu_temperature({'nvme0': 38.9}) is None
@@ -0,0 +1,150 @@
+"""Spool uploader against a stub /api/ingest: acknowledgement, backoff and rejected batches"""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from reporting import spool
+
+
+class StubReporter(ThreadingHTTPServer):
+    """Answers each POST with the next queued status (200 once the queue is empty)"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.statuses = []
+        self.headers = {}
+        self.batches = []
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/api/ingest'
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = gzip.decompress(self.rfile.read(int(self.headers['Content-Length'])))
+        head, *lines = body.split(b'\n')
+        self.server.batches.append((json.loads(head)['source'], [json.loads(line) for line in lines]))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        for name, value in self.server.headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def reporter():
+    server = StubReporter()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = spool.Spool(str(tmp_path / 'spool'))
+    yield queue
+    queue.close()
+
+
+def fill(queue, count):
+    for i in range(count):
+        queue.append({'seq': i})
+
+
+def send_next(uploader):
+    lines, position = uploader.read_batch()
+    return uploader.send(lines, position)
+
+
+def pending(queue):
+    lines, _ = queue.read_batch(1000, spool.BATCH_BYTES)
+    return [json.loads(line)['seq'] for line in lines]
+
+
+def test_accepted_batch_is_acknowledged(reporter, queue):
+    fill(queue, 3)
+    uploader = spool.Uploader(queue, reporter.url, 'web01')
+    assert send_next(uploader) == 0
+    assert reporter.batches == [('web01', [{'seq': 0}, {'seq': 1}, {'seq': 2}])]
+    assert uploader.sent == 3
+    assert pending(queue) == []
+
+
+@pytest.mark.parametrize('status', [404, 405, 401, 500, 503])
+def test_other_errors_back_off_and_keep_the_batch(reporter, queue, status):
+    fill(queue, 3)
+    reporter.statuses = [status]
+    uploader = spool.Uploader(queue, reporter.url, 'web01')
+    assert send_next(uploader) > 0
+    assert uploader.last_error == f'HTTP {status}'
+    assert pending(queue) == [0, 1, 2]
+    # Sent again once the reporter recovers
+    assert send_next(uploader) == 0
+    assert pending(queue) == []
+    assert len(reporter.batches) == 2
+
+
+@pytest.mark.parametrize('status', [400, 422])
+def test_malformed_batch_is_skipped(reporter, queue, status):
+    fill(queue, 3)
+    reporter.statuses = [status]
+    uploader = spool.Uploader(queue, reporter.url, 'web01')
+    assert send_next(uploader) == 0
+    assert uploader.skipped == 3
+    assert pending(queue) == []
+
+
+def test_too_large_batch_is_split(reporter, queue):
+    fill(queue, 8)
+    # The first two requests are refused as too large
+    reporter.statuses = [413, 413]
+    uploader = spool.Uploader(queue, reporter.url, 'web01', batch_samples=8)
+    while pending(queue):
+        assert send_next(uploader) == 0
+    assert [len(samples) for _, samples in reporter.batches] == [8, 4, 2, 4, 2]
+    assert uploader.sent == 8
+    assert uploader.skipped == 0
+
+
+def test_batch_size_recovers_after_a_split(reporter, queue):
+    fill(queue, 40)
+    reporter.statuses = [413, 413]
+    uploader = spool.Uploader(queue, reporter.url, 'web01', batch_samples=8)
+    while pending(queue):
+        assert send_next(uploader) == 0
+    # 8 and 4 refused, then 2, 4, 8, 8 ...
+    assert [len(samples) for _, samples in reporter.batches] == [8, 4, 2, 4, 8, 8, 8, 8, 2]
+    assert uploader.read_batch()[0] == [] and uploader._batch_limit == 8
+
+
+def test_single_sample_too_large_is_skipped(reporter, queue):
+    fill(queue, 2)
+    reporter.statuses = [413, 413]
+    uploader = spool.Uploader(queue, reporter.url, 'web01', batch_samples=2)
+    assert send_next(uploader) == 0
+    assert send_next(uploader) == 0
+    assert uploader.skipped == 1
+    assert pending(queue) == [1]
+
+
+def test_rate_limit_waits_for_retry_after(reporter, queue):
+    fill(queue, 1)
+    reporter.statuses = [429]
+    reporter.headers = {'Retry-After': '7'}
+    uploader = spool.Uploader(queue, reporter.url, 'web01')
+    assert send_next(uploader) == 7
+    assert pending(queue) == [0]
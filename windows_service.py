@@ -1,6 +1,9 @@
 """
-Windows Agent Service - Runs monitor_windows.py as a Windows Service
+Windows Agent Service - Runs the monitor_windows.py collector as a Windows Service
 This allows the monitoring to run in the background automatically
+
+Metrics are collected in-process on wall-clock aligned 5 second ticks, so
+psutil and the history writers stay warm between samples.
 """
 
 import win32serviceutil
@@ -10,8 +13,6 @@ import servicemanager
 import socket
 import sys
 import os
-import time
-import subprocess
 
 class SystemMonitorService(win32serviceutil.ServiceFramework):
     _svc_name_ = "SystemMonitor"
@@ -26,13 +27,15 @@ class SystemMonitorService(win32serviceutil.ServiceFramework):
         
         # Get the directory where the service is installed
         self.service_dir = os.path.dirname(os.path.abspath(__file__))
-        self.monitor_script = os.path.join(self.service_dir, 'monitor_windows.py')
+        self.scheduler = None
 
     def SvcStop(self):
         """Called when the service is asked to stop"""
         self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
         win32event.SetEvent(self.hWaitStop)
         self.is_running = False
+        if self.scheduler is not None:
+            self.scheduler.stop()
 
     def SvcDoRun(self):
         """Called when the service is started"""
@@ -45,23 +48,19 @@ class SystemMonitorService(win32serviceutil.ServiceFramework):
 
     def main(self):
         """Main service loop"""
-        while self.is_running:
-            try:
-                # Run the monitoring script
-                subprocess.run(
-                    [sys.executable, self.monitor_script],
-                    cwd=self.service_dir,
-                    capture_output=True,
-                    timeout=10
-                )
-                
-                # Wait 5 seconds before next collection
-                if win32event.WaitForSingleObject(self.hWaitStop, 5000) == win32event.WAIT_OBJECT_0:
-                    break
-                    
-            except Exception as e:
-                servicemanager.LogErrorMsg(f"Error in monitoring loop: {str(e)}")
-                time.sleep(5)
+        # monitor_windows writes to paths relative to the install directory
+        os.chdir(self.service_dir)
+        sys.path.insert(0, self.service_dir)
+        from monitor_windows import get_system_metrics, save_metrics
+        from reporting.scheduler import Scheduler
+
+        def log_error(job, error):
+            servicemanager.LogErrorMsg(f"Error in monitoring loop: {str(error)}")
+
+        self.scheduler = Scheduler(on_error=log_error)
+        self.scheduler.add('windows', 5, lambda tick: save_metrics(get_system_metrics()))
+        if self.is_running:
+            self.scheduler.run()
 
 if __name__ == '__main__':
     if len(sys.argv) == 1: